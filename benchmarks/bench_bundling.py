@@ -0,0 +1,49 @@
+"""
+Double Deal bundling on synthetic catering orders of growing size.
+Every line is a random deal burger with a random quantity and sometimes an extra ingredient,
+the time covers grouping, pairing and rebuilding the order.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_bundling.py
+"""
+import random
+import time
+from mcdonalds_proj.bundling import apply_deals
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, IngredientsItem
+
+REPEAT = 20
+
+
+def make_items(menu: Menu, lines: int, rng: random.Random) -> list:
+    burgers = [burger for names in menu.menu['deals'].values() for burger in names]
+    ingredients = list(menu.menu['ingredients'])
+    return [OrderItem(name=rng.choice(burgers), type='burgers', quantity=rng.randint(1, 5),
+                      modifiers_to_add=[IngredientsItem(name=rng.choice(ingredients))]
+                      if rng.random() < 0.3 else [])
+            for _ in range(lines)]
+
+
+def main():
+    menu = Menu(dump_json=False)
+    rng = random.Random(0)
+    print(f"{'lines':>6} {'burgers':>8} {'deals':>6} {'deal lines':>11} {'ms':>8} "
+          f"{'saved $':>8}")
+    for lines in [10, 100, 1000, 10000]:
+        items = make_items(menu, lines, rng)
+        elapsed = 0.0
+        for _ in range(REPEAT):
+            order = Order(menu)
+            order.list = [item.model_copy(deep=True) for item in items]
+            before = order.total_cents
+            start = time.perf_counter()
+            made = apply_deals(order, menu)
+            elapsed += time.perf_counter() - start
+        deal_lines = sum(item.type == 'deals' for item in order.list)
+        print(f"{lines:>6} {sum(item.quantity for item in items):>8} {made:>6} "
+              f"{deal_lines:>11} {elapsed / REPEAT * 1e3:>8.2f} "
+              f"{(before - order.total_cents) / 100:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Turns and model calls per completed order for the recorded LLM outputs of
+benchmarks/data/validation_corpus.jsonl: the original first-issue validation,
+all issues asked one by one, and all issues merged by ClarificationPlanner.
+The first turn is the order itself, every following turn answers one message of the manager.
+The simulated customer names the first option the menu allows for every question,
+the answer goes to the model when the fast path cannot apply it.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_clarification.py
+"""
+from bench_validation import answer, choose, load_corpus
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem
+from mcdonalds_proj.validation import BLOCKING
+
+
+def run(menu: Menu, items: list, first_only: bool, planner: ClarificationPlanner,
+        fast_path: FastPathInterpreter) -> tuple:
+    """
+    return turns and model calls until the order has no questions left
+    """
+    manager = Manager()
+    order = Order(menu)
+    order.list = [OrderItem.model_validate(item) for item in items]
+    turns = llm_calls = 1
+    while True:
+        snapshot = list(order.list)
+        issues = {issue.text: issue for issue in manager.validate(order, menu, first_only)
+                  if issue.severity == BLOCKING}
+        manager.issue_queue = planner.merge_queue(manager.issue_queue)
+        if manager.issue_queue.empty():
+            return turns, llm_calls
+        message = manager.issue_queue.get()
+        turns += 1
+        parts = [issues[part.text] for part in message.parts or [message]]
+        user_msg = ' and '.join(choose(issue, snapshot[issue.item], menu) for issue in parts)
+        if fast_path.interpret(user_msg, message, order) is None:
+            llm_calls += 1
+            for issue in parts:
+                answer(issue, snapshot[issue.item], menu)
+
+
+def main():
+    menu = Menu(dump_json=False)
+    fast_path = FastPathInterpreter(menu)
+    corpus = load_corpus()
+    print(f"{'mode':>12} {'turns/order':>12} {'llm calls/order':>16}")
+    for mode, first_only, max_questions in [('first issue', True, 1), ('one by one', False, 1),
+                                            ('merged', False, 3)]:
+        planner = ClarificationPlanner(max_questions)
+        results = [run(menu, record['items'], first_only, planner, fast_path)
+                   for record in corpus]
+        print(f"{mode:>12} {sum(turns for turns, _ in results) / len(corpus):>12.2f} "
+              f"{sum(calls for _, calls in results) / len(corpus):>16.2f}")
+
+
+if __name__ == '__main__':
+    main()
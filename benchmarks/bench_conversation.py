@@ -0,0 +1,56 @@
+"""
+Stepping many conversation state machines from one loop: the recorded conversations of
+tests/fixtures replayed round robin, one transition per machine at a time, with the time of
+every transition taken from the metrics.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_conversation.py --machines 1000
+"""
+import argparse
+import time
+from mcdonalds_proj.conversation import ConversationMachine, Reply, Start
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.replay import ReplayLLM, load_records
+
+FIXTURES = 'tests/fixtures/conversations.jsonl'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--machines', type=int, default=1000)
+    args = parser.parse_args()
+
+    menu = Menu(dump_json=False)
+    conversations = list(load_records(FIXTURES).values())
+    metrics = Metrics()
+    lanes = []
+    for number in range(args.machines):
+        records = conversations[number % len(conversations)]
+        lanes.append((ConversationMachine(menu, metrics=metrics), ReplayLLM(records), records))
+
+    start = time.perf_counter()
+    for machine, _, _ in lanes:
+        machine.handle(Start())
+    turn = 0
+    active = lanes
+    while active:
+        for machine, llm, records in active:
+            record = records[turn]
+            machine.handle(Reply(llm.process(record.user_msg, machine.pending, machine.order)))
+        turn += 1
+        active = [lane for lane in active if not lane[0].finished and turn < len(lane[2])]
+    elapsed = time.perf_counter() - start
+
+    count, total, longest = metrics.stages['transition']
+    print(f"{args.machines} machines, {count} transitions in {elapsed * 1e3:.1f} ms: "
+          f"{count / elapsed:.0f} transitions/s")
+    print(f"transition mean {total / count * 1e6:.1f} us, max {longest * 1e6:.1f} us")
+    for (name, labels), value in sorted(metrics.counters.items()):
+        if name == 'transitions_total':
+            labels = dict(labels)
+            print(f"  {labels['source']:>12} -> {labels['target']:<12} {value:6}")
+
+
+if __name__ == '__main__':
+    main()
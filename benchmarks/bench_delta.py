@@ -0,0 +1,50 @@
+"""
+Output size and merge cost of the delta mode against the full OrderState mode.
+The model output is estimated from the JSON the response model serialises to,
+for the turn "add a Coke" on orders of growing size.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_delta.py
+"""
+import time
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, OrderState, OrderDelta, OrderOperation
+from mcdonalds_proj.prompt import estimate_tokens
+
+REPEAT = 1000
+
+
+def make_items(size: int) -> list:
+    names = [('Big Mac', 'burgers', None), ('French Fries', 'fries', 'large'),
+             ('Sprite', 'drinks', 'medium'), ('Apple Pie', 'desserts', None)]
+    return [OrderItem(name=name, type=item_type, size=item_size)
+            for name, item_type, item_size in (names[i % len(names)] for i in range(size))]
+
+
+def main():
+    menu = Menu(dump_json=False)
+    manager = Manager()
+    coke = OrderItem(name='Coca-Cola', type='drinks', size='medium')
+    print(f"{'items':>5} {'full tokens':>12} {'delta tokens':>13} {'full merge us':>14} "
+          f"{'delta merge us':>15}")
+    for size in [1, 5, 10, 25, 50]:
+        items = make_items(size)
+        full = OrderState(items=items + [coke])
+        delta = OrderDelta(operations=[OrderOperation(op='add', item=coke)])
+
+        timings = {}
+        for mode, response in [('full', full), ('delta', delta)]:
+            order = Order(menu)
+            start = time.perf_counter()
+            for _ in range(REPEAT):
+                order.list = list(items)
+                manager.update_order(order, response)
+            timings[mode] = (time.perf_counter() - start) / REPEAT * 1e6
+        print(f"{size:>5} {estimate_tokens(full.model_dump_json()):>12} "
+              f"{estimate_tokens(delta.model_dump_json()):>13} {timings['full']:>14.1f} "
+              f"{timings['delta']:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Cost of the instrumentation: a span, a labelled counter and whole recorded conversations
+of tests/fixtures replayed through ConversationSession with metrics on and off.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_metrics.py
+"""
+import asyncio
+import time
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.replay import ReplayLLM, load_records
+from mcdonalds_proj.session import ConversationSession
+
+FIXTURES = 'tests/fixtures/conversations.jsonl'
+REPEAT = 200000
+CONVERSATIONS = 300
+
+
+def per_call_ns(call) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        call()
+    return (time.perf_counter() - start) / REPEAT * 1e9
+
+
+def replay(menu: Menu, conversations: dict, metrics: Metrics) -> float:
+    async def talk():
+        for _ in range(CONVERSATIONS // len(conversations)):
+            for records in conversations.values():
+                session = ConversationSession(menu, ReplayLLM(records), metrics=metrics)
+                session.start()
+                for record in records:
+                    await session.step(record.user_msg)
+
+    start = time.perf_counter()
+    asyncio.run(talk())
+    return time.perf_counter() - start
+
+
+def main():
+    for enabled in [True, False]:
+        metrics = Metrics(enabled)
+
+        def span():
+            with metrics.span('validate'):
+                pass
+        print(f"enabled={enabled!s:<5} span {per_call_ns(span):7.0f} ns   "
+              f"counter {per_call_ns(lambda: metrics.inc('turns_total', path='llm')):5.0f} ns")
+
+    menu = Menu(dump_json=False)
+    conversations = load_records(FIXTURES)
+    replay(menu, conversations, Metrics(False))
+    off = min(replay(menu, conversations, Metrics(False)) for _ in range(3))
+    on = min(replay(menu, conversations, Metrics(True)) for _ in range(3))
+    print(f"{CONVERSATIONS} conversations: off {off * 1e3:.1f} ms, on {on * 1e3:.1f} ms "
+          f"({100 * (on - off) / off:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
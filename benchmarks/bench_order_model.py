@@ -0,0 +1,75 @@
+"""
+Cost of the order items: construction, copying and memory of the internal __slots__ items
+against the pydantic models, and the conversion at the LLM boundary.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_order_model.py
+"""
+import time
+import tracemalloc
+from mcdonalds_proj.order import (Child, ChildrenItem, Ingredient, IngredientsItem, Item, OrderItem,
+                                  OrderState, from_model, to_state)
+
+REPEAT = 20000
+SESSIONS = 2000
+
+
+def order_items(item, child, ingredient) -> list:
+    """
+    return a typical order: a meal, two burgers with modifiers, a deal, fries and a drink
+    """
+    return [
+        item(name='Big Mac Meal', type='combos', size='large',
+             modifiers_to_add=[ingredient(name='Ranch')],
+             children=[child(name='Big Mac', type='burgers',
+                             modifiers_to_remove=[ingredient(name='Onion')]),
+                       child(name='Sprite', type='drinks'),
+                       child(name='French Fries', type='fries')]),
+        item(name='McChicken', type='burgers', quantity=2,
+             modifiers_to_add=[ingredient(name='Cheese Slice'), ingredient(name='Flag')]),
+        item(name='Cheeseburger', type='burgers', modifiers_to_remove=[ingredient(name='Pickles')]),
+        item(name='Small Double Deal', type='deals',
+             children=[child(name='Hamburger', type='burgers'),
+                       child(name='Filet-O-Fish', type='burgers')]),
+        item(name='French Fries', type='fries', size='medium'),
+        item(name='Coca-Cola', type='drinks', size='small'),
+    ]
+
+
+def per_order_us(call) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        call()
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+
+def session_bytes(build) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [build() for _ in range(SESSIONS)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return (after - before) / SESSIONS
+
+
+def main():
+    def pydantic_items():
+        return order_items(OrderItem, ChildrenItem, IngredientsItem)
+
+    def internal_items():
+        return order_items(Item, Child, Ingredient)
+
+    state = OrderState(items=pydantic_items())
+    pydantic, internal = pydantic_items(), internal_items()
+    print(f"{'':<10} {'build us':>9} {'deep copy us':>13} {'bytes/order':>12}")
+    for name, build, items in [('pydantic', pydantic_items, pydantic),
+                               ('internal', internal_items, internal)]:
+        copy = per_order_us(lambda: [item.model_copy(deep=True) for item in items])
+        print(f"{name:<10} {per_order_us(build):9.1f} {copy:13.1f} {session_bytes(build):12.0f}")
+    print(f"from_model {per_order_us(lambda: [from_model(item) for item in state.items]):.1f} us, "
+          f"to_state {per_order_us(lambda: to_state(internal)):.1f} us per order")
+
+
+if __name__ == '__main__':
+    main()
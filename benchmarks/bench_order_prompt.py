@@ -0,0 +1,45 @@
+"""
+Size of the order state in the prompt: the repr of the items that was sent before against
+the canonical compact notation, for growing orders, and the cost of the order fingerprint.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_order_prompt.py
+"""
+import hashlib
+import json
+import time
+from bench_order_model import order_items
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Child, Ingredient, Item, Order
+from mcdonalds_proj.prompt import encode_order, estimate_tokens, order_fingerprint
+
+REPEAT = 2000
+
+
+def per_call_us(call) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        call()
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+
+def json_fingerprint(items: list) -> str:
+    dump = [item.model_dump() for item in items]
+    return hashlib.sha256(json.dumps(dump, sort_keys=True).encode()).hexdigest()
+
+
+def main():
+    order = Order(Menu(dump_json=False))
+    print(f"{'items':>6} {'repr tokens':>12} {'compact tokens':>15} {'saved':>6} "
+          f"{'json hash us':>13} {'compact hash us':>16}")
+    for copies in [1, 4, 10, 20]:
+        order.list = order_items(Item, Child, Ingredient) * copies
+        before = estimate_tokens(str(order.list))
+        after = estimate_tokens(encode_order(order.list))
+        print(f"{len(order.list):6} {before:12} {after:15} {1 - after / before:6.0%} "
+              f"{per_call_us(lambda: json_fingerprint(order.list)):13.1f} "
+              f"{per_call_us(lambda: order_fingerprint(order.list)):16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Batch pricing against pricing one Order at a time, for a log of random orders.
+The per-order path builds a fresh Order like an audit job that loads every order,
+the batch path is timed for encoding and for the vectorized pricing separately.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_pricing.py
+"""
+import random
+import time
+from mcdonalds_proj.batch_pricing import BatchPricer
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order
+from mcdonalds_proj.random_orders import random_items
+
+
+def main():
+    menu = Menu(dump_json=False)
+    pricer = BatchPricer(menu)
+    rng = random.Random(0)
+    print(f"{'orders':>8} {'per-order ms':>13} {'encode ms':>10} {'price ms':>9} "
+          f"{'speedup':>8} {'reprice speedup':>16}")
+    for count in [1000, 10000, 100000]:
+        logs = [random_items(menu, rng) for _ in range(count)]
+
+        start = time.perf_counter()
+        expected = []
+        for items in logs:
+            order = Order(menu)
+            order.list = items
+            expected.append(order.total_cents)
+        per_order = time.perf_counter() - start
+
+        start = time.perf_counter()
+        encoded = pricer.encode(logs)
+        encode = time.perf_counter() - start
+        start = time.perf_counter()
+        totals = pricer.totals(encoded)
+        price = time.perf_counter() - start
+        assert totals.tolist() == expected
+
+        print(f"{count:>8} {per_order * 1e3:>13.1f} {encode * 1e3:>10.1f} {price * 1e3:>9.1f} "
+              f"{per_order / (encode + price):>7.1f}x {per_order / price:>15.1f}x")
+
+
+if __name__ == '__main__':
+    main()
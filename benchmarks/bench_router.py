@@ -0,0 +1,103 @@
+"""
+Tiered routing on the recorded conversations of tests/fixtures, without the fast path so every
+turn reaches a model. Backends answer with the recorded responses after a simulated latency,
+the small one misspells an item in a share of its answers; tokens are estimated from the real
+prompts of both tiers. Prints calls, escalation rate, latency and cost of every tier,
+against sending every turn to the full model.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_router.py --error-rate 0.1
+"""
+import argparse
+import math
+import random
+import time
+from mcdonalds_proj.conversation import ConversationMachine, Reply, Start
+from mcdonalds_proj.llm import LLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.order import OrderState
+from mcdonalds_proj.prompt import PrefixFingerprints, estimate_tokens
+from mcdonalds_proj.replay import load_records
+from mcdonalds_proj.router import ModelRouter, Tier
+
+FIXTURES = 'tests/fixtures/conversations.jsonl'
+
+
+class RecordedBackend():
+    """
+    Answers with the recorded response of the turn after the latency of its model
+    """
+
+    def __init__(self, prune_menu: bool, latency: float, error_rate: float = 0.0,
+                 seed: int = 0) -> None:
+        self.prompt = LLM(prune_menu=prune_menu, prefix_fingerprints=PrefixFingerprints(),
+                          metrics=Metrics(False))
+        self.prefix_fingerprints = self.prompt.prefix_fingerprints
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.records = {}
+        self.prev_message = "None"
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def process(self, user_msg, manager_msg, order):
+        self.prompt.prev_message = self.prev_message
+        messages = self.prompt.build_messages(user_msg, manager_msg, order)
+        record = self.records[(user_msg, manager_msg.text)]
+        time.sleep(self.latency)
+        response = OrderState.model_validate(record.response)
+        if response.items and self.random.random() < self.error_rate:
+            response.items[0].name += 's'
+        self.usage['prompt_tokens'] += sum(estimate_tokens(msg['content']) for msg in messages)
+        self.usage['completion_tokens'] += estimate_tokens(response.model_dump_json())
+        return response
+
+
+def run(menu: Menu, conversations: dict, tiers: list) -> ModelRouter:
+    router = ModelRouter(tiers, metrics=Metrics(False))
+    for records in conversations.values():
+        for tier in tiers:
+            tier.backend.records = {(record.user_msg, record.manager_msg['text']): record
+                                    for record in records}
+        machine = ConversationMachine(menu, metrics=Metrics(False))
+        machine.handle(Start())
+        router.prev_message = "None"
+        for record in records:
+            response = router.process(record.user_msg, machine.pending, machine.order)
+            machine.handle(Reply(response))
+    return router
+
+
+def print_report(title: str, router: ModelRouter) -> None:
+    report = router.report()
+    seconds = sum(stats['seconds'] for stats in router.stats.values())
+    turns = sum(stats['turns'] for stats in report.values())
+    cost = sum(stats['cost_usd'] for stats in report.values())
+    print(f"{title}: {turns} turns, {1000 * seconds / turns:.1f} ms model time per turn, "
+          f"${cost * 1e6 / turns:.1f} per million turns")
+    for name, stats in report.items():
+        print(f"  {name:<6} calls {stats['calls']:3}  "
+              f"escalation rate {stats['escalation_rate']:5.2f}  latency {stats['avg_latency_ms']:6.1f} ms  cost ${stats['cost_usd']:.6f}  "
+              f"prefixes {stats['prefixes']['distinct_prefixes']}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--error-rate', type=float, default=0.1,
+                        help='share of the answers of the small model that are rejected')
+    parser.add_argument('--small-latency', type=float, default=0.004)
+    parser.add_argument('--full-latency', type=float, default=0.010)
+    args = parser.parse_args()
+
+    menu = Menu(dump_json=False)
+    conversations = load_records(FIXTURES)
+    full = Tier('full', RecordedBackend(False, args.full_latency), math.inf, 0.40, 1.60)
+    print_report("full model only", run(menu, conversations, [full]))
+    small = Tier('small', RecordedBackend(True, args.small_latency, args.error_rate), 3, 0.10, 0.40)
+    full = Tier('full', RecordedBackend(False, args.full_latency), math.inf, 0.40, 1.60)
+    print_report("routed", run(menu, conversations, [small, full]))
+
+
+if __name__ == '__main__':
+    main()
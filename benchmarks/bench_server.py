@@ -0,0 +1,62 @@
+"""
+Throughput and memory per active session of the HTTP server, with the offline FakeLLM.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_server.py --sessions 500 --latency 0.2
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+import httpx
+from mcdonalds_proj.fake_llm import FakeLLM
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.server import create_app
+
+CONVERSATION = ["a Big Mac and a Sprite", "large", "no", "no", "no, that's all"]
+
+
+async def talk(client: httpx.AsyncClient) -> int:
+    reply = (await client.post('/sessions')).json()
+    turns = 0
+    for text in CONVERSATION:
+        reply = (await client.post(f"/sessions/{reply['session_id']}/messages",
+                                   json={'text': text})).json()
+        turns += 1
+        if reply['finished']:
+            break
+    return turns
+
+
+async def run(sessions: int, latency: float) -> None:
+    menu = Menu(dump_json=False)
+    fast_path = FastPathInterpreter(menu)
+    app = create_app(menu, lambda: FakeLLM(menu, latency, fast_path))
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        start = time.perf_counter()
+        turns = sum(await asyncio.gather(*(talk(client) for _ in range(sessions))))
+        elapsed = time.perf_counter() - start
+        print(f"{sessions} conversations, {turns} turns in {elapsed:.2f}s: "
+              f"{turns / elapsed:.0f} turns/s, {sessions / elapsed:.0f} conversations/s")
+
+        # Memory held by sessions that are waiting for the customer's next message
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        for _ in range(sessions):
+            reply = (await client.post('/sessions')).json()
+            await client.post(f"/sessions/{reply['session_id']}/messages",
+                              json={'text': CONVERSATION[0]})
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        print(f"{len(app.state.store)} active sessions: {size / sessions / 1024:.1f} KiB per session")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.1)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.latency))
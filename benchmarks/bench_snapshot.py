@@ -0,0 +1,74 @@
+"""
+Cost of durable sessions: encoding and restoring snapshots of the recorded conversations
+of tests/fixtures after every turn, and what a turn waits for a synchronous save to a file
+or SQLite against handing the snapshot to the background writer.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_snapshot.py
+"""
+import asyncio
+import os
+import tempfile
+import time
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.replay import ReplayLLM, load_records
+from mcdonalds_proj.session import ConversationSession
+from mcdonalds_proj.snapshot import (FileSnapshotStore, SnapshotWriter, SQLiteSnapshotStore,
+                                     encode_session, restore_session)
+
+FIXTURES = 'tests/fixtures/conversations.jsonl'
+REPEAT = 50
+
+
+def snapshots(menu: Menu, conversations: dict) -> list:
+    """
+    return snapshot of every turn of the recorded conversations
+    """
+    async def talk():
+        result = []
+        for records in conversations.values():
+            session = ConversationSession(menu, ReplayLLM(records), metrics=Metrics(False))
+            session.start()
+            for record in records:
+                await session.step(record.user_msg)
+                result.append((session, encode_session(session)))
+        return result
+    return asyncio.run(talk())
+
+
+def per_call_us(calls: list) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        for call in calls:
+            call()
+    return (time.perf_counter() - start) / (REPEAT * len(calls)) * 1e6
+
+
+def main():
+    menu = Menu(dump_json=False)
+    turns = snapshots(menu, load_records(FIXTURES))
+    sizes = [len(snapshot) for _, snapshot in turns]
+    print(f"{len(turns)} turns, snapshot {sum(sizes) / len(sizes):.0f} bytes mean, "
+          f"{max(sizes)} max")
+    print(f"encode  {per_call_us([lambda s=s: encode_session(s) for s, _ in turns]):8.1f} us")
+    restores = [lambda b=b: restore_session(b, menu, ReplayLLM([])) for _, b in turns]
+    print(f"restore {per_call_us(restores):8.1f} us")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        stores = {'file': FileSnapshotStore(os.path.join(tmp_dir, 'files')),
+                  'sqlite': SQLiteSnapshotStore(os.path.join(tmp_dir, 'snapshots.db'))}
+        for name, store in stores.items():
+            calls = [lambda i=i, b=b: store.save(f"s{i % 64}", b) for i, (_, b) in enumerate(turns)]
+            sync = per_call_us(calls)
+            writer = SnapshotWriter(store, Metrics(False))
+            calls = [lambda i=i, b=b: writer.submit(f"s{i % 64}", b)
+                     for i, (_, b) in enumerate(turns)]
+            background = per_call_us(calls)
+            writer.flush()
+            writer.close()
+            print(f"{name:<7} save {sync:8.1f} us   background submit {background:6.1f} us")
+
+
+if __name__ == '__main__':
+    main()
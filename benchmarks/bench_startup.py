@@ -0,0 +1,64 @@
+"""
+Cold start of a worker: import time of the modules every process loads and the time until
+the first message of a session, each measured in a fresh interpreter.
+Also shows which heavy packages are loaded by then and what the first OpenAI client costs.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_startup.py
+"""
+import os
+import subprocess
+import sys
+
+RUNS = 5
+HEAVY = ['openai', 'instructor', 'numpy', 'fastapi']
+
+SCENARIOS = {
+    'import mcdonalds_proj.llm': "import mcdonalds_proj.llm",
+    'import mcdonalds_proj.session': "import mcdonalds_proj.session",
+    'import mcdonalds_proj.server': "import mcdonalds_proj.server",
+    'first message': """
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.llm import LLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.session import ConversationSession
+menu = Menu(dump_json=False)
+ConversationSession(menu, LLM(fast_path=FastPathInterpreter(menu))).start()
+""",
+    'first message + client': """
+from mcdonalds_proj.llm import LLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.session import ConversationSession
+menu = Menu(dump_json=False)
+llm = LLM()
+ConversationSession(menu, llm).start()
+llm.client
+""",
+}
+
+TIMED = """
+import sys, time
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+print(seconds, ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def run(code: str) -> tuple:
+    env = dict(os.environ, PYTHONPATH='src', OPENAI_API_KEY=os.environ.get('OPENAI_API_KEY', 'x'))
+    output = subprocess.run([sys.executable, '-c', TIMED.format(code=code, heavy=HEAVY)],
+                            env=env, check=True, capture_output=True, text=True).stdout
+    seconds, loaded = output.split(' ', 1)
+    return float(seconds), loaded.strip()
+
+
+def main():
+    for name, code in SCENARIOS.items():
+        results = [run(code) for _ in range(RUNS)]
+        best = min(seconds for seconds, _ in results)
+        print(f"{name:<30} {best * 1e3:7.1f} ms   loaded: {results[0][1] or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Turns needed to fix the recorded LLM outputs of benchmarks/data/validation_corpus.jsonl,
+with the original one-question-per-turn validation against the single-pass engine.
+The customer is simulated and answers every question that was asked in a turn
+with the first option the menu allows.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_validation.py
+"""
+import json
+import time
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem
+from mcdonalds_proj.validation import BLOCKING
+
+CORPUS = 'benchmarks/data/validation_corpus.jsonl'
+
+
+def load_corpus() -> list:
+    with open(CORPUS, encoding='UTF-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def choose(issue, item, menu: Menu) -> str:
+    """
+    return the first size or name the menu allows for the question of the issue
+    """
+    index = menu.index
+    if issue.code in ['missing_size', 'wrong_size']:
+        return sorted(index.sizes[(item.type, item.name)])[0]
+    if issue.flag == 'clarify_name' or issue.code == 'unknown_name':
+        return sorted(index.names[item.type])[0]
+    if issue.flag == 'clarify_slot':
+        return sorted(index.combo_slots[item.name][issue.slot])[0]
+    return sorted(index.deal_burgers[item.name])[0]
+
+
+def answer(issue, item, menu: Menu) -> None:
+    """
+    fixes the order the way the customer's answer to the issue would
+    """
+    value = choose(issue, item, menu)
+    if issue.code in ['missing_size', 'wrong_size']:
+        item.size = value
+    elif issue.flag == 'clarify_name' or issue.code == 'unknown_name':
+        item.name = value
+    elif issue.flag == 'clarify_slot':
+        for child in item.children:
+            if child.type == issue.slot and \
+                    not menu.index.allowed_in_combo(item.name, issue.slot, child.name):
+                child.name = value
+    else:
+        for child in item.children:
+            if not menu.index.allowed_in_deal(item.name, child.name):
+                child.name = value
+
+
+def run(menu: Menu, items: list, first_only: bool) -> tuple:
+    """
+    return turns and validation passes until the order has no questions left
+    """
+    manager = Manager()
+    order = Order(menu)
+    order.list = [OrderItem.model_validate(item) for item in items]
+    turns = 0
+    while True:
+        snapshot = list(order.list)
+        questions = [issue for issue in manager.validate(order, menu, first_only)
+                     if issue.severity == BLOCKING]
+        if not questions:
+            return turns
+        turns += 1
+        for issue in questions[:1] if first_only else questions:
+            answer(issue, snapshot[issue.item], menu)
+
+
+def main():
+    menu = Menu(dump_json=False)
+    corpus = load_corpus()
+    print(f"{'mode':>12} {'orders':>7} {'turns':>6} {'turns/order':>12} {'us/order':>9}")
+    for mode, first_only in [('first issue', True), ('all issues', False)]:
+        start = time.perf_counter()
+        turns = [run(menu, record['items'], first_only) for record in corpus]
+        elapsed = time.perf_counter() - start
+        print(f"{mode:>12} {len(corpus):>7} {sum(turns):>6} {sum(turns) / len(corpus):>12.2f} "
+              f"{elapsed / len(corpus) * 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Scaling of the stages after the model across cores: the recorded conversations of
+tests/fixtures replayed by many concurrent sessions, in the event loop and with 1 to
+--max-workers worker processes. Turns per second should grow with the workers up to the
+number of cores, until the event loop that talks to them is the bottleneck.
+
+Run from the repository root:
+    poetry run python benchmarks/bench_worker_pool.py --sessions 400
+"""
+import argparse
+import asyncio
+import os
+import time
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.replay import ReplayLLM, load_records
+from mcdonalds_proj.session import ConversationSession
+from mcdonalds_proj.worker_pool import PooledSession, TurnPool
+
+FIXTURES = 'tests/fixtures/conversations.jsonl'
+
+
+def run(menu: Menu, conversations: list, sessions: int, pool: TurnPool = None) -> float:
+    metrics = Metrics(False)
+
+    async def talk(number: int) -> int:
+        records = conversations[number % len(conversations)]
+        if pool is None:
+            session = ConversationSession(menu, ReplayLLM(records), metrics=metrics)
+        else:
+            session = PooledSession(menu, ReplayLLM(records), pool, f"s{number}", metrics)
+        session.start()
+        for record in records:
+            await session.step(record.user_msg)
+        return len(records)
+
+    async def talk_all() -> int:
+        return sum(await asyncio.gather(*(talk(number) for number in range(sessions))))
+
+    start = time.perf_counter()
+    turns = asyncio.run(talk_all())
+    return turns / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sessions', type=int, default=400)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    menu = Menu(dump_json=False)
+    conversations = list(load_records(FIXTURES).values())
+    print(f"{os.cpu_count()} cores, {args.sessions} concurrent sessions")
+    print(f"event loop   {run(menu, conversations, args.sessions):8.0f} turns/s")
+    workers = 1
+    while workers <= args.max_workers:
+        pool = TurnPool(workers)
+        run(menu, conversations, args.sessions, pool)
+        print(f"{workers:2} workers   {run(menu, conversations, args.sessions, pool):8.0f} turns/s")
+        pool.close()
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -1,67 +1,57 @@
+import argparse
 from dotenv import load_dotenv
 from termcolor import colored
 
-from mcdonalds_proj.manager import Manager
-from mcdonalds_proj.order import Order
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.conversation import ConversationMachine, Reply, Start
 from mcdonalds_proj.menu import Menu
 from mcdonalds_proj.llm import LLM
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.metrics import METRICS
+from mcdonalds_proj.replay import Recorder
+from mcdonalds_proj.router import ModelRouter, default_tiers
 
 
 def main():
+    parser = argparse.ArgumentParser(description="McDonald's assistant")
+    parser.add_argument('--record', help='append every turn to this JSON lines file')
+    parser.add_argument('--metrics', help='append the metrics of the order to this JSON lines file')
+    parser.add_argument('--cache-db', help='SQLite file that keeps the responses between runs')
+    parser.add_argument('--route', action='store_true',
+                        help='send simple turns to a smaller model, escalate rejected answers')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream the answers of the model and validate items as they arrive')
+    args = parser.parse_args()
     load_dotenv()
 
     menu = Menu()
-    manager = Manager()
-    llm = LLM()
-    order = Order(menu)
-
-    manager.start_taking_order()
-
-    while order.finished is False:
-        while manager.message_queue.empty() is False:
-            manager_msg = manager.message_queue.get()
-            print(colored(manager_msg.text, 'red'))
-
-            user_msg = input("User: ")
-
-            llm_response = llm.process(user_msg, manager_msg, order)
-            # print(llm_response)
-
-            manager.update_order(order, llm_response)
-            manager.validate(order, menu)
-
-            print(colored(manager.get_errors(), 'red'))
-            # print(order.summary())
-
-            handle_issues(manager, llm, order, menu)
-
-            manager.apply_business_rules(order, menu)
-
-        if order.finished is False:
-            manager.last_call()
-
-
-    manager.finish_taking_order(order)
-    manager_msg = manager.message_queue.get()
-    print(colored(manager_msg.text, 'red'))
-    return 0
-
-
-def handle_issues(manager: Manager, llm: LLM, order: Order, menu: Menu):
-    while manager.issue_queue.empty() is False:
-        manager_msg = manager.issue_queue.get()
-        print(colored(manager_msg.text, 'red'))
+    fast_path = FastPathInterpreter(menu)
+    cache = ResponseCache(sqlite_path=args.cache_db)
+    if args.route:
+        llm = ModelRouter(default_tiers(), fast_path, cache)
+    else:
+        llm = LLM(fast_path=fast_path, cache=cache, stream=args.stream)
+    if args.record:
+        llm = Recorder(llm, args.record)
+    machine = ConversationMachine(menu)
+
+    messages = machine.handle(Start())
+    while True:
+        for text in messages:
+            print(colored(text, 'red'))
+        if machine.finished:
+            break
 
         user_msg = input("User: ")
 
-        llm_response = llm.process(user_msg, manager_msg, order)
+        llm_response = llm.process(user_msg, machine.pending, machine.order)
         # print(llm_response)
+        messages = machine.handle(Reply(llm_response))
 
-        manager.update_order(order, llm_response)
-        manager.validate(order, menu)
+    if args.metrics:
+        METRICS.write_json_line(args.metrics)
+    return 0
 
-        # print(order.summary())
-        print(colored(manager.get_errors(), 'red'))
 
 if __name__ == "__main__":
     main()
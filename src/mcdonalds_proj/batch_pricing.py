@@ -0,0 +1,149 @@
+"""
+This module is responsible for pricing many orders at once, like when historical orders are
+audited after a price change. Lines of all orders are encoded as NumPy arrays of indices
+and counts once, then totals are computed with the same rules as Order.price_line.
+Needs numpy from the audit dependency group, the conversation itself does not use it
+"""
+from typing import Iterable, NamedTuple
+import numpy as np
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, UPSELL_MARKER
+
+SIZED_TYPES = ['drinks', 'fries', 'combos']
+# Types whose own added ingredients are charged
+MODIFIED_TYPES = ['burgers', 'fries']
+
+
+class EncodedOrders(NamedTuple):
+    """
+    Lines of many orders. Per line arrays have one entry per line, the other arrays
+    point to their line with *_line
+    """
+    n_orders: int
+    line_order: np.ndarray      # order of the line
+    line_item: np.ndarray       # index in BatchPricer.item_prices, -1 for deals
+    line_quantity: np.ndarray
+    deal_line: np.ndarray       # burgers of the deals
+    deal_burger: np.ndarray
+    modifier_line: np.ndarray   # charged ingredients
+    modifier_ingredient: np.ndarray
+    modifier_count: np.ndarray
+    sauce_line: np.ndarray      # sauces chosen for the combos
+    sauce_index: np.ndarray
+
+
+class BatchPricer():
+    """
+    Prices orders in integer cents with vectorized operations.
+    encode() is the only per-item Python loop, the encoding can be priced again with totals()
+    """
+
+    def __init__(self, menu: Menu) -> None:
+        self.menu = menu
+        prices = menu.prices
+        self.item_keys = list(prices.items)
+        self.item_index = {key: i for i, key in enumerate(self.item_keys)}
+        self.item_prices = np.array([prices.items[key] for key in self.item_keys], dtype=np.int64)
+        self.ingredient_index = {name: i for i, name in enumerate(prices.ingredients)}
+        self.ingredient_prices = np.array(list(prices.ingredients.values()), dtype=np.int64)
+        self.sauce_index = {name: i for i, name in enumerate(prices.sauces)}
+        self.sauce_prices = np.array(list(prices.sauces.values()), dtype=np.int64)
+        self.deal_discount_pct = prices.DEAL_DISCOUNT_PCT
+
+    def encode(self, orders: Iterable) -> EncodedOrders:
+        """encodes lines of the orders as arrays
+
+        Args:
+            orders (Iterable): Order objects or lists of OrderItem
+
+        Returns:
+            EncodedOrders: arrays of all lines
+        """
+        line_order, line_item, line_quantity = [], [], []
+        deal_line, deal_burger = [], []
+        modifier_line, modifier_ingredient, modifier_count = [], [], []
+        sauce_line, sauce_index = [], []
+        ingredient_index = self.ingredient_index
+
+        def add_modifiers(line, item, times=1):
+            for modifier in item.modifiers_to_add:
+                ingredient = ingredient_index.get(modifier.name)
+                if ingredient is not None:
+                    modifier_line.append(line)
+                    modifier_ingredient.append(ingredient)
+                    modifier_count.append(times * modifier.quantity)
+
+        n_orders = 0
+        for order in orders:
+            items = order.list if isinstance(order, Order) else order
+            for item in items:
+                line = len(line_order)
+                line_order.append(n_orders)
+                line_quantity.append(item.quantity)
+                if item.type == 'deals':
+                    line_item.append(-1)
+                    for child in item.children:
+                        deal_line.append(line)
+                        deal_burger.append(self.item_index[('burgers', child.name, None)])
+                        add_modifiers(line, child, item.quantity)
+                    continue
+                size = item.size if item.type in SIZED_TYPES else None
+                line_item.append(self.item_index[(item.type, item.name, size)])
+                if item.type == 'combos':
+                    for modifier in item.modifiers_to_add:
+                        # items straight from the LLM still carry the marker
+                        if modifier.name != UPSELL_MARKER:
+                            sauce_line.append(line)
+                            sauce_index.append(self.sauce_index[modifier.name])
+                    for child in item.children:
+                        add_modifiers(line, child)
+                elif item.type in MODIFIED_TYPES:
+                    add_modifiers(line, item)
+            n_orders += 1
+
+        def array(values):
+            return np.array(values, dtype=np.int64)
+        return EncodedOrders(n_orders, array(line_order), array(line_item), array(line_quantity),
+                             array(deal_line), array(deal_burger), array(modifier_line),
+                             array(modifier_ingredient), array(modifier_count),
+                             array(sauce_line), array(sauce_index))
+
+    def line_totals(self, encoded: EncodedOrders) -> np.ndarray:
+        """
+        return price of every line in cents
+        """
+        n_lines = len(encoded.line_item)
+
+        def per_line(lines, values):
+            # bincount sums in float64, which is exact for cents far beyond any order total
+            return np.rint(np.bincount(lines, weights=values, minlength=n_lines)).astype(np.int64)
+
+        is_deal = encoded.line_item < 0
+        unit = np.where(is_deal, 0, self.item_prices[np.maximum(encoded.line_item, 0)])
+        burgers = per_line(encoded.deal_line, self.item_prices[encoded.deal_burger])
+        unit += burgers
+        discount = np.where(is_deal, (burgers * self.deal_discount_pct + 50) // 100, 0)
+        modifiers = per_line(encoded.modifier_line,
+                             self.ingredient_prices[encoded.modifier_ingredient]
+                             * encoded.modifier_count)
+        sauces = per_line(encoded.sauce_line, self.sauce_prices[encoded.sauce_index])
+        return encoded.line_quantity * (unit - discount) + modifiers + sauces
+
+    def totals(self, encoded: EncodedOrders) -> np.ndarray:
+        """
+        return total of every order in cents
+        """
+        lines = self.line_totals(encoded)
+        return np.rint(np.bincount(encoded.line_order, weights=lines,
+                                   minlength=encoded.n_orders)).astype(np.int64)
+
+    def price_orders(self, orders: Iterable) -> np.ndarray:
+        """prices the orders
+
+        Args:
+            orders (Iterable): Order objects or lists of OrderItem
+
+        Returns:
+            np.ndarray: total of every order in cents, in the same order
+        """
+        return self.totals(self.encode(orders))
@@ -0,0 +1,127 @@
+"""
+This module is responsible for turning burgers of the order into Double Deals.
+Burgers are aggregated into counts per deal and per identical burger, so the solver
+works on a few groups instead of single burgers however large the order is
+"""
+from typing import List, NamedTuple
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Item, Child
+
+
+class BurgerGroup(NamedTuple):
+    """
+    Identical burgers that can go into the same deal, lines are positions in the order
+    """
+    deal: str
+    name: str
+    price: int
+    template: Item
+    lines: list
+
+
+def _burger_key(item: Item, menu: Menu) -> tuple:
+    return (item.name,) + menu.index.ingredients.key(item)
+
+
+def _child(item: Item) -> Child:
+    return Child(
+        name=item.name,
+        type=item.type,
+        modifiers_to_add=item.modifiers_to_add[:],
+        modifiers_to_remove=item.modifiers_to_remove[:]
+    )
+
+
+def group_burgers(items: list, menu: Menu) -> List[BurgerGroup]:
+    """
+    return groups of identical burgers that are allowed in a deal.
+    A burger allowed in several deals goes to the first one of the menu
+    """
+    deal_of = {}
+    for deal, burgers in menu.menu['deals'].items():
+        for burger in burgers:
+            deal_of.setdefault(burger, deal)
+    groups = {}
+    for position, item in enumerate(items):
+        if item.type != 'burgers' or item.name not in deal_of or item.quantity < 1:
+            continue
+        key = _burger_key(item, menu)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = BurgerGroup(deal_of[item.name], item.name,
+                                              menu.prices.item('burgers', item.name), item, [])
+        group.lines.append(position)
+    return list(groups.values())
+
+
+def solve_deals(items: list, menu: Menu) -> tuple:
+    """finds the cheapest set of deals for the burgers of the order.
+
+    The discount is a fixed share of the price of both burgers, so the cheapest order
+    pairs every burger of a deal except the cheapest one when their number is odd.
+    Burgers are paired from the most expensive down, identical pairs become one deal
+    line with a quantity.
+
+    Args:
+        items (list): lines of the order
+        menu (Menu): menu with the deals and prices
+
+    Returns:
+        tuple: list of deal OrderItems and dict position of a burger line -> burgers it gave
+    """
+    deals = []
+    used = {}
+    groups = group_burgers(items, menu)
+    for deal in menu.menu['deals']:
+        # sort is stable, so equal prices keep the order of the lines
+        pool = sorted((group for group in groups if group.deal == deal),
+                      key=lambda group: -group.price)
+        counts = [sum(items[position].quantity for position in group.lines) for group in pool]
+        taken = [0] * len(pool)
+        carry = None
+        for i, group in enumerate(pool):
+            left = counts[i]
+            if carry is not None:
+                deals.append((deal, pool[carry], group, 1))
+                taken[carry] += 1
+                taken[i] += 1
+                left -= 1
+                carry = None
+            if left >= 2:
+                deals.append((deal, group, group, left // 2))
+                taken[i] += left - left % 2
+            if left % 2:
+                carry = i
+        # the burger left in carry is the cheapest one and stays out of the deals
+        for group, count in zip(pool, taken):
+            for position in group.lines:
+                if count == 0:
+                    break
+                take = min(count, items[position].quantity)
+                used[position] = take
+                count -= take
+
+    deal_items = [Item(name=deal, type='deals', quantity=quantity,
+                       children=[_child(first.template), _child(second.template)])
+                  for deal, first, second, quantity in deals]
+    return deal_items, used
+
+
+def apply_deals(order, menu: Menu) -> int:
+    """
+    replaces the burgers of the order with the cheapest set of deals and
+    returns the number of deals that were made
+    """
+    deal_items, used = solve_deals(order.list, menu)
+    if not deal_items:
+        return 0
+    items = []
+    for position, item in enumerate(order.list):
+        taken = used.get(position, 0)
+        if taken:
+            item.quantity -= taken
+            if item.quantity == 0:
+                continue
+        items.append(item)
+    order.list = items + deal_items
+    return sum(item.quantity for item in deal_items)
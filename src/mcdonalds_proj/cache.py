@@ -0,0 +1,124 @@
+"""
+This module is responsible for caching the responses of the LLM.
+The same utterance in the same state of the conversation gives the same order, so the response
+is reused instead of calling the model again. Responses live in a bounded in-memory LRU
+and optionally in a SQLite file shared by the worker processes
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+from pydantic import BaseModel
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.order import Order, OrderState, OrderDelta
+from mcdonalds_proj.prompt import order_fingerprint
+
+RESPONSE_MODELS = {'OrderState': OrderState, 'OrderDelta': OrderDelta}
+
+
+def normalize_text(text: str) -> str:
+    """
+    return utterance in lower case without punctuation and repeated spaces
+    """
+    return ' '.join(re.findall(r"[a-z0-9&]+", text.lower().replace("'", "").replace('’', '')))
+
+
+class ResponseCache():
+    """
+    LRU cache of LLM responses with a time to live.
+    Entries are stored as JSON, so every hit returns a new object that the caller can change
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0, sqlite_path: str = None,
+                 max_disk_size: int = 100000, clock: Callable[[], float] = time.time,
+                 metrics: Metrics = METRICS) -> None:
+        """
+        Args:
+            max_size (int): entries kept in memory
+            ttl (float): seconds an entry is valid
+            sqlite_path (str): file of the shared on-disk tier, no disk tier if not given
+            max_disk_size (int): entries kept in the SQLite file
+            clock (Callable): wall clock, shared by the processes that use the same file
+            metrics (Metrics): receives hits and misses per tier
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_disk_size = max_disk_size
+        self.clock = clock
+        self.metrics = metrics
+        self.entries = OrderedDict()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self.db = None
+        self.writes = 0
+        if sqlite_path:
+            self.db = sqlite3.connect(sqlite_path, timeout=5.0, check_same_thread=False)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+                            "expires_at REAL, response_type TEXT, body TEXT)")
+            self.db.commit()
+
+    def key(self, user_msg: str, manager_msg, order: Order, response_type: str,
+            prev_message: str = None) -> str:
+        """
+        return key of the turn: utterance, order, manager's question, menu version,
+        the type of the response and the previous utterance, which is in the prompt too
+        """
+        parts = [normalize_text(user_msg), order_fingerprint(order.list), manager_msg.flag,
+                 manager_msg.text, getattr(order.menu, 'version', None), response_type,
+                 normalize_text(prev_message) if prev_message is not None else None]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[BaseModel]:
+        now = self.clock()
+        entry = self.entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self.entries.move_to_end(key)
+                self.stats['hits'] += 1
+                self.metrics.inc('cache_requests_total', result='hit', tier='memory')
+                return RESPONSE_MODELS[entry[1]].model_validate_json(entry[2])
+            del self.entries[key]
+        if self.db is not None:
+            row = self.db.execute("SELECT expires_at, response_type, body FROM responses "
+                                  "WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[0] > now:
+                self._remember(key, row)
+                self.stats['disk_hits'] += 1
+                self.metrics.inc('cache_requests_total', result='hit', tier='disk')
+                return RESPONSE_MODELS[row[1]].model_validate_json(row[2])
+        self.stats['misses'] += 1
+        self.metrics.inc('cache_requests_total', result='miss')
+        return None
+
+    def put(self, key: str, response: BaseModel) -> None:
+        entry = (self.clock() + self.ttl, type(response).__name__, response.model_dump_json())
+        self._remember(key, entry)
+        if self.db is not None:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)", (key, *entry))
+            self.db.commit()
+            self.writes += 1
+            if self.writes % 100 == 0:
+                self.prune_disk()
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats['evictions'] += 1
+            self.metrics.inc('cache_evictions_total')
+
+    def prune_disk(self) -> None:
+        """
+        removes expired entries and the ones that expire first above max_disk_size
+        """
+        self.db.execute("DELETE FROM responses WHERE expires_at <= ?", (self.clock(),))
+        self.db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                        "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_size,))
+        self.db.commit()
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,70 @@
+"""
+This module is responsible for asking the customer about all pending problems of the order at once.
+Questions from the issue queue are merged into one numbered question, so a single answer
+and a single LLM call can resolve them together
+"""
+from typing import List
+from mcdonalds_proj.manager import ManagerMessage, MessageQueue
+
+MERGED_FLAG = 'clarify_many'
+
+
+def _question(text: str) -> str:
+    text = text.removeprefix("System:").strip()
+    return ' '.join(text.split())
+
+
+class ClarificationPlanner():
+    """
+    Merges compatible questions: at most max_questions of them and never two about the same
+    item slot, since one answer cannot give two values for it. A single question is kept as it is,
+    so the fast path can still answer it
+    """
+
+    def __init__(self, max_questions: int = 3) -> None:
+        self.max_questions = max_questions
+
+    def plan(self, questions: List[ManagerMessage]) -> List[ManagerMessage]:
+        """merges the questions into as few messages as possible
+
+        Args:
+            questions (List[ManagerMessage]): pending questions in the order they were found
+
+        Returns:
+            List[ManagerMessage]: messages to ask, merged ones have the flag 'clarify_many'
+                and the original questions in parts
+        """
+        groups = []
+        for question in questions:
+            key = (question.flag, question.subject, question.slot)
+            for group in groups:
+                if len(group) < self.max_questions and \
+                        key not in [(part.flag, part.subject, part.slot) for part in group]:
+                    group.append(question)
+                    break
+            else:
+                groups.append([question])
+
+        messages = []
+        for group in groups:
+            if len(group) == 1:
+                messages.append(group[0])
+                continue
+            lines = [f"{number}. {_question(part.text)}" for number, part in enumerate(group, 1)]
+            text = "System: Please help me with a few details:\n" + '\n'.join(lines)
+            message = ManagerMessage(text, MERGED_FLAG)
+            message.parts = group
+            messages.append(message)
+        return messages
+
+    def merge_queue(self, queue: MessageQueue) -> MessageQueue:
+        """
+        return new queue with the planned messages of the pending questions of the queue
+        """
+        questions = []
+        while not queue.empty():
+            questions.append(queue.get())
+        merged = MessageQueue()
+        for message in self.plan(questions):
+            merged.put(message)
+        return merged
@@ -0,0 +1,139 @@
+"""
+This module is responsible for the states of a conversation and the transitions between them.
+ConversationMachine takes typed events and never blocks or waits for input, so the command line
+loop, the async sessions of the server and the worker processes all step the same machine.
+Every transition is counted in the metrics with its source and target state
+"""
+from typing import List, NamedTuple, Optional, Union
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.manager import Manager, ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.order import Order, OrderDelta, OrderState
+
+# States of a conversation, named after the question that waits for the customer's answer
+TAKING_ORDER = 'taking_order'
+CLARIFYING = 'clarifying'
+UPSELLING = 'upselling'
+LAST_CALL = 'last_call'
+FINISHED = 'finished'
+STATES = (TAKING_ORDER, CLARIFYING, UPSELLING, LAST_CALL, FINISHED)
+
+# Questions of the message queue and the state they put the conversation in
+FLAG_STATES = {
+    'general': TAKING_ORDER,
+    'last_call': LAST_CALL,
+    'sauce_offered': UPSELLING,
+    'combo_offered': UPSELLING,
+    'dessert_offered': UPSELLING,
+}
+
+
+class Start(NamedTuple):
+    """
+    The customer arrived, the machine greets them
+    """
+
+
+class Reply(NamedTuple):
+    """
+    The model's response to the customer's answer to the pending question
+    """
+    response: Union[OrderState, OrderDelta]
+
+
+class ConversationMachine():
+    """
+    State machine of one conversation. handle() runs one transition and returns the messages
+    for the customer, the last one is the pending question; events in FINISHED are ignored.
+    All state lives in the machine, its Manager and its Order
+    """
+
+    def __init__(self, menu: Menu, manager: Manager = None, order: Order = None,
+                 planner: ClarificationPlanner = None, metrics: Metrics = METRICS) -> None:
+        self.menu = menu
+        self.manager = manager or Manager()
+        self.order = order or Order(menu)
+        self.planner = planner or ClarificationPlanner()
+        self.metrics = metrics
+        self.state = TAKING_ORDER
+        # question the customer answers next, None before Start and once finished
+        self.pending: Optional[ManagerMessage] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state == FINISHED
+
+    def handle(self, event: Union[Start, Reply]) -> List[str]:
+        """runs the transition of the event
+
+        Args:
+            event (Start | Reply): what happened
+
+        Returns:
+            List[str]: messages for the customer
+        """
+        if self.state == FINISHED:
+            return []
+        source = self.state
+        with self.metrics.span('transition'):
+            if isinstance(event, Reply):
+                output = self._reply(event.response)
+            elif isinstance(event, Start):
+                self.manager.start_taking_order()
+                output = [self._next_message().text]
+            else:
+                raise TypeError(f"Unknown event: {event!r}")
+        self.metrics.inc('transitions_total', source=source, target=self.state)
+        return output
+
+    def _reply(self, response) -> List[str]:
+        metrics = self.metrics
+        manager = self.manager
+        with metrics.span('update_order'):
+            manager.update_order(self.order, response)
+        with metrics.span('validate'):
+            manager.validate(self.order, self.menu)
+        with metrics.span('clarify'):
+            manager.issue_queue = self.planner.merge_queue(manager.issue_queue)
+        metrics.set('issue_queue_depth', manager.issue_queue.qsize())
+
+        output = []
+        errors = manager.get_errors()
+        if errors:
+            output.append(errors)
+
+        # clarifications go before anything else
+        if not manager.issue_queue.empty():
+            self._ask(manager.issue_queue.get(), CLARIFYING)
+            output.append(self.pending.text)
+            return output
+
+        with metrics.span('business_rules'):
+            manager.apply_business_rules(self.order, self.menu)
+        output.append(self._next_message().text)
+        return output
+
+    def _next_message(self) -> ManagerMessage:
+        """
+        return next queued question, last call or the final summary once the order is finished.
+        Offers about items that left the order are dropped
+        """
+        queue = self.manager.message_queue
+        while not queue.empty():
+            msg = queue.get()
+            if msg.subject is None or any(item.name == msg.subject for item in self.order.list):
+                return self._ask(msg)
+        if self.order.finished is False:
+            self.manager.last_call()
+            return self._ask(queue.get())
+        with self.metrics.span('finish_order'):
+            self.manager.finish_taking_order(self.order)
+        self.state = FINISHED
+        self.pending = None
+        return queue.get()
+
+    def _ask(self, msg: ManagerMessage, state: str = None) -> ManagerMessage:
+        self.state = state or FLAG_STATES.get(msg.flag, TAKING_ORDER)
+        self.pending = msg
+        return msg
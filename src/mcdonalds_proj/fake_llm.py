@@ -0,0 +1,50 @@
+"""
+This module is responsible for an offline stand-in of the LLM.
+It understands menu names, sizes and yes/no answers, which is enough to drive whole
+conversations in tests and load benchmarks without network access.
+"""
+import asyncio
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderState, OrderItem, to_model
+
+
+class FakeLLM():
+    """
+    Class with the interface of LLM that never calls the model
+    """
+
+    def __init__(self, menu: Menu, latency: float = 0.0,
+                 fast_path: FastPathInterpreter = None) -> None:
+        """
+        Args:
+            menu (Menu): menu to recognise items from
+            latency (float): seconds every call waits, to imitate the model
+            fast_path (FastPathInterpreter): shared interpreter, created if not given
+        """
+        self.menu = menu
+        self.latency = latency
+        self.fast_path = fast_path or FastPathInterpreter(menu)
+        self.prev_message = "None"
+        self.path_counts = {'fast_path': 0, 'llm': 0}
+
+    def process(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
+        self.prev_message = user_msg
+        response = self.fast_path.interpret(user_msg, manager_msg, order)
+        if response is not None:
+            self.path_counts['fast_path'] += 1
+            return response
+        self.path_counts['llm'] += 1
+        reply = self.fast_path.parse(user_msg)
+        items = [to_model(item) for item in order.list]
+        size = next(iter(reply.sizes), None)
+        for category, name in reply.items:
+            sized = category in self.menu.index.SIZED_CATEGORIES
+            items.append(OrderItem(name=name, type=category, size=size if sized else None))
+        return OrderState(items=items, order_finished=reply.answer == 'no' and not reply.items)
+
+    async def aprocess(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.process(user_msg, manager_msg, order)
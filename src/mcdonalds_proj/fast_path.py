@@ -0,0 +1,303 @@
+"""
+This module is responsible for answering short replies to the manager's closed questions
+without the LLM. Like "yes", "no", "large", "BBQ sauce" or "Sprite".
+"""
+import re
+from typing import Optional
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderState, Item, Child, Ingredient, to_state
+
+# Phrases that answer a closed question
+ANSWERS = {
+    'yes': ['yes', 'yeah', 'yep', 'yup', 'sure', 'ok', 'okay', 'of course', 'why not',
+            'sounds good', 'go ahead', 'absolutely'],
+    'no': ['no', 'nope', 'nah', 'no thanks', 'no thank you', 'nothing', 'nothing else',
+           'thats all', 'that is all', 'thats it', 'that is it', 'im good', 'i am good',
+           'im done', 'i am done', 'all good', 'not now', 'no more'],
+}
+
+SIZES = {
+    'small': 'small', 'smallest': 'small', 'little': 'small',
+    'medium': 'medium', 'regular': 'medium', 'normal': 'medium',
+    'large': 'large', 'largest': 'large', 'big': 'large', 'biggest': 'large',
+}
+
+# Colloquial names of menu items
+ALIASES = {
+    'coke': 'Coca-Cola',
+    'cola': 'Coca-Cola',
+    'fries': 'French Fries',
+    'dips': 'Potato Dips',
+    'bbq': 'BBQ Sauce',
+    'barbecue': 'BBQ Sauce',
+    'barbecue sauce': 'BBQ Sauce',
+    'sweet and sour': 'Sweet & Sour Sauce',
+    'sweet and sour sauce': 'Sweet & Sour Sauce',
+    'buffalo': 'Buffalo Sauce',
+    'ranch sauce': 'Ranch',
+    'ketchup sauce': 'Ketchup',
+    'oreo': 'McFlurry with Oreo',
+    'oreo mcflurry': 'McFlurry with Oreo',
+    'm&ms': "McFlurry with M&M's",
+    'm&ms mcflurry': "McFlurry with M&M's",
+    'cone': 'Vanilla Cone',
+    'cookie': 'Chocolate Chip Cookie',
+    'pie': 'Apple Pie',
+}
+
+# Words that do not change the meaning of a short reply
+FILLER = {
+    'a', 'an', 'the', 'i', 'id', 'ill', 'would', 'like', 'want', 'have', 'take', 'get', 'please',
+    'thanks', 'thank', 'you', 'it', 'make', 'one', 'some', 'with', 'for', 'me', 'lets', 'do',
+    'go', 'size', 'of', 'course', 'just', 'then', 'and', 'my', 'can', 'could', 'sauce',
+}
+
+SLOT_CATEGORIES = ['burgers', 'drinks', 'fries', 'desserts', 'sauces', 'combos']
+
+
+def _tokens(text: str) -> list:
+    return re.findall(r"[a-z0-9&]+", text.lower().replace("'", "").replace('’', ''))
+
+
+class Reply():
+    """
+    Parsed short reply: yes/no answer, menu items, sizes and the words that were not understood
+    """
+
+    def __init__(self) -> None:
+        self.answers = set()
+        self.items = []
+        self.sizes = set()
+        self.unknown = []
+
+    @property
+    def answer(self) -> Optional[str]:
+        return next(iter(self.answers)) if len(self.answers) == 1 else None
+
+
+class FastPathInterpreter():
+    """
+    Applies replies to the manager's closed questions directly to the order.
+    Each handler returns None when it is not confident, then the LLM has to process the turn.
+    """
+
+    def __init__(self, menu: Menu) -> None:
+        self.menu = menu
+        phrases = {}
+        for category in SLOT_CATEGORIES:
+            for name in menu.menu[category]:
+                phrases.setdefault(tuple(_tokens(name)), ('item', (category, name)))
+        for alias, name in ALIASES.items():
+            category = menu.index.category_of.get(name)
+            if category in SLOT_CATEGORIES:
+                phrases.setdefault(tuple(_tokens(alias)), ('item', (category, name)))
+        for answer, words in ANSWERS.items():
+            for phrase in words:
+                phrases[tuple(_tokens(phrase))] = ('answer', answer)
+        for word, size in SIZES.items():
+            phrases.setdefault((word,), ('size', size))
+        self.phrases = phrases
+        self.max_phrase = max(len(phrase) for phrase in phrases)
+        self.handlers = {
+            'last_call': self.answer_last_call,
+            'dessert_offered': self.answer_dessert_offered,
+            'sauce_offered': self.answer_sauce_offered,
+            'combo_offered': self.answer_combo_offered,
+            'clarify_size': self.answer_size,
+            'clarify_slot': self.answer_slot,
+            'clarify_name': self.answer_name,
+            'clarify_many': self.answer_many,
+        }
+
+    def parse(self, user_msg: str) -> Reply:
+        """
+        return reply parsed with the longest phrase match at every position
+        """
+        reply = Reply()
+        tokens = _tokens(user_msg)
+        i = 0
+        while i < len(tokens):
+            for length in range(min(self.max_phrase, len(tokens) - i), 0, -1):
+                match = self.phrases.get(tuple(tokens[i:i + length]))
+                if match:
+                    kind, value = match
+                    if kind == 'answer':
+                        reply.answers.add(value)
+                    elif kind == 'item':
+                        reply.items.append(value)
+                    else:
+                        reply.sizes.add(value)
+                    i += length
+                    break
+            else:
+                if tokens[i] not in FILLER:
+                    reply.unknown.append(tokens[i])
+                i += 1
+        return reply
+
+    def interpret(self, user_msg: str, manager_msg: ManagerMessage,
+                  order: Order) -> Optional[OrderState]:
+        """applies the reply to the order if it is a confident answer to the manager's question
+
+        Returns:
+            Optional[OrderState]: new state of the order or None if the LLM has to process it
+        """
+        handler = self.handlers.get(manager_msg.flag)
+        if handler is None:
+            return None
+        reply = self.parse(user_msg)
+        if reply.unknown or len(reply.answers) > 1 or len(reply.sizes) > 1:
+            return None
+        return handler(reply, manager_msg, order)
+
+    def _unchanged(self, order: Order, finished: bool = False) -> OrderState:
+        return to_state(order.list, finished)
+
+    def answer_last_call(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        if reply.items or reply.sizes or reply.answer is None:
+            return None
+        return self._unchanged(order, finished=reply.answer == 'no')
+
+    def answer_dessert_offered(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        if reply.sizes:
+            return None
+        if reply.answer == 'no' and not reply.items:
+            return self._unchanged(order)
+        if reply.answer == 'no' or len(reply.items) != 1 or reply.items[0][0] != 'desserts':
+            return None
+        order.list.append(Item(name=reply.items[0][1], type='desserts'))
+        return self._unchanged(order)
+
+    def answer_sauce_offered(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        if reply.sizes:
+            return None
+        if reply.answer == 'no' and not reply.items:
+            return self._unchanged(order)
+        if reply.answer == 'no' or len(reply.items) != 1:
+            return None
+        sauce = reply.items[0][1]
+        if not self.menu.index.allowed_in_combo(manager_msg.subject, 'sauces', sauce):
+            return None
+        for item in order.list:
+            if item.type == 'combos' and item.name == manager_msg.subject and \
+                    not item.modifiers_to_add:
+                item.modifiers_to_add.append(Ingredient(sauce))
+                return self._unchanged(order)
+        return None
+
+    def answer_combo_offered(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        burger = manager_msg.subject
+        combo = f"{burger} Meal"
+        if reply.answer == 'no' and not reply.items and not reply.sizes:
+            return self._unchanged(order)
+        if reply.answer == 'no' or not self.menu.index.has_item('combos', combo):
+            return None
+        slots = {}
+        for category, name in reply.items:
+            if category == 'combos' and name == combo:
+                continue
+            if category not in ['drinks', 'fries'] or category in slots or \
+                    not self.menu.index.allowed_in_combo(combo, category, name):
+                return None
+            slots[category] = name
+        if reply.answer != 'yes' and not slots and not reply.items:
+            return None
+
+        for position, item in enumerate(order.list):
+            if item.type == 'burgers' and item.name == burger:
+                order.list[position] = Item(
+                    name=combo,
+                    type='combos',
+                    size=next(iter(reply.sizes), None),
+                    quantity=item.quantity,
+                    children=[
+                        Child(
+                            name=burger,
+                            type='burgers',
+                            modifiers_to_add=item.modifiers_to_add,
+                            modifiers_to_remove=item.modifiers_to_remove),
+                        Child(name=slots.get('drinks'), type='drinks'),
+                        Child(name=slots.get('fries', 'French Fries'), type='fries'),
+                    ])
+                return self._unchanged(order)
+        return None
+
+    def answer_size(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        if len(reply.sizes) != 1 or reply.answer == 'no':
+            return None
+        if any(name != manager_msg.subject for _, name in reply.items):
+            return None
+        size = next(iter(reply.sizes))
+        # items without a size or with a size the menu does not have
+        items = [item for item in order.list if item.name == manager_msg.subject and
+                 item.size not in self.menu.index.sizes.get((item.type, item.name), ())]
+        if not items or size not in self.menu.index.sizes.get((items[0].type, items[0].name), ()):
+            return None
+        for item in items:
+            item.size = size
+        return self._unchanged(order)
+
+    def answer_slot(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        if reply.sizes or reply.answer == 'no' or len(reply.items) != 1:
+            return None
+        category, name = reply.items[0]
+        if category != manager_msg.slot or \
+                not self.menu.index.allowed_in_combo(manager_msg.subject, category, name):
+            return None
+        for item in order.list:
+            if item.type != 'combos' or item.name != manager_msg.subject:
+                continue
+            for child in item.children or []:
+                if child.type == category and \
+                        not self.menu.index.allowed_in_combo(item.name, category, child.name):
+                    child.name = name
+                    return self._unchanged(order)
+        return None
+
+    def answer_name(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        if reply.answer == 'no' or len(reply.items) != 1:
+            return None
+        category, name = reply.items[0]
+        if not self.menu.index.has_item(manager_msg.slot, name):
+            return None
+        for item in order.list:
+            if item.type == manager_msg.slot and item.name in [None, 'None']:
+                item.name = name
+                if reply.sizes:
+                    item.size = next(iter(reply.sizes))
+                return self._unchanged(order)
+        return None
+
+    def answer_many(self, reply: Reply, manager_msg: ManagerMessage, order: Order):
+        """
+        answers merged questions when every part gets exactly one size or item of the reply
+        """
+        if reply.answer == 'no':
+            return None
+        parts = []
+        items = list(reply.items)
+        for part in manager_msg.parts:
+            sub = Reply()
+            if part.flag == 'clarify_size':
+                sub.sizes = set(reply.sizes)
+                # "large fries" names the item the size is for
+                items = [item for item in items if item[1] != part.subject]
+            elif part.flag in ['clarify_slot', 'clarify_name']:
+                matches = [item for item in items if item[0] == part.slot]
+                if len(matches) != 1:
+                    return None
+                sub.items = matches
+                items.remove(matches[0])
+            else:
+                return None
+            parts.append((part, sub))
+        # one size answers all size questions, like "all large"
+        asks_size = any(part.flag == 'clarify_size' for part, _ in parts)
+        if items or asks_size != bool(reply.sizes):
+            return None
+        # parts answered before a failing one stay applied, they are correct answers either way
+        for part, sub in parts:
+            if self.handlers[part.flag](sub, part, order) is None:
+                return None
+        return self._unchanged(order)
@@ -1,30 +1,23 @@
 """
 This module is responsible for all actions related to LLM.
+openai and instructor are imported when the first client is created: they take most of
+the startup time and are not needed by turns answered without the model
 """
 
-from openai import OpenAI
-import instructor
-from mcdonalds_proj.order import OrderState
+from mcdonalds_proj.order import OrderState, OrderDelta
 from mcdonalds_proj.manager import ManagerMessage
 from mcdonalds_proj.order import Order
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.streaming import StreamingExtraction
+from mcdonalds_proj.prompt import (MenuContextBuilder, PrefixFingerprints, PREFIX_FINGERPRINTS,
+                                   encode_order)
 
 
-class LLM:
-    """
-    Class to replesent LLM object
-    """
-
-    def __init__(self) -> None:
-        self.model = 'gpt-4.1-mini'
-        self.max_retries = 5
-        self.client = instructor.from_openai(OpenAI())
-        self.prev_message = "None"
-
-    def process(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
-        return self.process_general_question(user_msg, manager_msg, order)
-
-    def process_general_question(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
-        system_prompt = f"""
+# Static part of the system prompt. It has to stay byte-identical across turns and sessions
+# so that provider-side prompt caching can reuse it; per-turn values go to build_context.
+GUIDELINES = """
         You are an AI assistant responsible for taking food orders at McDonald's. 
         You will receive free-text customer input like: "I want two cheeseburgers and a Sprite."
         Your task is to extract the customer's intent from natural language input
@@ -56,6 +49,14 @@ class LLM:
         - Size applies only to 'fries', 'drinks' and 'combos' types.
         - Fries and drinks inside combos do not have sizes, they inherit the same size as of the combo.
 
+        CURRENT ORDER STATE
+        - The current order state has one line per item: #ID quantity x name [type] size add(...) remove(...) with(...).
+        - add and remove list the modifiers, '2x Mayo' is a modifier with quantity 2. with lists the nested items (ChildrenItem) separated by ';'.
+        - A missing size is left out, a missing name is None. Always return the order as OrderItem objects.
+
+        CLARIFICATIONS
+        - The assistant may ask several numbered questions in one message. The customer can answer all of them at once, apply every answer to the item the question is about.
+
         'order_finished' FLAG  
         - Only when asked 'Would you like anything else?' If the customer indicates they don't want anything else, set 'order_finished = True'. 
 
@@ -90,25 +91,331 @@ class LLM:
 
         10. INVALID ENTRIES  
         - Ingredients cannot be ordered standalone. Ignore if attempted.
-    
-        --- CONTEXT ---
-        - Previous user message: {self.prev_message}
-        - Current order state: {order.list}
-        - Assistant's message: {manager_msg.text}
-        - Menu: {str(order.menu.menu)}
+"""
+
+# Appended to the static prefix when the LLM returns changes instead of the whole order
+DELTA_GUIDELINES = """
+        OUTPUT AS CHANGES
+        - Do not repeat the whole order. Return only the operations that change the current order state.
+        - Items of the current order state are numbered as #ID. Use that ID in item_id.
+        - 'add' a new item, 'remove' an item, 'update' only the changed fields of an item (patch),
+          'replace' an item when it turns into another one (e.g. a burger into a combo).
+        - If nothing changes, return no operations.
+"""
+
+MENU_HEADER = """
+        --- MENU ---
+        Ln labels refer to the shared lists at the top of the menu.
+"""
+
+
+def create_client(asynchronous: bool = False):
+    """
+    return instructor client of OpenAI, AsyncOpenAI if asynchronous
+    """
+    import instructor
+    from openai import AsyncOpenAI, OpenAI
+
+    return instructor.from_openai(AsyncOpenAI() if asynchronous else OpenAI())
+
+
+class LLM:
+    """
+    Class to replesent LLM object
+    """
+
+    def __init__(self, prune_menu: bool = False,
+                 prefix_fingerprints: PrefixFingerprints = PREFIX_FINGERPRINTS,
+                 fast_path: FastPathInterpreter = None, output_mode: str = 'full',
+                 metrics: Metrics = METRICS, cache: ResponseCache = None,
+                 model: str = 'gpt-4.1-mini', count_turns: bool = True,
+                 stream: bool = False) -> None:
+        """
+        Args:
+            prune_menu (bool): send only the part of the menu relevant to the turn.
+                The menu then moves from the static prefix to the per-turn context
+            prefix_fingerprints (PrefixFingerprints): collects fingerprints of the static prefix
+            fast_path (FastPathInterpreter): answers short replies without calling the model
+            output_mode (str): 'full' to get the whole OrderState every turn,
+                'delta' to get only the changes as OrderDelta
+            metrics (Metrics): receives the timings of the prompt and the model call,
+                turns per path, model attempts, errors and tokens
+            cache (ResponseCache): reuses responses of turns that were already answered
+            model (str): OpenAI model of every call
+            count_turns (bool): count turns per path in the metrics, False for the backends
+                of a ModelRouter, which counts every turn once whatever tiers it went through
+            stream (bool): process and aprocess stream the response, see process_stream
+        """
+        if stream and output_mode == 'delta':
+            raise ValueError("Streaming works with output_mode='full' only")
+        self.model = model
+        self.max_retries = 5
+        self.metrics = metrics
+        # Created on first use, the async one inside the running event loop
+        self._client = None
+        self._async_client = None
+        self.prev_message = "None"
+        self.prune_menu = prune_menu
+        self.menu_context = None
+        # Estimated menu tokens of the last turn compared to str(menu.menu)
+        self.context_stats = None
+        self.prefix_fingerprints = prefix_fingerprints
+        self.fast_path = fast_path
+        self.output_mode = output_mode
+        self.response_model = OrderDelta if output_mode == 'delta' else OrderState
+        # How many turns were answered by the fast path and by the model
+        self.path_counts = {'fast_path': 0, 'cache': 0, 'llm': 0}
+        self.count_turns = count_turns
+        self.stream = stream
+        self.cache = cache
+        # Time to the first validated item / clarification of the last streamed turn
+        self.stream_stats = None
+        # Tokens of all calls of this object
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self.add_hooks(create_client())
+        return self._client
+
+    @client.setter
+    def client(self, client) -> None:
+        self._client = client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = self.add_hooks(create_client(asynchronous=True))
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client) -> None:
+        self._async_client = client
+
+    def build_menu_context(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> str:
+        if self.menu_context is None or self.menu_context.menu is not order.menu:
+            self.menu_context = MenuContextBuilder(order.menu, prune=self.prune_menu)
+        context = self.menu_context.build(user_msg, order, manager_msg)
+        self.context_stats = self.menu_context.last_stats
+        return context
+
+    def process(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
+        if self.stream:
+            return self.process_stream(user_msg, manager_msg, order)
+        response = self.process_fast_path(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        key, response = self.process_cached(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        self.count_path('llm')
+        response = self.process_general_question(user_msg, manager_msg, order)
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    async def aprocess(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
+        """
+        same as process, but awaits the model with the async OpenAI client
+        """
+        if self.stream:
+            return await self.aprocess_stream(user_msg, manager_msg, order)
+        response = self.process_fast_path(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        key, response = self.process_cached(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        self.count_path('llm')
+        messages = self.build_messages(user_msg, manager_msg, order)
+        with self.metrics.span('llm_call'):
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                max_retries=self.max_retries,
+                messages=messages,
+                response_model=self.response_model
+            )
+        self.prev_message = user_msg
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    def process_stream(self, user_msg: str, manager_msg: ManagerMessage, order: Order,
+                       on_item=None) -> OrderState:
+        """same as process, but streams the response and validates and prices every item
+        as soon as the model has finished it. Always returns the full OrderState.
+        The time to the first item, to the first message and the total go to the metrics
+
+        Args:
+            on_item (Callable): called as on_item(item, messages, price) for every complete item
+                of the model, not for the answers of the fast path or the cache
+        """
+        if self.output_mode == 'delta':
+            raise ValueError("Streaming works with output_mode='full' only")
+        response = self.process_fast_path(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        key, response = self.process_cached(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        self.count_path('llm')
+        extraction = StreamingExtraction(order, on_item)
+        partial = None
+        messages = self.build_messages(user_msg, manager_msg, order)
+        with self.metrics.span('llm_call'):
+            for partial in self.client.chat.completions.create_partial(
+                    model=self.model,
+                    max_retries=self.max_retries,
+                    messages=messages,
+                    response_model=OrderState):
+                extraction.feed(partial)
+        return self.finish_stream(extraction, partial, user_msg, key)
+
+    async def aprocess_stream(self, user_msg: str, manager_msg: ManagerMessage, order: Order,
+                              on_item=None) -> OrderState:
+        """
+        same as process_stream with the async OpenAI client
+        """
+        if self.output_mode == 'delta':
+            raise ValueError("Streaming works with output_mode='full' only")
+        response = self.process_fast_path(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        key, response = self.process_cached(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        self.count_path('llm')
+        extraction = StreamingExtraction(order, on_item)
+        partial = None
+        messages = self.build_messages(user_msg, manager_msg, order)
+        with self.metrics.span('llm_call'):
+            async for partial in self.async_client.chat.completions.create_partial(
+                    model=self.model,
+                    max_retries=self.max_retries,
+                    messages=messages,
+                    response_model=OrderState):
+                extraction.feed(partial)
+        return self.finish_stream(extraction, partial, user_msg, key)
+
+    def finish_stream(self, extraction: StreamingExtraction, partial, user_msg: str,
+                      key: str) -> OrderState:
+        """
+        return the complete response of a stream, records its timings and caches it
+        """
+        response = extraction.finish(partial)
+        self.stream_stats = extraction.stats()
+        for stage, seconds in [('stream_first_item', extraction.first_item_s),
+                               ('stream_first_message', extraction.first_message_s),
+                               ('stream_total', extraction.total_s)]:
+            if seconds is not None:
+                self.metrics.observe(stage, seconds)
+        self.prev_message = user_msg
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    def process_fast_path(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        if self.fast_path is None:
+            return None
+        response = self.fast_path.interpret(user_msg, manager_msg, order)
+        if response is not None:
+            self.count_path('fast_path')
+            self.prev_message = user_msg
+        return response
+
+    def process_cached(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> tuple:
+        """
+        return cache key of the turn and the cached response, (None, None) without a cache
         """
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(user_msg, manager_msg, order, self.response_model.__name__,
+                             self.prev_message)
+        response = self.cache.get(key)
+        if response is not None:
+            self.count_path('cache')
+            self.prev_message = user_msg
+        return key, response
+
+    def count_path(self, path: str) -> None:
+        self.path_counts[path] += 1
+        if self.count_turns:
+            self.metrics.inc('turns_total', path=path)
+
+    def add_hooks(self, client):
+        """
+        return the instructor client with hooks that count every attempt of a call
+        (retries included), its errors and the tokens of every response
+        """
+        metrics = self.metrics
+        client.on('completion:kwargs', lambda *args, **kwargs: metrics.inc('llm_attempts_total'))
+        client.on('completion:response', self.count_usage)
+        client.on('completion:error',
+                  lambda error: metrics.inc('llm_errors_total', reason='completion'))
+        client.on('parse:error', lambda error: metrics.inc('llm_errors_total', reason='parse'))
+        client.on('completion:last_attempt', lambda error: metrics.inc('llm_failures_total'))
+        return client
+
+    def count_usage(self, response) -> None:
+        usage = getattr(response, 'usage', None)
+        if usage is None:
+            return
+        self.usage['prompt_tokens'] += usage.prompt_tokens or 0
+        self.usage['completion_tokens'] += usage.completion_tokens or 0
+        self.metrics.inc('llm_prompt_tokens_total', usage.prompt_tokens or 0)
+        self.metrics.inc('llm_completion_tokens_total', usage.completion_tokens or 0)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        if details is not None and getattr(details, 'cached_tokens', None):
+            self.metrics.inc('llm_cached_tokens_total', details.cached_tokens)
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            max_retries=self.max_retries,
-            messages=[{
-                'role': 'developer',
-                'content': system_prompt
-            },
-                {"role": "user",
-                 "content": user_msg}
-            ],
-            response_model=OrderState
-        )
+    def process_general_question(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> OrderState:
+        messages = self.build_messages(user_msg, manager_msg, order)
+        with self.metrics.span('llm_call'):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                max_retries=self.max_retries,
+                messages=messages,
+                response_model=self.response_model
+            )
         self.prev_message = user_msg
         return response
+
+    def build_messages(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> list:
+        """builds chat messages for the turn. The first message is the static prefix
+        (guidelines and menu), everything that changes between turns comes after it
+
+        Returns:
+            list: messages for the chat completion
+        """
+        with self.metrics.span('prompt_build'):
+            return self._build_messages(user_msg, manager_msg, order)
+
+    def _build_messages(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> list:
+        menu_context = self.build_menu_context(user_msg, manager_msg, order)
+        guidelines = GUIDELINES + DELTA_GUIDELINES if self.output_mode == 'delta' else GUIDELINES
+        if self.prune_menu:
+            prefix = guidelines
+            context = self.build_context(manager_msg, order, menu_context)
+        else:
+            prefix = guidelines + MENU_HEADER + menu_context
+            context = self.build_context(manager_msg, order)
+        self.prefix_fingerprints.observe(prefix)
+        return [
+            {'role': 'developer', 'content': prefix},
+            {'role': 'developer', 'content': context},
+            {'role': 'user', 'content': user_msg}
+        ]
+
+    def build_context(self, manager_msg: ManagerMessage, order: Order, menu_context=None) -> str:
+        order_state = ''.join(f"\n          {line}" for line in encode_order(order.list).split('\n')
+                              if line) or 'empty'
+        context = f"""
+        --- CONTEXT ---
+        - Previous user message: {self.prev_message}
+        - Current order state: {order_state}
+        - Assistant's message: {manager_msg.text}
+        """
+        if menu_context is not None:
+            context += MENU_HEADER + menu_context
+        return context
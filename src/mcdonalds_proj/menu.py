@@ -2,22 +2,275 @@
 This module is responsible for all actions related to menu.
 Like parsing of yaml files, calibrating prices according to sizes, structurizing to a json obj 
 """
+import hashlib
 import json
+import os
+import tempfile
 import yaml
 
 SMALL_COEF = 0.75
 LARGE_COEF = 1.25
 
+DATA_DIR = './src/data'
+MENU_SOURCES = (
+    'menu_virtual_items.yaml',
+    'menu_deals.yaml',
+    'menu_upsells.yaml',
+    'menu_ingredients.yaml',
+)
+SNAPSHOT_PATH = f'{DATA_DIR}/menu_snapshot.json'
+JSON_DUMP_PATH = f'{DATA_DIR}/test.json'
+# Bump when the structure produced by process_yaml_menus changes,
+# so that old snapshots are not loaded by the new code.
+SNAPSHOT_FORMAT = 1
+
 
 class Menu():
     """
     Class to represent menu
     """
-    def __init__(self) -> None:
-        self.menu = process_yaml_menus()
+    def __init__(self, use_snapshot: bool = True, dump_json: bool = True) -> None:
+        """
+        Args:
+            use_snapshot (bool): load the compiled menu snapshot if it matches the yaml
+                sources, and rebuild it only when one of them changed
+            dump_json (bool): write the parsed menu to test.json whenever the yaml
+                sources are parsed
+        """
+        self.version = menu_sources_hash()
+        if use_snapshot:
+            self.menu = load_menu_snapshot(self.version, dump_json)
+        else:
+            self.menu = process_yaml_menus(dump_json)
+        self.index = MenuIndex(self.menu)
+        self.prices = PriceTable(self.menu)
+
+
+class IngredientIndex():
+    """
+    One bit for every ingredient and sauce of the menu, so a set of modifiers is an int:
+    checking modifiers against the menu and comparing customizations are mask operations
+    """
+
+    def __init__(self, names) -> None:
+        self.bits = {}
+        for name in names:
+            self.bits.setdefault(name, 1 << len(self.bits))
+
+    def mask(self, names) -> int:
+        """
+        return mask of the names, names that are not ingredients have no bit
+        """
+        mask = 0
+        for name in names:
+            mask |= self.bits.get(name, 0)
+        return mask
+
+    def rejected(self, modifiers: list, allowed: int) -> list:
+        """
+        return modifiers that are not in the allowed mask, unknown names included
+        """
+        bits = self.bits
+        return [mod for mod in modifiers if not bits.get(mod.name, 0) & allowed]
+
+    def key(self, item) -> tuple:
+        """
+        return masks and quantities of the modifiers of the item.
+        Identically customized items have the same key whatever the order of their modifiers,
+        a modifier that is listed twice counts as its summed quantity
+        """
+        bits = self.bits
+        add = remove = 0
+        quantities = {}
+        for mod in item.modifiers_to_add:
+            bit = bits.get(mod.name, 0)
+            add |= bit
+            quantities[bit or mod.name] = quantities.get(bit or mod.name, 0) + mod.quantity
+        extra = [(modifier, quantity) for modifier, quantity in quantities.items()
+                 if isinstance(modifier, str) or quantity != 1]
+        for mod in item.modifiers_to_remove:
+            bit = bits.get(mod.name, 0)
+            remove |= bit
+            if not bit:
+                extra.append((mod.name, None))
+        return add, remove, tuple(sorted(extra, key=str))
+
+
+class MenuIndex():
+    """
+    Read-only lookup tables built once from Menu.menu, so validation answers
+    membership questions with set/dict lookups instead of rebuilding lists
+    """
+    ITEM_CATEGORIES = ['burgers', 'drinks', 'fries', 'desserts', 'sauces', 'combos', 'deals',
+                       'ingredients']
+    SIZED_CATEGORIES = ['drinks', 'fries', 'combos']
+
+    def __init__(self, menu: dict) -> None:
+        # type of the order item -> names allowed for that type
+        self.names = {category: frozenset(menu[category]) for category in self.ITEM_CATEGORIES}
+        self.names['ice cream'] = frozenset(menu['virtual']['ice cream'])
+        # name -> category, the first category wins for names like 'Ketchup'
+        self.category_of = {}
+        for category in self.ITEM_CATEGORIES:
+            for name in menu[category]:
+                self.category_of.setdefault(name, category)
+        # combo -> slot -> allowed names
+        self.combo_slots = {
+            name: {
+                'burgers': frozenset([name[:-5]]),
+                'drinks': frozenset(combo.get('drinks', [])),
+                'fries': frozenset(combo.get('fries', [])),
+                'sauces': frozenset(combo.get('sauces', [])),
+            }
+            for name, combo in menu['combos'].items()
+        }
+        self.deal_burgers = {name: frozenset(burgers) for name, burgers in menu['deals'].items()}
+        # (type, name) -> ingredients / sizes
+        self.possible_ingredients = {}
+        self.default_ingredients = {}
+        self.ingredients = IngredientIndex(list(menu['ingredients']) + list(menu['sauces']))
+        self.sauce_mask = self.ingredients.mask(menu['sauces'])
+        # (type, name) -> mask of the ingredients that can be added / removed
+        self.possible_masks = {}
+        self.default_masks = {}
+        self.sizes = {}
+        for category in ['burgers', 'drinks', 'fries', 'desserts', 'combos']:
+            for name, item in menu[category].items():
+                self.possible_ingredients[(category, name)] = frozenset(
+                    item.get('possible_ingredients', []))
+                self.default_ingredients[(category, name)] = frozenset(
+                    item.get('default_ingredients', []))
+                self.possible_masks[(category, name)] = self.ingredients.mask(
+                    self.possible_ingredients[(category, name)])
+                self.default_masks[(category, name)] = self.ingredients.mask(
+                    self.default_ingredients[(category, name)])
+                if category in self.SIZED_CATEGORIES:
+                    self.sizes[(category, name)] = frozenset(item['size_price'])
+
+        # Prebuilt "Available options" strings for clarification messages
+        self.options_text = {category: str(list(menu[category]))
+                             for category in self.ITEM_CATEGORIES}
+        self.options_text['ice cream'] = str(list(menu['virtual']['ice cream']))
+        self.combo_options_text = {
+            (name, slot): str(list(combo.get(slot, [])))
+            for name, combo in menu['combos'].items() for slot in ['drinks', 'fries', 'sauces']
+        }
+        self.deal_options_text = {name: str(list(burgers))
+                                  for name, burgers in menu['deals'].items()}
+        self.size_options_text = {
+            (category, name): str(list(menu[category][name]['size_price']))
+            for category, name in self.sizes
+        }
+
+    def has_item(self, item_type: str, name: str) -> bool:
+        """
+        return whether name is a valid item of the given type
+        """
+        names = self.names.get(item_type)
+        return names is not None and name in names
+
+    def allowed_in_combo(self, combo: str, slot: str, name: str) -> bool:
+        """
+        return whether name can fill the slot ('burgers', 'drinks', 'fries', 'sauces') of the combo
+        """
+        slots = self.combo_slots.get(combo)
+        return slots is not None and name in slots.get(slot, ())
+
+    def allowed_in_deal(self, deal: str, name: str) -> bool:
+        """
+        return whether the burger can be a part of the deal
+        """
+        burgers = self.deal_burgers.get(deal)
+        return burgers is not None and name in burgers
+
+
+def to_cents(price: float) -> int:
+    return int(round(price * 100))
+
+
+class PriceTable():
+    """
+    Prices in integer cents for every (type, name, size) of the menu, sauces and ingredients.
+    Unsized items are stored with size None
+    """
+    DEAL_DISCOUNT_PCT = 20
+
+    def __init__(self, menu: dict) -> None:
+        self.items = {}
+        for category in ['burgers', 'desserts']:
+            for name, item in menu[category].items():
+                self.items[(category, name, None)] = to_cents(item['price'])
+        for category in ['drinks', 'fries', 'combos']:
+            for name, item in menu[category].items():
+                for size, price in item['size_price'].items():
+                    self.items[(category, name, size)] = to_cents(price)
+        for name, price in menu['desserts'].items():
+            self.items[('ice cream', name, None)] = to_cents(price['price'])
+        for name, price in menu['sauces'].items():
+            self.items[('sauces', name, None)] = to_cents(price)
+        self.sauces = {name: to_cents(price) for name, price in menu['sauces'].items()}
+        self.ingredients = {name: to_cents(price) for name, price in menu['ingredients'].items()}
+
+    def item(self, category: str, name: str, size: str = None) -> int:
+        return self.items[(category, name, size)]
+
+    def deal_discount(self, burgers_cents: int) -> int:
+        """
+        return discount of a double deal for the given price of its burgers
+        """
+        return (burgers_cents * self.DEAL_DISCOUNT_PCT + 50) // 100
+
+
+def menu_sources_hash(data_dir: str = DATA_DIR) -> str:
+    """
+    return sha256 of the yaml menu sources, used as the version of the menu
+    """
+    digest = hashlib.sha256(f'format:{SNAPSHOT_FORMAT}'.encode())
+    for file_name in MENU_SOURCES:
+        with open(f'{data_dir}/{file_name}', mode='rb') as f:
+            digest.update(file_name.encode())
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_menu_snapshot(version: str, dump_json: bool = True,
+                       snapshot_path: str = SNAPSHOT_PATH) -> dict:
+    """
+    return the compiled menu if the snapshot was built from the same yaml sources,
+    otherwise parse the yaml files and rewrite the snapshot
+    """
+    try:
+        with open(snapshot_path, encoding='UTF-8', mode='r') as f:
+            snapshot = json.load(f)
+        if snapshot.get('version') == version:
+            return snapshot['menu']
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    json_data = process_yaml_menus(dump_json)
+    write_menu_snapshot(json_data, version, snapshot_path)
+    return json_data
+
+
+def write_menu_snapshot(json_data: dict, version: str, snapshot_path: str = SNAPSHOT_PATH):
+    """
+    atomically write the compiled menu, so concurrent workers never read a partial file
+    """
+    directory = os.path.dirname(snapshot_path) or '.'
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    except OSError:
+        # Read-only deployments still work, they just parse the yaml on every start
+        return
+    try:
+        with os.fdopen(fd, encoding='UTF-8', mode='w') as f:
+            json.dump({'version': version, 'menu': json_data}, f, separators=(',', ':'))
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        os.unlink(tmp_path)
 
 
-def process_yaml_menus():
+def process_yaml_menus(dump_json: bool = True):
     """
     return json like object of the menu
     """
@@ -34,7 +287,7 @@ def process_yaml_menus():
     }
 
     # menu_virtual_items
-    with open('./src/data/menu_virtual_items.yaml', encoding='UTF-8', mode='r') as f:
+    with open(f'{DATA_DIR}/menu_virtual_items.yaml', encoding='UTF-8', mode='r') as f:
         data = yaml.safe_load(f)
 
     if 'items' in data and isinstance(data['items'], list):
@@ -94,7 +347,7 @@ def process_yaml_menus():
                         "size_price": size_price
                     }
     # menu_deals
-    with open('./src/data/menu_deals.yaml', encoding='UTF-8', mode='r') as f:
+    with open(f'{DATA_DIR}/menu_deals.yaml', encoding='UTF-8', mode='r') as f:
         data = yaml.safe_load(f)
 
     if 'deals' in data and isinstance(data['deals'], list):
@@ -104,7 +357,7 @@ def process_yaml_menus():
             json_data["deals"][name] = possible_items
 
     # menu_upsells
-    with open('./src/data/menu_upsells.yaml', encoding='UTF-8', mode='r') as f:
+    with open(f'{DATA_DIR}/menu_upsells.yaml', encoding='UTF-8', mode='r') as f:
         data = yaml.safe_load(f)
 
     if 'combos' in data and isinstance(data['combos'], list):
@@ -123,7 +376,7 @@ def process_yaml_menus():
                 price = item.get("price")
                 json_data["sauces"][name] = price
     # menu_ingredients
-    with open('./src/data/menu_ingredients.yaml', encoding='UTF-8', mode='r') as f:
+    with open(f'{DATA_DIR}/menu_ingredients.yaml', encoding='UTF-8', mode='r') as f:
         data = yaml.safe_load(f)
 
     if 'ingredients' in data and isinstance(data['ingredients'], list):
@@ -140,7 +393,8 @@ def process_yaml_menus():
             json_data[category][name]['default_ingredients'] = default_ingredients
             json_data[category][name]['possible_ingredients'] = possible_ingredients
 
-    with open("./src/data/test.json", encoding='UTF-8', mode='w') as json_file:
-        json_file.write(json.dumps(json_data, indent=4))
+    if dump_json:
+        with open(JSON_DUMP_PATH, encoding='UTF-8', mode='w') as json_file:
+            json_file.write(json.dumps(json_data, indent=4))
 
     return json_data
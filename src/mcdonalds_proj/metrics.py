@@ -0,0 +1,154 @@
+"""
+This module is responsible for the metrics of the conversation hot path.
+Stages of a turn are timed with spans, counters and gauges hold everything else;
+all of it can be exported as Prometheus text or as JSON lines
+"""
+import json
+import time
+
+
+class Span():
+    """
+    Times one run of a stage, used as `with metrics.span('validate'):`
+    """
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics: "Metrics", stage: str) -> None:
+        self.metrics = metrics
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(self.stage, time.perf_counter() - self.start)
+
+
+class _NullSpan():
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Metrics():
+    """
+    In-process metrics: a span or a counter update is a few dict operations,
+    so it can stay on in production. With enabled=False every call is a no-op.
+
+    Counters and gauges are keyed by name and labels, spans are summaries of seconds per stage
+    (count, sum and max)
+    """
+
+    def __init__(self, enabled: bool = True, prefix: str = 'mcdonalds_') -> None:
+        self.enabled = enabled
+        self.prefix = prefix
+        self.counters = {}
+        self.gauges = {}
+        self.stages = {}
+        self.started_at = time.time()
+
+    def span(self, stage: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, stage)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        if not self.enabled:
+            return
+        summary = self.stages.get(stage)
+        if summary is None:
+            self.stages[stage] = [1, seconds, seconds]
+        else:
+            summary[0] += 1
+            summary[1] += seconds
+            if seconds > summary[2]:
+                summary[2] = seconds
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items()))) if labels else (name, ())
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels) -> None:
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items()))) if labels else (name, ())
+        self.gauges[key] = value
+
+    def counter(self, name: str, **labels) -> float:
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def reset(self) -> None:
+        self.counters = {}
+        self.gauges = {}
+        self.stages = {}
+
+    def snapshot(self) -> dict:
+        def flat(values):
+            result = {}
+            for (name, labels), value in values.items():
+                label_text = ','.join(f"{key}={label}" for key, label in labels)
+                result[f"{name}{{{label_text}}}" if labels else name] = value
+            return result
+
+        return {
+            'time': round(time.time(), 3),
+            'stages': {stage: {'count': count, 'sum': round(total, 6), 'max': round(longest, 6)}
+                       for stage, (count, total, longest) in self.stages.items()},
+            'counters': flat(self.counters),
+            'gauges': flat(self.gauges),
+        }
+
+    def to_json_line(self) -> str:
+        return json.dumps(self.snapshot()) + '\n'
+
+    def write_json_line(self, path: str) -> None:
+        """
+        appends the current snapshot to the JSON lines file
+        """
+        with open(path, 'a', encoding='UTF-8') as f:
+            f.write(self.to_json_line())
+
+    def to_prometheus(self) -> str:
+        """
+        return metrics in the Prometheus text exposition format
+        """
+        def labels_text(labels):
+            if not labels:
+                return ''
+            return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+        lines = []
+        if self.stages:
+            name = f"{self.prefix}stage_seconds"
+            lines.append(f"# TYPE {name} summary")
+            for stage, (count, total, _) in sorted(self.stages.items()):
+                lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {total:.9f}')
+            name = f"{self.prefix}stage_max_seconds"
+            lines.append(f"# TYPE {name} gauge")
+            for stage, (_, _, longest) in sorted(self.stages.items()):
+                lines.append(f'{name}{{stage="{stage}"}} {longest:.9f}')
+        for kind, values in [('counter', self.counters), ('gauge', self.gauges)]:
+            seen = set()
+            for (name, labels), value in sorted(values.items()):
+                full_name = f"{self.prefix}{name}"
+                if full_name not in seen:
+                    lines.append(f"# TYPE {full_name} {kind}")
+                    seen.add(full_name)
+                lines.append(f"{full_name}{labels_text(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+# Shared by the LLM objects and sessions of the process
+METRICS = Metrics()
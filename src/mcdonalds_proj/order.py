@@ -1,4 +1,5 @@
-from typing import List, Optional
+import sys
+from typing import List, Literal, NamedTuple, Optional
 from pydantic import BaseModel, Field
 
 
@@ -96,6 +97,237 @@ class OrderState(BaseModel):
     )
 
 
+class OrderItemPatch(BaseModel):
+    """
+    Changed fields of an existing OrderItem, fields that stay the same are None
+    """
+    name: Optional[str] = Field(None, description="New name of the item.")
+    size: Optional[str] = Field(None, description="New size of the item.")
+    quantity: Optional[int] = Field(None, description="New quantity of the item.")
+    modifiers_to_add: Optional[List[IngredientsItem]] = Field(
+        None,
+        description="Full new list of modifiers to add, None if unchanged."
+    )
+    modifiers_to_remove: Optional[List[IngredientsItem]] = Field(
+        None,
+        description="Full new list of modifiers to remove, None if unchanged."
+    )
+    children: Optional[List[ChildrenItem]] = Field(
+        None,
+        description="Full new list of nested items, None if unchanged."
+    )
+
+
+class OrderOperation(BaseModel):
+    """
+    One change of the order
+    """
+    op: Literal['add', 'remove', 'update', 'replace'] = Field(
+        ...,
+        description="""'add' a new item, 'remove' an item, 'update' some fields of an item
+        or 'replace' an item with another one."""
+    )
+    item_id: Optional[int] = Field(
+        None,
+        description="ID of the item in the current order state (#ID). Not used for 'add'."
+    )
+    item: Optional[OrderItem] = Field(
+        None,
+        description="The new item for 'add' and 'replace'."
+    )
+    patch: Optional[OrderItemPatch] = Field(
+        None,
+        description="Only the changed fields for 'update'."
+    )
+
+
+class OrderDelta(BaseModel):
+    """
+    Changes of the order for LLM to return instead of the whole OrderState
+    """
+    operations: List[OrderOperation] = Field(
+        default_factory=list,
+        description="Changes to apply to the current order state. [] if nothing changes."
+    )
+    order_finished: bool = Field(
+        False,
+        description="""Set to True if the customer has indicated that
+        they don't want to add anything else to the order. Only when asked 'Would you like anything else?'
+        """
+    )
+
+
+# Name of the fake ingredient that marks an item the manager has offered an upsell for.
+# The LLM sees and returns it in modifiers_to_add; inside the order it is Item.offered
+UPSELL_MARKER = 'Flag'
+
+
+class _Slotted():
+    """
+    Base of the internal items. Inside a session the order is kept in these small objects
+    instead of the pydantic models above, which only describe and validate what the LLM returns.
+    They have the same fields, compare equal to the pydantic models and print like them
+    """
+    __slots__ = ()
+    _model = ''
+    # fields of the pydantic model
+    _fields = ()
+
+    def _value(self, field: str):
+        return getattr(self, field)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, _Slotted):
+            if type(other) is not type(self):
+                return NotImplemented
+            return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+        if not isinstance(other, BaseModel):
+            return NotImplemented
+        return all(self._value(field) == getattr(other, field, None) for field in self._fields)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{field}={self._value(field)!r}" for field in self._fields)
+        return f"{self._model}({fields})"
+
+    def __str__(self) -> str:
+        return ' '.join(f"{field}={self._value(field)!r}" for field in self._fields)
+
+    def model_dump(self) -> dict:
+        result = {}
+        for field in self._fields:
+            value = self._value(field)
+            result[field] = [part.model_dump() for part in value] if type(value) is list else value
+        return result
+
+    def model_copy(self, deep: bool = False):
+        copy = object.__new__(type(self))
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if type(value) is list:
+                value = [part.model_copy(deep=True) for part in value] if deep else value[:]
+            setattr(copy, field, value)
+        return copy
+
+
+class Ingredient(_Slotted):
+    """
+    Internal IngredientsItem
+    """
+    __slots__ = ('name', 'quantity')
+    _model = 'IngredientsItem'
+    _fields = __slots__
+
+    def __init__(self, name: Optional[str] = None, quantity: int = 1) -> None:
+        self.name = name
+        self.quantity = quantity
+
+
+class Child(_Slotted):
+    """
+    Internal ChildrenItem
+    """
+    __slots__ = ('name', 'type', 'modifiers_to_add', 'modifiers_to_remove')
+    _model = 'ChildrenItem'
+    _fields = __slots__
+
+    def __init__(self, name: Optional[str] = None, type: str = None,
+                 modifiers_to_add: list = None, modifiers_to_remove: list = None) -> None:
+        self.name = name
+        self.type = type
+        self.modifiers_to_add = modifiers_to_add if modifiers_to_add is not None else []
+        self.modifiers_to_remove = modifiers_to_remove if modifiers_to_remove is not None else []
+
+
+class Item(_Slotted):
+    """
+    Internal OrderItem. offered is True once the manager has offered a sauce or a combo for it
+    """
+    _fields = ('name', 'type', 'size', 'quantity', 'modifiers_to_add', 'modifiers_to_remove',
+               'children')
+    __slots__ = _fields + ('offered',)
+    _model = 'OrderItem'
+
+    def __init__(self, name: Optional[str] = None, type: str = None, size: Optional[str] = None,
+                 quantity: int = 1, modifiers_to_add: list = None, modifiers_to_remove: list = None,
+                 children: Optional[list] = None, offered: bool = False) -> None:
+        self.name = name
+        self.type = type
+        self.size = size
+        self.quantity = quantity
+        self.modifiers_to_add = modifiers_to_add if modifiers_to_add is not None else []
+        self.modifiers_to_remove = modifiers_to_remove if modifiers_to_remove is not None else []
+        self.children = children
+        self.offered = offered
+
+    def _value(self, field: str):
+        if field == 'modifiers_to_add' and self.offered:
+            return [Ingredient(UPSELL_MARKER)] + self.modifiers_to_add
+        return getattr(self, field)
+
+
+def _intern(text: Optional[str]) -> Optional[str]:
+    return sys.intern(text) if type(text) is str else text
+
+
+def _modifiers(modifiers: list) -> list:
+    return [Ingredient(_intern(mod.name), mod.quantity) for mod in modifiers
+            if mod.name != UPSELL_MARKER]
+
+
+def from_model(item):
+    """
+    return internal item of OrderItem, ChildrenItem or IngredientsItem.
+    Names are interned and the upsell marker becomes Item.offered,
+    items that are internal already are returned as they are
+    """
+    kind = type(item)
+    if kind is Item or kind is Child or kind is Ingredient:
+        return item
+    if isinstance(item, IngredientsItem):
+        return Ingredient(_intern(item.name), item.quantity)
+    modifiers_to_add = _modifiers(item.modifiers_to_add)
+    modifiers_to_remove = _modifiers(item.modifiers_to_remove)
+    if isinstance(item, ChildrenItem):
+        return Child(_intern(item.name), _intern(item.type), modifiers_to_add, modifiers_to_remove)
+    if isinstance(item, OrderItem):
+        children = [from_model(child) for child in item.children] \
+            if item.children is not None else None
+        offered = len(modifiers_to_add) != len(item.modifiers_to_add)
+        return Item(_intern(item.name), _intern(item.type), _intern(item.size), item.quantity,
+                    modifiers_to_add, modifiers_to_remove, children, offered)
+    raise TypeError(f"Cannot convert {kind.__name__} to an order item")
+
+
+def to_model(item):
+    """
+    return pydantic copy of the item, without validation
+    """
+    if isinstance(item, BaseModel):
+        return item.model_copy(deep=True)
+    if type(item) is Ingredient:
+        return IngredientsItem.model_construct(name=item.name, quantity=item.quantity)
+    modifiers_to_add = [to_model(mod) for mod in item._value('modifiers_to_add')]
+    modifiers_to_remove = [to_model(mod) for mod in item.modifiers_to_remove]
+    if type(item) is Child:
+        return ChildrenItem.model_construct(name=item.name, type=item.type,
+                                            modifiers_to_add=modifiers_to_add,
+                                            modifiers_to_remove=modifiers_to_remove)
+    children = [to_model(child) for child in item.children] if item.children is not None else None
+    return OrderItem.model_construct(name=item.name, type=item.type, size=item.size,
+                                     quantity=item.quantity, modifiers_to_add=modifiers_to_add,
+                                     modifiers_to_remove=modifiers_to_remove, children=children)
+
+
+def to_state(items: list, finished: bool = False) -> OrderState:
+    """
+    return OrderState with copies of the items, e.g. for a response built from the order
+    """
+    return OrderState.model_construct(items=[to_model(item) for item in items],
+                                      order_finished=finished)
+
+
 class Order():
     """
     The class to represent Order details like items ordered and various flags for business rules
@@ -110,6 +342,15 @@ class Order():
         self.double_deal_suggested = False
         self.menu = menu
 
+    @property
+    def list(self):
+        return self._items
+
+    @list.setter
+    def list(self, items) -> None:
+        # pydantic items from the LLM are converted, internal ones are kept as they are
+        self._items = [from_model(item) for item in items]
+
     def summary(self) -> str:
         """summarizes order in an ordered format
 
@@ -121,86 +362,117 @@ class Order():
         for item in self.list:
             res += f"  - {item.quantity} x {item.name} {item.size} [{item.type}]\n"
             if item.modifiers_to_add:
-                adds = [f"{mod.quantity}x{mod.name}" for mod in item.modifiers_to_add if mod.name != 
-                    'Flag']
-                if adds:
-                    res += f"      Modifiers to add: {adds}\n"
+                adds = [f"{mod.quantity}x{mod.name}" for mod in item.modifiers_to_add]
+                res += f"      Modifiers to add: {adds}\n"
             if item.modifiers_to_remove:
-                removes = [
-                    f"{mod.quantity}x{mod.name}" for mod in item.modifiers_to_remove if mod.name !=
-                        'Flag']
-                if removes:
-                    res += f"      Modifiers to remove: {removes}\n"
+                removes = [f"{mod.quantity}x{mod.name}" for mod in item.modifiers_to_remove]
+                res += f"      Modifiers to remove: {removes}\n"
             if item.children:
                 res += "      With:\n"
                 for child in item.children:
-                    adds = [
-                        f"{mod.quantity}x{mod.name}" for mod in child.modifiers_to_add if mod.name !=
-                            'Flag']
-                    removes = [
-                        f"{mod.name}" for mod in child.modifiers_to_remove if mod.name !=
-                            'Flag']
+                    adds = [f"{mod.quantity}x{mod.name}" for mod in child.modifiers_to_add]
+                    removes = [f"{mod.name}" for mod in child.modifiers_to_remove]
                     res += f"        * [{child.type}]: {child.name}, add:{adds}, remove: {removes}\n"
         res += "==================\n"
         return res
 
+    @property
+    def total_cents(self) -> int:
+        """
+        total of the order in cents. Every line is priced on each call: items are changed
+        in place by validation, the fast path and deltas, and pricing a line from the
+        PriceTable costs less than checking whether it changed
+        """
+        return sum(self.price_line(item).total for item in self.list)
+
     def calculate_total(self) -> float:
         """calculates total price of the order
 
         Returns:
             float: total price of the order in $
         """
-        total = 0.0
-        for item in self.list:
-            if item.type == 'combos':
-                total += item.quantity * \
-                    self.menu.menu["combos"][item.name]["size_price"][item.size]
-                for mod in item.modifiers_to_add:
-                    if mod.name != "Flag":
-                        total += self.menu.menu["sauces"][mod.name]
-                for child in item.children:
-                    for mod in child.modifiers_to_add:
-                        total += self.calculate_modifications(child)
-            if item.type == 'drinks':
-                total += item.quantity * \
-                    self.menu.menu["drinks"][item.name]["size_price"][item.size]
-            if item.type == 'burgers':
-                total += item.quantity * \
-                    self.menu.menu["burgers"][item.name]["price"]
-                total += self.calculate_modifications(item)
-            if item.type == 'fries':
-                total += item.quantity * \
-                    self.menu.menu["fries"][item.name]["size_price"][item.size]
-                total += self.calculate_modifications(item)
-            if item.type in ['desserts', 'ice cream']:
-                total += item.quantity * \
-                    self.menu.menu["desserts"][item.name]["price"]
-            if item.type == 'deals':
-                deal_sum = 0
-                for child in item.children:
-                    deal_sum += self.menu.menu["burgers"][child.name]["price"]
-                    total += self.calculate_modifications(child)
-                total += deal_sum * 0.8
-            if item.type == 'sauces':
-                total += item.quantity * \
-                    self.menu.menu["sauces"][item.name]
+        return self.total_cents / 100
+
+    def breakdown(self) -> List["LineCharge"]:
+        """prices every line of the order
+
+        Returns:
+            list: LineCharge of every item in the order, amounts in cents
+        """
+        return [self.price_line(item) for item in self.list]
+
+    def price_item(self, item) -> float:
+        """calculates price of one line of the order
+
+        Returns:
+            float: price of the item with its modifiers in $
+        """
+        return self.price_line(item).total / 100
+
+    def price_line(self, item) -> "LineCharge":
+        """calculates price of one line of the order in cents
+
+        Returns:
+            LineCharge: base price, modifiers, discount and total of the line
+        """
+        prices = self.menu.prices
+        base = 0
+        modifiers = 0
+        discount = 0
+        if item.type in ['drinks', 'burgers', 'fries', 'desserts', 'ice cream', 'sauces',
+                         'combos']:
+            base = item.quantity * prices.item(item.type, item.name, item.size
+                                               if item.type in ['drinks', 'fries', 'combos']
+                                               else None)
+        if item.type == 'combos':
+            for mod in item.modifiers_to_add:
+                modifiers += prices.sauces[mod.name]
+            for child in item.children:
+                modifiers += self.modifications_cents(child)
+        if item.type in ['burgers', 'fries']:
+            modifiers += self.modifications_cents(item)
+        if item.type == 'deals':
+            burgers = 0
+            for child in item.children:
+                burgers += prices.item('burgers', child.name)
+                # every deal of the line has its own pair of burgers
+                modifiers += item.quantity * self.modifications_cents(child)
+            base = item.quantity * burgers
+            discount = item.quantity * prices.deal_discount(burgers)
+        return LineCharge(item.name, item.type, item.quantity, base, modifiers, discount,
+                          base + modifiers - discount)
+
+    def modifications_cents(self, item) -> int:
+        """
+        return price of the ingredients added to the item in cents
+        """
+        total = 0
+        ingredients = self.menu.prices.ingredients
+        for modifier in item.modifiers_to_add:
+            if modifier.name in ingredients:
+                total += modifier.quantity * ingredients[modifier.name]
         return total
 
     def calculate_modifications(self, item) -> float:
         """calculate total of modifications added to the order
 
         Args:
-            item (_type_): _description_
+            item (OrderItem | ChildrenItem): item with modifiers
 
         Returns:
-            float: _description_
+            float: price of the added ingredients in $
         """
-        total = 0
-        available_mods = self.menu.menu["ingredients"].keys()
-        for modidfier in item.modifiers_to_add:
-            if modidfier.name in available_mods:
-                total += modidfier.quantity * \
-                    self.menu.menu["ingredients"][modidfier.name]
-        return total
+        return self.modifications_cents(item) / 100
 
 
+class LineCharge(NamedTuple):
+    """
+    Price of one line of the order in cents
+    """
+    name: Optional[str]
+    type: str
+    quantity: int
+    base: int
+    modifiers: int
+    discount: int
+    total: int
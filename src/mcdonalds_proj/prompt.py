@@ -0,0 +1,296 @@
+"""
+This module is responsible for the menu context that is sent to the LLM.
+Like encoding the menu and the order in a compact canonical form and pruning the menu
+to the items relevant to the turn
+"""
+import hashlib
+import re
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import UPSELL_MARKER
+
+CATEGORY_ORDER = ['combos', 'burgers', 'fries', 'drinks', 'desserts', 'deals', 'sauces',
+                  'ingredients']
+
+# Words that make the whole category relevant for the turn
+CATEGORY_KEYWORDS = {
+    'combos': ['combo', 'combos', 'meal', 'meals', 'menu'],
+    'burgers': ['burger', 'burgers', 'sandwich', 'sandwiches'],
+    'fries': ['fries', 'fry', 'chips', 'dips', 'side'],
+    'drinks': ['drink', 'drinks', 'soda', 'coke', 'cola', 'juice', 'beverage'],
+    'desserts': ['dessert', 'desserts', 'ice', 'cream', 'sweet', 'mcflurry', 'cone', 'pie',
+                 'cookie'],
+    'deals': ['deal', 'deals', 'double'],
+    'sauces': ['sauce', 'sauces', 'sause', 'dip', 'dipping'],
+}
+
+# Categories the pending manager question is about, keyed by ManagerMessage.flag
+FLAG_CATEGORIES = {
+    'dessert_offered': ['desserts'],
+    'sauce_offered': ['sauces'],
+    'combo_offered': ['combos'],
+}
+
+# Virtual items point to the category the general reference resolves to
+VIRTUAL_CATEGORIES = {
+    'combos': 'combos',
+    'drink': 'drinks',
+    'burger': 'burgers',
+    'dessert': 'desserts',
+    'ice cream': 'desserts',
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    return rough number of tokens in the text (~4 characters per token for English/JSON)
+    """
+    return (len(text) + 3) // 4
+
+
+def _words(text: str) -> set:
+    return set(re.findall(r"[a-z0-9&']+", text.lower()))
+
+
+def _price(value) -> str:
+    return f"{value:g}"
+
+
+def _modifier_list(names: list) -> str:
+    return ', '.join(sorted(names))
+
+
+def encode_item(item) -> str:
+    """
+    return compact notation of an order item or a nested item, e.g.
+    2x Big Mac [burgers] add(Bacon, 2x Mayo) remove(Onion)
+    """
+    quantity = getattr(item, 'quantity', None)
+    text = f"{item.name} [{item.type}]" if quantity is None else \
+        f"{quantity}x {item.name} [{item.type}]"
+    size = getattr(item, 'size', None)
+    if size:
+        text += f" {size}"
+    added = [mod.name if mod.quantity == 1 else f"{mod.quantity}x {mod.name}"
+             for mod in item.modifiers_to_add]
+    if getattr(item, 'offered', False):
+        added.append(UPSELL_MARKER)
+    if added:
+        text += f" add({_modifier_list(added)})"
+    if item.modifiers_to_remove:
+        text += f" remove({_modifier_list([mod.name for mod in item.modifiers_to_remove])})"
+    children = getattr(item, 'children', None)
+    if children:
+        text += f" with({'; '.join(encode_item(child) for child in children)})"
+    return text
+
+
+def encode_order(items: list) -> str:
+    """
+    return canonical text of the order items, one line per item with its ID,
+    the 1-based position the LLM refers back to. Same order gives the same text,
+    whether the items are internal or pydantic and whatever the order of their modifiers
+    """
+    return '\n'.join(f"#{position} {encode_item(item)}" for position, item in enumerate(items, 1))
+
+
+def order_fingerprint(items: list) -> str:
+    """
+    return hash of the canonical text of the order items
+    """
+    return hashlib.sha256(encode_order(items).encode()).hexdigest()
+
+
+class MenuContextBuilder():
+    """
+    Builds the menu part of the system prompt.
+    Lists that repeat across items (combo slots, ingredient lists) are written once and referenced
+    by label, and with prune=True only the categories and items relevant to the turn are included.
+    """
+
+    def __init__(self, menu: Menu, prune: bool = False) -> None:
+        self.menu = menu
+        self.prune = prune
+        self.full_tokens = estimate_tokens(str(menu.menu))
+        self.fields = {
+            category: {name: self._item_fields(category, data)
+                       for name, data in menu.menu[category].items()}
+            for category in CATEGORY_ORDER
+        }
+        self.compact = self.render({category: list(items) for category, items
+                                    in self.fields.items()})
+        self.compact_tokens = estimate_tokens(self.compact)
+        self.name_words = {
+            (category, name): {word for word in _words(name) if len(word) > 2}
+            for category, items in self.fields.items() for name in items
+        }
+        self.last_stats = None
+        self.total_stats = {'turns': 0, 'full_tokens': 0, 'context_tokens': 0}
+
+    def _item_fields(self, category: str, data) -> list:
+        """
+        return list of (key, value) of the item, value is str or tuple of names
+        """
+        if category in ['sauces', 'ingredients']:
+            return [('price', _price(data))]
+        if category == 'deals':
+            return [('burgers', tuple(data))]
+        fields = []
+        if 'size_price' in data:
+            sizes = data['size_price']
+            if list(sizes) == ['default']:
+                fields.append(('price', _price(sizes['default'])))
+            else:
+                fields.append(('sizes', ' '.join(f"{size} {_price(price)}"
+                                                 for size, price in sizes.items())))
+        else:
+            fields.append(('price', _price(data['price'])))
+        for key in ['fries', 'drinks', 'sauces', 'default_ingredients', 'possible_ingredients']:
+            if data.get(key):
+                fields.append((key.replace('_ingredients', ''), tuple(data[key])))
+        return fields
+
+    def render(self, selection: dict) -> str:
+        """
+        return compact text of the selected items
+
+        Args:
+            selection (dict): category -> list of item names to include
+        """
+        usage = {}
+        for category in CATEGORY_ORDER:
+            for name in selection.get(category, []):
+                for _, value in self.fields[category][name]:
+                    if isinstance(value, tuple):
+                        usage[value] = usage.get(value, 0) + 1
+        # General references only make sense when their whole category is shown
+        virtual = [(key, tuple(items)) for key, items in self.menu.menu['virtual'].items()
+                   if len(selection.get(VIRTUAL_CATEGORIES.get(key), []))
+                   == len(self.fields.get(VIRTUAL_CATEGORIES.get(key), ()))]
+        for _, items in virtual:
+            usage[items] = usage.get(items, 0) + 1
+
+        labels = {}
+        shared = []
+        for value, count in usage.items():
+            if count > 1:
+                labels[value] = f"L{len(labels) + 1}"
+                shared.append(f"{labels[value]}: {', '.join(value)}")
+
+        def show(value):
+            if isinstance(value, tuple):
+                return labels.get(value) or ', '.join(value)
+            return value
+
+        lines = []
+        if shared:
+            lines.append("lists:")
+            lines.extend(shared)
+        for category in CATEGORY_ORDER:
+            names = selection.get(category)
+            if not names:
+                continue
+            lines.append(f"{category}:")
+            for name in names:
+                parts = [f"{key}={show(value)}" for key, value in self.fields[category][name]]
+                lines.append(f"- {name}: {'; '.join(parts)}")
+        if virtual:
+            lines.append("virtual (general references):")
+            lines.extend(f"- {key}: {show(items)}" for key, items in virtual)
+        return '\n'.join(lines)
+
+    def relevant(self, user_msg: str, order, manager_msg) -> dict:
+        """
+        return category -> item names relevant to the utterance, the current order and
+        the pending manager question; empty dict if nothing could be matched
+        """
+        text = f"{user_msg}\n{manager_msg.text if manager_msg else ''}".lower()
+        for item in order.list:
+            text += f"\n{item.name}".lower()
+            for child in item.children or []:
+                text += f"\n{child.name}".lower()
+        words = _words(text)
+
+        categories = set(FLAG_CATEGORIES.get(manager_msg.flag, []) if manager_msg else [])
+        for category, keywords in CATEGORY_KEYWORDS.items():
+            if words.intersection(keywords):
+                categories.add(category)
+        for item in order.list:
+            if item.type in self.fields:
+                categories.add(item.type)
+            elif item.type == 'ice cream':
+                categories.add('desserts')
+
+        selection = {category: list(self.fields[category]) for category in categories}
+        for (category, name), name_words in self.name_words.items():
+            if category in categories:
+                continue
+            if name.lower() in text or (name_words and name_words <= words):
+                selection.setdefault(category, []).append(name)
+
+        # Burgers that the selected combos are built from
+        for combo in selection.get('combos', []):
+            burger = combo[:-5]
+            if burger in self.fields['burgers'] and burger not in selection.get('burgers', []):
+                selection.setdefault('burgers', []).append(burger)
+        return selection
+
+    def build(self, user_msg: str, order, manager_msg) -> str:
+        """
+        return menu context for the turn and record how many tokens it saved
+        """
+        context = self.compact
+        if self.prune:
+            selection = self.relevant(user_msg, order, manager_msg)
+            if selection:
+                context = self.render({category: [name for name in self.fields[category]
+                                                  if name in selection[category]]
+                                       for category in selection})
+        context_tokens = estimate_tokens(context)
+        self.last_stats = {
+            'full_tokens': self.full_tokens,
+            'context_tokens': context_tokens,
+            'saved_tokens': self.full_tokens - context_tokens,
+            'saved_pct': round(100 * (1 - context_tokens / self.full_tokens), 1),
+        }
+        self.total_stats['turns'] += 1
+        self.total_stats['full_tokens'] += self.full_tokens
+        self.total_stats['context_tokens'] += context_tokens
+        return context
+
+
+class PrefixFingerprints():
+    """
+    Counts distinct fingerprints of the static prompt prefix.
+    A run with one fingerprint means every request could reuse the cached prefix.
+    """
+
+    def __init__(self) -> None:
+        self.counts = {}
+        self.last = None
+
+    def observe(self, prefix: str) -> str:
+        """
+        return fingerprint of the prefix and count it
+        """
+        fingerprint = hashlib.sha256(prefix.encode()).hexdigest()[:16]
+        self.counts[fingerprint] = self.counts.get(fingerprint, 0) + 1
+        self.last = fingerprint
+        return fingerprint
+
+    @property
+    def stable(self) -> bool:
+        return len(self.counts) <= 1
+
+    def stats(self) -> dict:
+        turns = sum(self.counts.values())
+        return {
+            'turns': turns,
+            'distinct_prefixes': len(self.counts),
+            # share of turns whose prefix was already seen before, i.e. cacheable
+            'reuse_ratio': round((turns - len(self.counts)) / turns, 3) if turns else 0.0,
+            'last': self.last,
+        }
+
+
+# Shared by all LLM objects of the process
+PREFIX_FINGERPRINTS = PrefixFingerprints()
@@ -0,0 +1,45 @@
+"""
+This module is responsible for random orders over the whole menu.
+They cover every item type with sizes, modifiers and nested items, which is enough to check
+pricing against the Order and to build large order logs for benchmarks.
+"""
+import random
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import OrderItem, ChildrenItem, IngredientsItem
+
+
+def random_items(menu: Menu, rng: random.Random) -> list:
+    """
+    return up to 6 random OrderItems of the menu, the same ones for the same seed of rng
+    """
+    ingredients = list(menu.menu['ingredients'])
+    items = []
+    for _ in range(rng.randint(0, 6)):
+        item_type = rng.choice(['burgers', 'fries', 'drinks', 'desserts', 'ice cream', 'sauces',
+                                'combos', 'deals'])
+        category = 'desserts' if item_type == 'ice cream' else item_type
+        name = rng.choice(list(menu.menu[category]))
+        quantity = rng.randint(1, 3)
+        modifiers = [IngredientsItem(name=rng.choice(ingredients), quantity=rng.randint(1, 2))
+                     for _ in range(rng.randint(0, 2))]
+        if item_type == 'deals':
+            items.append(OrderItem(name=name, type='deals', quantity=quantity, children=[
+                ChildrenItem(name=burger, type='burgers', modifiers_to_add=list(modifiers))
+                for burger in rng.sample(menu.menu['deals'][name], 2)]))
+        elif item_type == 'combos':
+            data = menu.menu['combos'][name]
+            sauces = [IngredientsItem(name='Flag')] + \
+                [IngredientsItem(name=sauce) for sauce in data['sauces'][:rng.randint(0, 1)]]
+            items.append(OrderItem(
+                name=name, type='combos', quantity=quantity,
+                size=rng.choice(list(data['size_price'])), modifiers_to_add=sauces,
+                children=[ChildrenItem(name=name[:-5], type='burgers', modifiers_to_add=modifiers),
+                          ChildrenItem(name=data['drinks'][0], type='drinks'),
+                          ChildrenItem(name=data['fries'][0], type='fries')]))
+        else:
+            data = menu.menu[category][name]
+            sizes = data.get('size_price') if isinstance(data, dict) else None
+            items.append(OrderItem(name=name, type=item_type, quantity=quantity,
+                                   size=rng.choice(list(sizes)) if sizes else None,
+                                   modifiers_to_add=modifiers))
+    return items
@@ -0,0 +1,269 @@
+"""
+This module is responsible for recording conversations and replaying them offline.
+Recorder saves every turn of a conversation as a JSON line, ReplayLLM answers with the recorded
+responses and ReplayHarness drives the ConversationMachine through them and measures every stage
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, List
+from pydantic import BaseModel
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.conversation import ConversationMachine, Reply, Start
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.order import Order, OrderItem, OrderState, OrderDelta, to_model
+
+STAGES = ['llm', 'update_order', 'validate', 'clarify', 'business_rules']
+
+
+class TurnRecord(BaseModel):
+    conversation: str
+    turn: int
+    user_msg: str
+    manager_msg: dict
+    order_before: List[OrderItem]
+    # 'OrderState' or 'OrderDelta'
+    response_type: str
+    response: dict
+    # 'fast_path', 'cache' or 'llm'
+    path: str = 'llm'
+
+
+def message_to_dict(msg: ManagerMessage) -> dict:
+    return {
+        'text': msg.text,
+        'flag': msg.flag,
+        'subject': msg.subject,
+        'slot': msg.slot,
+        'parts': [message_to_dict(part) for part in msg.parts] if msg.parts else None,
+    }
+
+
+def message_from_dict(data: dict) -> ManagerMessage:
+    msg = ManagerMessage(data['text'], data['flag'], data.get('subject'), data.get('slot'))
+    if data.get('parts'):
+        msg.parts = [message_from_dict(part) for part in data['parts']]
+    return msg
+
+
+def load_records(path: str) -> Dict[str, List[TurnRecord]]:
+    """
+    return recorded turns grouped by conversation, in the order they were recorded
+    """
+    conversations = {}
+    with open(path, encoding='UTF-8') as f:
+        for line in f:
+            if line.strip():
+                record = TurnRecord.model_validate_json(line)
+                conversations.setdefault(record.conversation, []).append(record)
+    return conversations
+
+
+class Recorder():
+    """
+    Wraps an LLM and appends every turn it processes to a JSON lines file.
+    Works with anything that has process and/or aprocess, like LLM or FakeLLM
+    """
+
+    def __init__(self, llm, path: str, conversation: str = None) -> None:
+        self.llm = llm
+        self.path = path
+        self.conversation = conversation or time.strftime('%Y%m%d-%H%M%S')
+        self.turn = 0
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _path_counts(self) -> dict:
+        return dict(getattr(self.llm, 'path_counts', None) or {})
+
+    def _write(self, user_msg, manager_msg, order_before, response, path_counts) -> None:
+        self.turn += 1
+        after = self._path_counts()
+        # the path whose counter went up answered the turn
+        path = next((path for path, count in after.items() if count > path_counts.get(path, 0)),
+                    'llm')
+        record = TurnRecord(
+            conversation=self.conversation,
+            turn=self.turn,
+            user_msg=user_msg,
+            manager_msg=message_to_dict(manager_msg),
+            order_before=order_before,
+            response_type=type(response).__name__,
+            response=response.model_dump(),
+            path=path,
+        )
+        with open(self.path, 'a', encoding='UTF-8') as f:
+            f.write(record.model_dump_json() + '\n')
+
+    def process(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        # the fast path changes the order in place, so it is copied before the call
+        order_before = [to_model(item) for item in order.list]
+        path_counts = self._path_counts()
+        response = self.llm.process(user_msg, manager_msg, order)
+        self._write(user_msg, manager_msg, order_before, response, path_counts)
+        return response
+
+    async def aprocess(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        order_before = [to_model(item) for item in order.list]
+        path_counts = self._path_counts()
+        response = await self.llm.aprocess(user_msg, manager_msg, order)
+        self._write(user_msg, manager_msg, order_before, response, path_counts)
+        return response
+
+
+class ReplayLLM():
+    """
+    Answers with the recorded responses of one conversation, one per call.
+    Turns that went to the model wait latency seconds, fast path turns do not
+    """
+
+    def __init__(self, records: List[TurnRecord], latency: float = 0.0) -> None:
+        self.records = list(records)
+        self.latency = latency
+        self.position = 0
+        self.path_counts = {'fast_path': 0, 'cache': 0, 'llm': 0}
+
+    def _next(self, user_msg: str) -> tuple:
+        if self.position >= len(self.records):
+            raise IndexError(f"No recorded response for: {user_msg}")
+        record = self.records[self.position]
+        self.position += 1
+        self.path_counts[record.path] += 1
+        model = OrderDelta if record.response_type == 'OrderDelta' else OrderState
+        return record, model.model_validate(record.response)
+
+    def process(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        record, response = self._next(user_msg)
+        if self.latency and record.path == 'llm':
+            time.sleep(self.latency)
+        return response
+
+    async def aprocess(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        record, response = self._next(user_msg)
+        if self.latency and record.path == 'llm':
+            await asyncio.sleep(self.latency)
+        return response
+
+
+class ReplayReport():
+    """
+    Stage timings and throughput of a replay
+    """
+
+    def __init__(self) -> None:
+        self.timings = {stage: [] for stage in STAGES}
+        self.orders = 0
+        self.finished = 0
+        self.turns = 0
+        self.llm_calls = 0
+        # turns where the manager asked something else than in the recording
+        self.diverged = 0
+        self.seconds = 0.0
+
+    @staticmethod
+    def percentile(values: list, share: float) -> float:
+        if not values:
+            return 0.0
+        values = sorted(values)
+        return values[min(len(values) - 1, int(share * len(values)))]
+
+    def to_dict(self) -> dict:
+        return {
+            'orders': self.orders,
+            'finished_orders': self.finished,
+            'turns': self.turns,
+            'turns_per_order': round(self.turns / self.orders, 3) if self.orders else 0.0,
+            'llm_calls_per_order': round(self.llm_calls / self.orders, 3) if self.orders else 0.0,
+            'diverged_turns': self.diverged,
+            'orders_per_second': round(self.orders / self.seconds, 3) if self.seconds else 0.0,
+            'turns_per_second': round(self.turns / self.seconds, 3) if self.seconds else 0.0,
+            'stages_ms': {
+                stage: {
+                    'mean': round(1000 * sum(values) / len(values), 4) if values else 0.0,
+                    'p50': round(1000 * self.percentile(values, 0.5), 4),
+                    'p95': round(1000 * self.percentile(values, 0.95), 4),
+                }
+                for stage, values in self.timings.items()
+            },
+        }
+
+
+class StageTimings(Metrics):
+    """
+    Keeps every timing of the stages of the report instead of a summary, for the percentiles
+    """
+
+    def __init__(self, timings: Dict[str, list]) -> None:
+        super().__init__()
+        self.timings = timings
+
+    def observe(self, stage: str, seconds: float) -> None:
+        values = self.timings.get(stage)
+        if values is not None:
+            values.append(seconds)
+
+
+class ReplayHarness():
+    """
+    Replays recorded conversations through the ConversationMachine like main() does,
+    with ReplayLLM in place of the model
+    """
+
+    def __init__(self, menu: Menu, conversations: Dict[str, List[TurnRecord]],
+                 latency: float = 0.0, planner: ClarificationPlanner = None) -> None:
+        self.menu = menu
+        self.conversations = conversations
+        self.latency = latency
+        self.planner = planner or ClarificationPlanner()
+
+    def run(self, repeat: int = 1) -> ReplayReport:
+        report = ReplayReport()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for records in self.conversations.values():
+                self.replay(records, report)
+        report.seconds = time.perf_counter() - start
+        return report
+
+    def replay(self, records: List[TurnRecord], report: ReplayReport) -> None:
+        llm = ReplayLLM(records, self.latency)
+        machine = ConversationMachine(self.menu, planner=self.planner,
+                                      metrics=StageTimings(report.timings))
+        machine.handle(Start())
+        report.orders += 1
+
+        for record in records:
+            if machine.finished:
+                break
+            if machine.pending.text != record.manager_msg['text']:
+                report.diverged += 1
+            report.turns += 1
+
+            stage = time.perf_counter()
+            response = llm.process(record.user_msg, machine.pending, machine.order)
+            report.timings['llm'].append(time.perf_counter() - stage)
+            machine.handle(Reply(response))
+
+        if machine.finished:
+            report.finished += 1
+        report.llm_calls += llm.path_counts['llm']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded conversations offline")
+    parser.add_argument('fixtures', help='JSON lines file written by Recorder')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds every model turn waits')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    harness = ReplayHarness(Menu(dump_json=False), load_records(args.fixtures), args.latency)
+    print(json.dumps(harness.run(args.repeat).to_dict(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+This module is responsible for sending every turn to the cheapest model that can answer it.
+A turn is scored by the length of the utterance, the question it answers and the size of the
+order. Simple turns go to a smaller model with the pruned menu, and when validation rejects what
+a tier returned or its call fails, the turn goes to the next tier up
+"""
+import math
+import time
+from typing import Dict, List, NamedTuple
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.manager import Manager, ManagerMessage
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.order import Order
+from mcdonalds_proj.prompt import PrefixFingerprints
+
+# Score of the question the customer answers, closed questions are answered in a word or two
+FLAG_SCORES = {
+    'sauce_offered': 0,
+    'combo_offered': 0,
+    'dessert_offered': 0,
+    'clarify_size': 0,
+    'last_call': 1,
+    'clarify_name': 1,
+    'clarify_slot': 1,
+    'clarify_many': 2,
+    'general': 3,
+}
+# Issues that mean the model got the order wrong, the others are questions for the customer
+REJECTED_CODES = {'unknown_type', 'standalone_ingredient', 'unknown_name', 'combo_burger',
+                  'deal_child', 'quantity', 'size_not_supported', 'wrong_size', 'modifier'}
+
+
+class Tier(NamedTuple):
+    """
+    Backend of a tier and the highest turn score it takes. Prices are USD per million tokens
+    """
+    name: str
+    backend: object
+    max_score: float
+    prompt_price: float = 0.0
+    completion_price: float = 0.0
+
+
+def score_turn(user_msg: str, manager_msg: ManagerMessage, order: Order) -> int:
+    """
+    return complexity of the turn: a point per 4 words, the question and a point per 3 items
+    the model has to carry over, nested items included
+    """
+    items = sum(1 + len(item.children or ()) for item in order.list)
+    return len(user_msg.split()) // 4 + FLAG_SCORES.get(manager_msg.flag, 2) + items // 3
+
+
+def default_tiers(metrics: Metrics = METRICS) -> List[Tier]:
+    """
+    return gpt-4.1-nano with the pruned menu for turns up to score 3 and gpt-4.1-mini with
+    the whole prompt for everything else. The prompts of the tiers have different static
+    prefixes, so every tier counts its own; turns are counted by the router
+    """
+    from mcdonalds_proj.llm import LLM
+    small = LLM(prune_menu=True, prefix_fingerprints=PrefixFingerprints(), metrics=metrics,
+                model='gpt-4.1-nano', count_turns=False)
+    full = LLM(prefix_fingerprints=PrefixFingerprints(), metrics=metrics, count_turns=False)
+    return [Tier('small', small, 3, 0.10, 0.40), Tier('full', full, math.inf, 0.40, 1.60)]
+
+
+class ModelRouter():
+    """
+    Picks the tier of every turn and escalates rejected responses. It has the interface of LLM
+    (process, aprocess, prev_message and path_counts), so sessions use it in place of one.
+    Backends only need process and aprocess; the fast path and the cache are the router's,
+    so a response is cached only once validation has accepted it
+    """
+
+    def __init__(self, tiers: List[Tier], fast_path: FastPathInterpreter = None,
+                 cache: ResponseCache = None, metrics: Metrics = METRICS) -> None:
+        """
+        Args:
+            tiers (List[Tier]): cheapest first, the last one takes every turn that is left
+            fast_path (FastPathInterpreter): answers short replies without calling a model
+            cache (ResponseCache): reuses responses of turns that were already answered
+            metrics (Metrics): receives latency, calls, escalations and cost per tier
+        """
+        self.tiers = tiers
+        self.fast_path = fast_path
+        self.cache = cache
+        self.metrics = metrics
+        self.prev_message = "None"
+        self.path_counts = {'fast_path': 0, 'cache': 0, 'llm': 0}
+        self.stats = {tier.name: {'turns': 0, 'calls': 0, 'escalations': 0, 'seconds': 0.0,
+                                  'cost': 0.0} for tier in tiers}
+
+    def route(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> List[Tier]:
+        """
+        return tier of the turn followed by the ones it escalates to
+        """
+        score = score_turn(user_msg, manager_msg, order)
+        for position, tier in enumerate(self.tiers):
+            if score <= tier.max_score:
+                return self.tiers[position:]
+        return self.tiers[-1:]
+
+    def process(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        key, response = self._prepare(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        tiers = self.route(user_msg, manager_msg, order)
+        for tier in tiers:
+            last = tier is tiers[-1]
+            backend, start, usage = self._start(tier)
+            try:
+                response = backend.process(user_msg, manager_msg, order)
+            except Exception:
+                if not self._failed(tier, last, start, usage):
+                    raise
+                continue
+            if self._accept(tier, last, start, usage, response, order):
+                break
+        return self._finish(key, user_msg, response)
+
+    async def aprocess(self, user_msg: str, manager_msg: ManagerMessage, order: Order):
+        """
+        same as process with the async backends
+        """
+        key, response = self._prepare(user_msg, manager_msg, order)
+        if response is not None:
+            return response
+        tiers = self.route(user_msg, manager_msg, order)
+        for tier in tiers:
+            last = tier is tiers[-1]
+            backend, start, usage = self._start(tier)
+            try:
+                response = await backend.aprocess(user_msg, manager_msg, order)
+            except Exception:
+                if not self._failed(tier, last, start, usage):
+                    raise
+                continue
+            if self._accept(tier, last, start, usage, response, order):
+                break
+        return self._finish(key, user_msg, response)
+
+    def _prepare(self, user_msg: str, manager_msg: ManagerMessage, order: Order) -> tuple:
+        """
+        return cache key of the turn and the response of the fast path or the cache, if any
+        """
+        if self.fast_path is not None:
+            response = self.fast_path.interpret(user_msg, manager_msg, order)
+            if response is not None:
+                return None, self._finish(None, user_msg, response, 'fast_path')
+        if self.cache is None:
+            return None, None
+        key = self.cache.key(user_msg, manager_msg, order, 'router', self.prev_message)
+        response = self.cache.get(key)
+        if response is not None:
+            return key, self._finish(None, user_msg, response, 'cache')
+        return key, None
+
+    def _start(self, tier: Tier) -> tuple:
+        backend = tier.backend
+        # the backends see the previous message of the conversation, not the one of their tier
+        if hasattr(backend, 'prev_message'):
+            backend.prev_message = self.prev_message
+        return backend, time.perf_counter(), dict(getattr(backend, 'usage', None) or {})
+
+    def _record(self, tier: Tier, start: float, usage: dict) -> dict:
+        """
+        records latency and cost of a call and return the stats of the tier
+        """
+        seconds = time.perf_counter() - start
+        stats = self.stats[tier.name]
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        self.metrics.observe(f"llm_tier_{tier.name}", seconds)
+        self.metrics.inc('router_calls_total', tier=tier.name)
+        after = getattr(tier.backend, 'usage', None) or {}
+        cost = ((after.get('prompt_tokens', 0) - usage.get('prompt_tokens', 0)) * tier.prompt_price
+                + (after.get('completion_tokens', 0) - usage.get('completion_tokens', 0))
+                * tier.completion_price) / 1e6
+        if cost:
+            stats['cost'] += cost
+            self.metrics.inc('router_cost_usd_total', cost, tier=tier.name)
+        return stats
+
+    def _escalate(self, tier: Tier) -> None:
+        """
+        counts a turn the tier passed to the next one
+        """
+        self.stats[tier.name]['escalations'] += 1
+        self.metrics.inc('router_escalations_total', tier=tier.name)
+
+    def _accept(self, tier: Tier, last: bool, start: float, usage: dict, response,
+                order: Order) -> bool:
+        """
+        records the call and return whether the response is kept, the last tier is always kept
+        """
+        stats = self._record(tier, start, usage)
+        if not last and self.rejected(order, response):
+            self._escalate(tier)
+            return False
+        stats['turns'] += 1
+        return True
+
+    def _failed(self, tier: Tier, last: bool, start: float, usage: dict) -> bool:
+        """
+        records a call that raised, like retries running out on the small model, and return
+        whether the turn goes to the next tier; the error of the last tier is raised
+        """
+        self._record(tier, start, usage)
+        self.metrics.inc('router_errors_total', tier=tier.name)
+        if last:
+            return False
+        self._escalate(tier)
+        return True
+
+    def _finish(self, key, user_msg: str, response, path: str = 'llm'):
+        self.path_counts[path] += 1
+        self.metrics.inc('turns_total', path=path)
+        self.prev_message = user_msg
+        if key is not None:
+            self.cache.put(key, response)
+        return response
+
+    def rejected(self, order: Order, response) -> List[str]:
+        """checks the response on a copy of the order like Manager.validate does for the turn
+
+        Returns:
+            List[str]: codes of the problems the model made, empty if the response is accepted
+        """
+        scratch = Order(order.menu)
+        scratch.list = [item.model_copy(deep=True) for item in order.list]
+        manager = Manager()
+        manager.update_order(scratch, response.model_copy(deep=True))
+        # operations of a delta about items that do not exist
+        codes = ['delta'] * len(manager.errors)
+        codes += [issue.code for issue in manager.validate(scratch, order.menu)
+                  if issue.code in REJECTED_CODES]
+        return codes
+
+    def report(self) -> Dict[str, dict]:
+        """
+        return turns answered, calls, escalation rate, mean latency and cost of every tier,
+        with the static prefixes of its prompt if the backend counts them
+        """
+        report = {}
+        for tier in self.tiers:
+            stats = self.stats[tier.name]
+            report[tier.name] = {
+                'turns': stats['turns'],
+                'calls': stats['calls'],
+                'escalations': stats['escalations'],
+                'escalation_rate': round(stats['escalations'] / stats['calls'], 3)
+                if stats['calls'] else 0.0,
+                'avg_latency_ms': round(1000 * stats['seconds'] / stats['calls'], 3)
+                if stats['calls'] else 0.0,
+                'cost_usd': round(stats['cost'], 6),
+            }
+            fingerprints = getattr(tier.backend, 'prefix_fingerprints', None)
+            if fingerprints is not None:
+                report[tier.name]['prefixes'] = fingerprints.stats()
+        return report
@@ -0,0 +1,319 @@
+"""
+This module is responsible for serving many conversations at once over HTTP.
+All sessions share one read-only Menu, each session has its own Order, Manager and LLM.
+"""
+import argparse
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.router import ModelRouter, default_tiers
+from mcdonalds_proj.session import ConversationSession
+from mcdonalds_proj.snapshot import (FileSnapshotStore, SnapshotStore, SnapshotWriter,
+                                     SQLiteSnapshotStore, encode_session, load_snapshot)
+from mcdonalds_proj.worker_pool import PooledSession, TurnPool
+
+
+class UserMessage(BaseModel):
+    text: str
+
+
+class SessionReply(BaseModel):
+    session_id: str
+    messages: List[str]
+    finished: bool
+
+
+class SessionStore(ABC):
+    """
+    Interface of the storage of active sessions
+    """
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def put(self, session_id: str, session: ConversationSession) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def evict_idle(self, max_idle: float) -> int:
+        """
+        removes sessions that were not used for max_idle seconds and returns how many
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sessions in process memory, ordered by last access so eviction only looks at idle ones
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic) -> None:
+        self.clock = clock
+        self.sessions = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            return None
+        self.sessions[session_id] = (entry[0], self.clock())
+        self.sessions.move_to_end(session_id)
+        return entry[0]
+
+    def put(self, session_id: str, session: ConversationSession) -> None:
+        self.sessions[session_id] = (session, self.clock())
+        self.sessions.move_to_end(session_id)
+
+    def delete(self, session_id: str) -> None:
+        self.sessions.pop(session_id, None)
+
+    def evict_idle(self, max_idle: float) -> int:
+        deadline = self.clock() - max_idle
+        evicted = 0
+        while self.sessions:
+            session_id, (_, last_seen) = next(iter(self.sessions.items()))
+            if last_seen > deadline:
+                break
+            del self.sessions[session_id]
+            evicted += 1
+        return evicted
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+
+class ServerStats():
+    """
+    Counters of the server, turns_per_second is measured since the server started
+    """
+
+    def __init__(self) -> None:
+        self.started_at = time.monotonic()
+        self.sessions_started = 0
+        self.sessions_finished = 0
+        self.sessions_evicted = 0
+        self.sessions_restored = 0
+        self.turns = 0
+        self.turn_seconds = 0.0
+        # Turns and model calls of the finished sessions
+        self.finished_turns = 0
+        self.finished_llm_calls = 0
+
+    def session_finished(self, session: ConversationSession) -> None:
+        stats = session.stats()
+        self.sessions_finished += 1
+        self.finished_turns += stats['turns']
+        self.finished_llm_calls += stats['llm_calls']
+
+    def to_dict(self, active_sessions: int) -> dict:
+        uptime = time.monotonic() - self.started_at
+        return {
+            'active_sessions': active_sessions,
+            'sessions_started': self.sessions_started,
+            'sessions_finished': self.sessions_finished,
+            'sessions_evicted': self.sessions_evicted,
+            'sessions_restored': self.sessions_restored,
+            'turns': self.turns,
+            'avg_turn_ms': round(1000 * self.turn_seconds / self.turns, 3) if self.turns else 0.0,
+            'turns_per_second': round(self.turns / uptime, 3) if uptime else 0.0,
+            'turns_per_order': round(self.finished_turns / self.sessions_finished, 3)
+            if self.sessions_finished else 0.0,
+            'llm_calls_per_order': round(self.finished_llm_calls / self.sessions_finished, 3)
+            if self.sessions_finished else 0.0,
+        }
+
+
+def create_app(menu: Menu = None, llm_factory: Callable[[], object] = None,
+               store: SessionStore = None, idle_timeout: float = 600.0,
+               metrics: Metrics = METRICS, cache: ResponseCache = None,
+               snapshots: SnapshotStore = None, pool: TurnPool = None,
+               stream: bool = False) -> FastAPI:
+    """creates the web app
+
+    Args:
+        menu (Menu): menu shared by all sessions, loaded if not given
+        llm_factory (Callable): returns the LLM of a new session, LLM with fast path by default
+        store (SessionStore): storage of active sessions, in memory by default
+        idle_timeout (float): seconds after which an unused session is evicted
+        metrics (Metrics): stage timings of the sessions, served at /metrics
+        cache (ResponseCache): responses shared by the sessions of the default LLM,
+            in memory by default
+        snapshots (SnapshotStore): gets a snapshot of every session after each turn, sessions
+            that are not in the store (restart, another node) are restored from it
+        pool (TurnPool): runs the stages after the model in worker processes,
+            in the event loop if not given
+        stream (bool): the default LLM streams the response and validates every item
+            as soon as the model has finished it
+
+    Returns:
+        FastAPI: the app
+    """
+    menu = menu or Menu(dump_json=False)
+    fast_path = FastPathInterpreter(menu)
+    if llm_factory is None:
+        from mcdonalds_proj.llm import LLM
+        cache = cache if cache is not None else ResponseCache(metrics=metrics)
+
+        def llm_factory():
+            return LLM(fast_path=fast_path, cache=cache, stream=stream)
+    store = store if store is not None else InMemorySessionStore()
+    stats = ServerStats()
+    app = FastAPI(title="McDonald's assistant")
+    app.state.menu = menu
+    app.state.store = store
+    app.state.stats = stats
+    writer = SnapshotWriter(snapshots, metrics) if snapshots is not None else None
+    app.state.snapshot_writer = writer
+
+    def new_session(session_id: str) -> ConversationSession:
+        if pool is None:
+            return ConversationSession(menu, llm_factory(), metrics=metrics)
+        return PooledSession(menu, llm_factory(), pool, session_id, metrics=metrics)
+
+    def find_session(session_id: str) -> Optional[ConversationSession]:
+        session = store.get(session_id)
+        if session is not None or writer is None:
+            return session
+        snapshot = writer.load(session_id)
+        if snapshot is None:
+            return None
+        with metrics.span('snapshot_restore'):
+            session = new_session(session_id)
+            try:
+                load_snapshot(session, snapshot)
+            except ValueError:
+                # another format or menu version, or a broken row: the session cannot be continued
+                writer.delete(session_id)
+                metrics.inc('snapshot_rejected_total')
+                return None
+        store.put(session_id, session)
+        stats.sessions_restored += 1
+        return session
+
+    def evict_idle():
+        stats.sessions_evicted += store.evict_idle(idle_timeout)
+
+    @app.post('/sessions', response_model=SessionReply)
+    async def start_session():
+        evict_idle()
+        session_id = uuid.uuid4().hex
+        session = new_session(session_id)
+        messages = session.start()
+        store.put(session_id, session)
+        stats.sessions_started += 1
+        if writer is not None:
+            writer.submit(session_id, encode_session(session))
+        return SessionReply(session_id=session_id, messages=messages, finished=False)
+
+    @app.post('/sessions/{session_id}/messages', response_model=SessionReply)
+    async def send_message(session_id: str, message: UserMessage):
+        evict_idle()
+        session = find_session(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        start = time.perf_counter()
+        messages = await session.step(message.text)
+        stats.turn_seconds += time.perf_counter() - start
+        stats.turns += 1
+        if session.finished:
+            store.delete(session_id)
+            stats.session_finished(session)
+        if writer is not None:
+            with metrics.span('snapshot_encode'):
+                writer.submit(session_id, None if session.finished else encode_session(session))
+        return SessionReply(session_id=session_id, messages=messages, finished=session.finished)
+
+    @app.delete('/sessions/{session_id}', status_code=204)
+    async def end_session(session_id: str):
+        store.delete(session_id)
+        if writer is not None:
+            writer.delete(session_id)
+
+    @app.get('/metrics', response_class=PlainTextResponse)
+    async def get_metrics():
+        metrics.set('active_sessions', len(store))
+        return metrics.to_prometheus()
+
+    @app.get('/stats')
+    async def get_stats():
+        evict_idle()
+        return stats.to_dict(len(store))
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve McDonald's assistant sessions over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--idle-timeout', type=float, default=600.0)
+    parser.add_argument('--fake-llm', action='store_true',
+                        help='answer with the offline FakeLLM instead of OpenAI')
+    parser.add_argument('--fake-latency', type=float, default=0.0)
+    parser.add_argument('--route', action='store_true',
+                        help='send simple turns to a smaller model, escalate rejected answers')
+    parser.add_argument('--stream', action='store_true',
+                        help='stream the answers of the model and validate items as they arrive')
+    parser.add_argument('--cache-db', help='SQLite file of the response cache shared by the workers')
+    parser.add_argument('--snapshot-db', help='SQLite file for session snapshots')
+    parser.add_argument('--snapshot-dir', help='directory for session snapshots, one file each')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='worker processes for the stages after the model, 0 runs them '
+                             'in the event loop')
+    args = parser.parse_args()
+
+    menu = Menu(dump_json=False)
+    llm_factory = None
+    if args.fake_llm:
+        from mcdonalds_proj.fake_llm import FakeLLM
+        fast_path = FastPathInterpreter(menu)
+
+        def llm_factory():
+            return FakeLLM(menu, args.fake_latency, fast_path)
+    else:
+        from dotenv import load_dotenv
+        load_dotenv()
+    cache = ResponseCache(sqlite_path=args.cache_db) if args.cache_db else None
+    if args.route and llm_factory is None:
+        fast_path = FastPathInterpreter(menu)
+        route_cache = cache if cache is not None else ResponseCache()
+
+        def llm_factory():
+            return ModelRouter(default_tiers(), fast_path, route_cache)
+    snapshots = None
+    if args.snapshot_db:
+        snapshots = SQLiteSnapshotStore(args.snapshot_db)
+    elif args.snapshot_dir:
+        snapshots = FileSnapshotStore(args.snapshot_dir)
+    pool = TurnPool(args.workers) if args.workers else None
+    app = create_app(menu, llm_factory, idle_timeout=args.idle_timeout, cache=cache,
+                     snapshots=snapshots, pool=pool, stream=args.stream)
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        if pool is not None:
+            pool.close()
+
+
+if __name__ == '__main__':
+    main()
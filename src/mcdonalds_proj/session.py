@@ -0,0 +1,112 @@
+"""
+This module is responsible for running a conversation with one customer without blocking.
+The session calls the model and feeds its responses to the ConversationMachine,
+so one event loop can serve many lanes.
+"""
+from typing import Awaitable, Callable, List, Optional
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.conversation import ConversationMachine, Reply, Start
+from mcdonalds_proj.manager import Manager, ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.order import Order
+
+
+class ConversationSession():
+    """
+    Conversation of one customer. start() returns the greeting, every step() answers the
+    pending question and returns the messages to show until the next answer is needed.
+
+    The llm only needs an async aprocess(user_msg, manager_msg, order) method,
+    so tests can pass a local stub instead of LLM.
+    """
+
+    def __init__(self, menu: Menu, llm, planner: ClarificationPlanner = None,
+                 metrics: Metrics = METRICS) -> None:
+        """
+        Args:
+            menu (Menu): menu shared by the sessions
+            llm: object with aprocess(user_msg, manager_msg, order)
+            planner (ClarificationPlanner): merges pending questions, pass
+                ClarificationPlanner(max_questions=1) to ask them one by one
+            metrics (Metrics): receives the timings of the stages of every turn
+        """
+        self.menu = menu
+        self.llm = llm
+        self.planner = planner or ClarificationPlanner()
+        self.metrics = metrics
+        self.manager = Manager()
+        self.order = Order(menu)
+        self.machine = ConversationMachine(menu, self.manager, self.order, self.planner, metrics)
+        self.turns = 0
+
+    @property
+    def pending(self) -> Optional[ManagerMessage]:
+        return self.machine.pending
+
+    @pending.setter
+    def pending(self, msg: Optional[ManagerMessage]) -> None:
+        self.machine.pending = msg
+
+    @property
+    def state(self) -> str:
+        return self.machine.state
+
+    @state.setter
+    def state(self, state: str) -> None:
+        self.machine.state = state
+
+    @property
+    def finished(self) -> bool:
+        return self.machine.finished
+
+    def start(self) -> List[str]:
+        return self.machine.handle(Start())
+
+    async def step(self, user_msg: str) -> List[str]:
+        """processes the customer's answer to the pending question
+
+        Returns:
+            List[str]: messages for the customer, the last one is the next question
+        """
+        if self.finished:
+            return []
+        self.turns += 1
+        with self.metrics.span('turn'):
+            return await self._step(user_msg)
+
+    async def _step(self, user_msg: str) -> List[str]:
+        with self.metrics.span('llm'):
+            llm_response = await self.llm.aprocess(user_msg, self.pending, self.order)
+        return self.apply(llm_response)
+
+    def apply(self, llm_response) -> List[str]:
+        """
+        runs the stages after the model on its response: only CPU work, no I/O,
+        so it can run in a worker process
+        """
+        return self.machine.handle(Reply(llm_response))
+
+    def stats(self) -> dict:
+        """
+        return turns of the customer and model calls of the session; turns answered by the
+        fast path are not model calls
+        """
+        path_counts = getattr(self.llm, 'path_counts', None)
+        return {
+            'turns': self.turns,
+            'llm_calls': path_counts['llm'] if path_counts else self.turns,
+        }
+
+    async def run(self, receive: Callable[[], Awaitable[str]],
+                  send: Callable[[str], Awaitable[None]]) -> None:
+        """
+        runs the whole conversation, receive() returns the next customer message
+        and send() delivers a message of the system
+        """
+        for text in self.start():
+            await send(text)
+        while not self.finished:
+            user_msg = await receive()
+            for text in await self.step(user_msg):
+                await send(text)
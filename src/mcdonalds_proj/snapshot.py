@@ -0,0 +1,322 @@
+"""
+This module is responsible for saving conversations and restoring them after a restart
+or on another node. A snapshot holds the whole state of a ConversationSession as compact JSON:
+the order, the flags of the business rules, the queues of the manager and what the LLM remembers.
+Snapshots are written by a background thread, so the turn only pays for encoding
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.manager import ManagerMessage, MessageQueue
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.order import Child, Ingredient, Item
+from mcdonalds_proj.session import ConversationSession
+
+# Bump when the layout below changes, snapshots of another version are not restored
+SNAPSHOT_VERSION = 2
+ORDER_FLAGS = ('finished', 'upsell_offered', 'dessert_offered', 'double_deal_suggested')
+
+
+def _modifiers(modifiers: list) -> list:
+    return [[mod.name, mod.quantity] for mod in modifiers]
+
+
+def _item(item) -> list:
+    # [name, type, size, quantity, add, remove, children, offered]
+    children = [[child.name, child.type, _modifiers(child.modifiers_to_add),
+                 _modifiers(child.modifiers_to_remove)] for child in item.children] \
+        if item.children is not None else None
+    return [item.name, item.type, item.size, item.quantity, _modifiers(item.modifiers_to_add),
+            _modifiers(item.modifiers_to_remove), children, int(getattr(item, 'offered', False))]
+
+
+def _message(msg: Optional[ManagerMessage]) -> Optional[list]:
+    if msg is None:
+        return None
+    parts = [_message(part) for part in msg.parts] if msg.parts else None
+    return [msg.text, msg.flag, msg.subject, msg.slot, parts]
+
+
+def _restore_modifiers(modifiers: list) -> list:
+    return [Ingredient(name, quantity) for name, quantity in modifiers]
+
+
+def _restore_item(data: list) -> Item:
+    name, kind, size, quantity, added, removed, children, offered = data
+    if children is not None:
+        children = [Child(child_name, child_type, _restore_modifiers(child_added),
+                          _restore_modifiers(child_removed))
+                    for child_name, child_type, child_added, child_removed in children]
+    return Item(name, kind, size, quantity, _restore_modifiers(added),
+                _restore_modifiers(removed), children, bool(offered))
+
+
+def _restore_message(data: Optional[list]) -> Optional[ManagerMessage]:
+    if data is None:
+        return None
+    text, flag, subject, slot, parts = data
+    msg = ManagerMessage(text, flag, subject, slot)
+    if parts:
+        msg.parts = [_restore_message(part) for part in parts]
+    return msg
+
+
+def _restore_queue(messages: list) -> MessageQueue:
+    queue = MessageQueue()
+    for data in messages:
+        queue.put(_restore_message(data))
+    return queue
+
+
+def encode_session(session: ConversationSession) -> bytes:
+    """
+    return snapshot of the session
+    """
+    order = session.order
+    manager = session.manager
+    llm = session.llm
+    data = {
+        'v': SNAPSHOT_VERSION,
+        'menu': order.menu.version,
+        'items': [_item(item) for item in order.list],
+        'flags': [int(getattr(order, flag)) for flag in ORDER_FLAGS],
+        'pending': _message(session.pending),
+        'state': session.state,
+        'turns': session.turns,
+        'messages': [_message(msg) for msg in manager.message_queue.items],
+        'issues': [_message(msg) for msg in manager.issue_queue.items],
+        'errors': manager.errors,
+        'sauce_offered': manager.combos_sauce_offered,
+        'prev_message': getattr(llm, 'prev_message', None),
+        'path_counts': getattr(llm, 'path_counts', None),
+    }
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+def restore_session(snapshot: bytes, menu: Menu, llm, planner: ClarificationPlanner = None,
+                    metrics: Metrics = METRICS) -> ConversationSession:
+    """restores a session from its snapshot
+
+    Args:
+        snapshot (bytes): result of encode_session
+        menu (Menu): menu of the node, has to be the version the snapshot was taken with
+        llm: new LLM of the session, gets back the previous message and the path counts
+
+    Returns:
+        ConversationSession: the session, ready for the next step()
+    """
+    session = ConversationSession(menu, llm, planner, metrics)
+    load_snapshot(session, snapshot)
+    return session
+
+
+def load_snapshot(session: ConversationSession, snapshot: bytes) -> None:
+    """
+    replaces the state of the session with the one of the snapshot. A snapshot of another
+    version or menu, truncated or malformed raises ValueError and leaves the session as it was
+    """
+    data = json.loads(snapshot)
+    try:
+        if data['v'] != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot version {data['v']} is not supported")
+        if data['menu'] != session.order.menu.version:
+            raise ValueError("Snapshot was taken with another version of the menu")
+        items = [_restore_item(item) for item in data['items']]
+        flags = [bool(value) for value in data['flags']]
+        pending = _restore_message(data['pending'])
+        messages = _restore_queue(data['messages'])
+        issues = _restore_queue(data['issues'])
+        state, turns, errors = data['state'], data['turns'], data['errors']
+        sauce_offered = data['sauce_offered']
+        prev_message, saved_counts = data['prev_message'], data['path_counts']
+    except (KeyError, IndexError, TypeError, AttributeError) as error:
+        raise ValueError(f"Malformed snapshot: {error!r}") from error
+    order = session.order
+    order.list = items
+    for flag, value in zip(ORDER_FLAGS, flags):
+        setattr(order, flag, value)
+    session.pending = pending
+    session.state = state
+    session.turns = turns
+    manager = session.manager
+    manager.message_queue = messages
+    manager.issue_queue = issues
+    manager.errors = errors
+    manager.combos_sauce_offered = sauce_offered
+    llm = session.llm
+    if prev_message is not None and hasattr(llm, 'prev_message'):
+        llm.prev_message = prev_message
+    path_counts = getattr(llm, 'path_counts', None)
+    if saved_counts and path_counts is not None:
+        path_counts.update(saved_counts)
+
+
+class SnapshotStore(ABC):
+    """
+    Interface of the storage of session snapshots
+    """
+
+    @abstractmethod
+    def save(self, session_id: str, snapshot: bytes) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+
+class FileSnapshotStore(SnapshotStore):
+    """
+    One file per session in a directory, replaced atomically on every save
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id: str) -> str:
+        if not session_id.isalnum():
+            raise ValueError(f"Invalid session id: {session_id}")
+        return os.path.join(self.directory, f"{session_id}.json")
+
+    def save(self, session_id: str, snapshot: bytes) -> None:
+        path = self.path(session_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, path)
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        try:
+            with open(self.path(session_id), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, session_id: str) -> None:
+        try:
+            os.remove(self.path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteSnapshotStore(SnapshotStore):
+    """
+    Snapshots in a SQLite file, can be shared by the workers of a node
+    """
+
+    def __init__(self, path: str) -> None:
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS snapshots (session_id TEXT PRIMARY KEY, "
+                        "updated_at REAL, body BLOB)")
+        self.db.commit()
+
+    def save(self, session_id: str, snapshot: bytes) -> None:
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?)",
+                            (session_id, time.time(), snapshot))
+            self.db.commit()
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.db.execute("SELECT body FROM snapshots WHERE session_id = ?",
+                                  (session_id,)).fetchone()
+        return bytes(row[0]) if row is not None else None
+
+    def delete(self, session_id: str) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM snapshots WHERE session_id = ?", (session_id,))
+            self.db.commit()
+
+
+class SnapshotWriter():
+    """
+    Writes snapshots to the store from a background thread. Only the latest snapshot of a
+    session is kept in the queue, so a slow store never holds more than one per session
+    """
+
+    def __init__(self, store: SnapshotStore, metrics: Metrics = METRICS) -> None:
+        self.store = store
+        self.metrics = metrics
+        # session_id -> snapshot, None to delete it
+        self.pending: Dict[str, Optional[bytes]] = {}
+        self.condition = threading.Condition()
+        # (session_id, snapshot) that is being written
+        self.writing = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='snapshot-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, session_id: str, snapshot: Optional[bytes]) -> None:
+        """
+        queues the snapshot of the session, None deletes the saved one
+        """
+        with self.condition:
+            self.pending[session_id] = snapshot
+            self.condition.notify()
+
+    def delete(self, session_id: str) -> None:
+        self.submit(session_id, None)
+
+    def load(self, session_id: str) -> Optional[bytes]:
+        """
+        return latest snapshot of the session, including the one that is not written yet
+        """
+        with self.condition:
+            if session_id in self.pending:
+                return self.pending[session_id]
+            if self.writing is not None and self.writing[0] == session_id:
+                return self.writing[1]
+        return self.store.load(session_id)
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                # oldest first: a resubmitted session keeps its place in the queue
+                session_id = next(iter(self.pending))
+                snapshot = self.pending.pop(session_id)
+                self.writing = (session_id, snapshot)
+            start = time.perf_counter()
+            try:
+                if snapshot is None:
+                    self.store.delete(session_id)
+                else:
+                    self.store.save(session_id, snapshot)
+            except Exception:
+                self.metrics.inc('snapshot_errors_total')
+            else:
+                self.metrics.observe('snapshot_write', time.perf_counter() - start)
+            with self.condition:
+                self.writing = None
+                self.condition.notify_all()
+
+    def flush(self) -> None:
+        """
+        waits until every queued snapshot is written
+        """
+        with self.condition:
+            while self.pending or self.writing is not None:
+                self.condition.wait()
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
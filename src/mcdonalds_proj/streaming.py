@@ -0,0 +1,88 @@
+"""
+This module is responsible for acting on the order while the LLM is still generating it.
+"""
+import time
+from typing import Callable, Optional
+from pydantic import ValidationError
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.order import Order, OrderState, OrderItem
+
+
+class StreamingExtraction():
+    """
+    Consumes partial OrderState objects streamed by the model. An OrderItem is complete once
+    the model starts the next one (or the stream ends); it is then validated and priced right away.
+    Like in the conversation, the sauce or combo offer for an item waits for its clarifications
+    """
+
+    def __init__(self, order: Order, on_item: Optional[Callable] = None) -> None:
+        """
+        Args:
+            order (Order): order the response belongs to, used for the menu and pricing
+            on_item (Callable): called as on_item(item, messages, price) for every complete item,
+                messages are the clarifications for it, or its offer if it has none, and price
+                is None if it cannot be priced yet
+        """
+        self.order = order
+        self.on_item = on_item
+        self.manager = Manager()
+        self.done = 0
+        self.messages = []
+        self.started = time.perf_counter()
+        self.first_item_s = None
+        self.first_message_s = None
+        self.total_s = None
+
+    def feed(self, partial) -> None:
+        items = partial.items or []
+        for item in items[self.done:len(items) - 1]:
+            self.complete(item)
+
+    def finish(self, partial) -> OrderState:
+        """handles the items left when the stream ends
+
+        Returns:
+            OrderState: the complete response of the model
+        """
+        items = (partial.items or []) if partial is not None else []
+        for item in items[self.done:]:
+            self.complete(item)
+        self.total_s = time.perf_counter() - self.started
+        if partial is None:
+            return OrderState()
+        return OrderState.model_validate(partial.model_dump())
+
+    def complete(self, partial_item) -> None:
+        self.done += 1
+        try:
+            item = OrderItem.model_validate(partial_item.model_dump())
+        except ValidationError:
+            return
+        messages, checked = self.manager.prevalidate(item, self.order.menu)
+        price = None
+        if not messages and checked is not None:
+            try:
+                price = self.order.price_item(checked)
+            except (KeyError, TypeError, AttributeError):
+                price = None
+        if not messages and checked is not None:
+            messages = self.manager.preoffer(checked)
+
+        now = time.perf_counter() - self.started
+        if self.first_item_s is None:
+            self.first_item_s = now
+        if messages and self.first_message_s is None:
+            self.first_message_s = now
+        self.messages.extend(messages)
+        if self.on_item is not None:
+            self.on_item(item, messages, price)
+
+    def stats(self) -> dict:
+        def ms(seconds):
+            return round(1000 * seconds, 3) if seconds is not None else None
+        return {
+            'items': self.done,
+            'first_item_ms': ms(self.first_item_s),
+            'first_message_ms': ms(self.first_message_s),
+            'total_ms': ms(self.total_s),
+        }
@@ -0,0 +1,258 @@
+"""
+This module is responsible for checking the order against the menu.
+All items are checked in one pass over a snapshot of the order, so every problem of a turn is
+known at once; problems that can be fixed without the customer are fixed on the spot
+"""
+from typing import List, NamedTuple, Optional
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, ChildrenItem, Item, Child
+
+ITEM_TYPES = ['burgers', 'drinks', 'fries', 'desserts', 'ice cream', 'sauces', 'combos', 'deals',
+              'ingredients']
+SIMPLE_TYPES = ['burgers', 'drinks', 'fries', 'desserts', 'ice cream', 'sauces']
+
+# Severities: the customer has to answer a question, or the problem was fixed automatically
+BLOCKING = 'blocking'
+NOTICE = 'notice'
+
+
+class Issue(NamedTuple):
+    """
+    Problem of one item of the order.
+    Blocking issues carry the flag, subject and slot of the question for the customer,
+    notices carry the fix that was applied, like 'remove_item' or 'clear_size'
+    """
+    code: str
+    severity: str
+    item: int
+    text: str
+    auto_fix: Optional[str] = None
+    flag: Optional[str] = None
+    subject: Optional[str] = None
+    slot: Optional[str] = None
+
+
+def _missing(name) -> bool:
+    return name is None or name == 'None'
+
+
+class OrderValidator():
+    """
+    Rule engine of the order. check() returns the issues of all items, items that have to be
+    removed are only marked with auto_fix='remove_item' and left to the caller
+    """
+
+    def __init__(self, menu: Menu) -> None:
+        self.menu = menu
+        self.index = menu.index
+
+    def check(self, order: Order, first_only: bool = False) -> List[Issue]:
+        """checks every item of the order
+
+        Args:
+            order (Order): order to check, items are fixed in place
+            first_only (bool): stop after the first item with a blocking issue,
+                one question per turn like the original validation
+
+        Returns:
+            List[Issue]: issues in the order of the items
+        """
+        issues = []
+        for position, item in enumerate(list(order.list)):
+            found = []
+            if item.type not in ITEM_TYPES:
+                found.append(Issue('unknown_type', NOTICE, position,
+                                   f"Error: [{item.type}] is not in the menu.", 'remove_item'))
+            elif item.type == 'ingredients':
+                found.append(Issue('standalone_ingredient', NOTICE, position,
+                                   f"Ingredients cannot be ordered standalone. "
+                                   f"Item {item.name} was removed", 'remove_item'))
+            elif item.type == 'combos':
+                self.check_combo(position, item, found)
+            elif item.type == 'deals':
+                self.check_deal(position, item, found)
+            else:
+                self.check_item(position, item, found)
+            issues.extend(found)
+            if first_only and any(issue.severity == BLOCKING or issue.auto_fix == 'remove_item'
+                                  for issue in found):
+                break
+        return issues
+
+    def check_item(self, position: int, item, issues: list) -> bool:
+        """
+        checks name, quantity, size and modifiers of the item and
+        returns True if it has a blocking issue
+        """
+        if _missing(item.name):
+            issues.append(self.missing_name(position, item))
+            return True
+        if not self.index.has_item(item.type, item.name):
+            names_in_menu = self.index.options_text[item.type]
+            issues.append(Issue(
+                'unknown_name', BLOCKING, position,
+                f"System: There is no {item.name} in the {item.type} menu. \
+                Available options are: {names_in_menu}. Which one would you like?",
+                flag='clarify'))
+            return True
+        self.check_quantity(position, item, issues)
+        if self.check_size(position, item, issues):
+            return True
+        self.check_modifiers(position, item, issues)
+        return False
+
+    def check_combo(self, position: int, item: OrderItem, issues: list) -> bool:
+        if self.check_item(position, item, issues):
+            return True
+        if not item.children:
+            item.children = [
+                Child(type='burgers', name=item.name[:-5]),
+                Child(type='drinks'),
+                Child(type='fries', name='French Fries')]
+        blocked = False
+        for child in item.children:
+            if child.type == 'burgers':
+                burger = item.name[:-5]
+                if child.name != burger:
+                    issues.append(Issue(
+                        'combo_burger', NOTICE, position,
+                        f"{child.name} has to be {burger} in the {item.name}.\
+                     Was: {child.name}, Now: {burger}", 'set_name'))
+                    child.name = burger
+            elif child.type in ['drinks', 'fries'] and \
+                    not self.index.allowed_in_combo(item.name, child.type, child.name):
+                if _missing(child.name):
+                    issues.append(self.missing_name(position, child, item))
+                else:
+                    options = self.index.combo_options_text[(item.name, child.type)]
+                    if child.type == 'drinks':
+                        text = f"System: {child.name} is not allowed in {item.name}.\
+                         Drink has to be in the list {options}.\
+                         Which one would you like?"
+                    else:
+                        text = f"System: {child.name} is not allowed in {item.name}.\
+                         Fries item has to be in the list {options}?"
+                    issues.append(Issue('combo_slot', BLOCKING, position, text, flag='clarify_slot',
+                                        subject=item.name, slot=child.type))
+                blocked = True
+                continue
+            if child.type in ['burgers', 'drinks', 'fries']:
+                blocked = self.check_item(position, child, issues) or blocked
+        return blocked
+
+    def check_deal(self, position: int, item: OrderItem, issues: list) -> bool:
+        if self.check_item(position, item, issues):
+            return True
+        # No drinks or fries in the deal
+        for child in list(item.children or []):
+            if child.type != 'burgers':
+                kind = 'drinks' if child.type == 'drinks' else 'fries'
+                issues.append(Issue('deal_child', NOTICE, position,
+                                    f"Deals cannot contain {kind}. {child.name} was removed.",
+                                    'remove_child'))
+                item.children.remove(child)
+        if not item.children:
+            item.children = [
+                Child(type='burgers'),
+                Child(type='burgers')]
+        if len(item.children) != 2:
+            item.children = item.children[:2]
+            if len(item.children) < 2:
+                item.children.append(Child(type='burgers'))
+
+        blocked = False
+        asked_names = False
+        for child in item.children:
+            if not self.index.allowed_in_deal(item.name, child.name):
+                if _missing(child.name):
+                    # one question for both burgers of the deal
+                    if not asked_names:
+                        issues.append(self.missing_name(position, child, item))
+                        asked_names = True
+                else:
+                    options = self.index.deal_options_text[item.name]
+                    issues.append(Issue(
+                        'deal_burger', BLOCKING, position,
+                        f"System: {child.name} is not allowed in {item.name}.\
+                         Both burgers have to be in the list {options}?", flag='clarify'))
+                blocked = True
+                continue
+            blocked = self.check_item(position, child, issues) or blocked
+        return blocked
+
+    def check_quantity(self, position: int, item, issues: list) -> None:
+        if isinstance(item, (Item, OrderItem)) and item.quantity < 1:
+            quantity = max(1, abs(item.quantity))
+            issues.append(Issue('quantity', NOTICE, position,
+                                f"{item.name}'s quantity must be > 0. \
+                    Was: {item.quantity} , Now: {quantity}", 'set_quantity'))
+            item.quantity = quantity
+
+    def check_size(self, position: int, item, issues: list) -> bool:
+        if isinstance(item, (Child, ChildrenItem)):
+            return False
+        if item.type in ['burgers', 'desserts', 'ice cream', 'deals', 'ingredients', 'sauces']:
+            if item.size:
+                issues.append(Issue('size_not_supported', NOTICE, position,
+                                    f"{item.type} does not support sizes. {item.size} was removed.",
+                                    'clear_size'))
+                item.size = None
+            return False
+        if item.size is None:
+            issues.append(Issue('missing_size', BLOCKING, position,
+                                f"System: What size of {item.name}?", flag='clarify_size',
+                                subject=item.name))
+            return True
+        if item.size not in self.index.sizes[(item.type, item.name)]:
+            available_sizes = self.index.size_options_text[(item.type, item.name)]
+            issues.append(Issue(
+                'wrong_size', BLOCKING, position,
+                f"System: Wrong size of {item.name}. Available sizes: {available_sizes}.\
+                         Which one would you like?", flag='clarify_size', subject=item.name))
+            return True
+        return False
+
+    def check_modifiers(self, position: int, item, issues: list) -> None:
+        def removed(text):
+            issues.append(Issue('modifier', NOTICE, position, text, 'remove_modifier'))
+
+        ingredients = self.index.ingredients
+
+        if item.type in ['desserts', 'ice cream', 'deals', 'ingredients', 'virtual', 'sauces']:
+            for mod in item.modifiers_to_add:
+                removed(f"You cannot add {mod.name} to {item.name}. {mod.name} was removed.")
+            for mod in item.modifiers_to_remove:
+                removed(f"You cannot remove {mod.name} from {item.name}.")
+            item.modifiers_to_add = []
+            item.modifiers_to_remove = []
+        elif item.type == 'combos':
+            for mod in ingredients.rejected(item.modifiers_to_add, self.index.sauce_mask):
+                removed(f"You cannot add {mod.name} for {item.name}. '{mod.name}' was removed.")
+                item.modifiers_to_add.remove(mod)
+            for mod in item.modifiers_to_add:
+                mod.quantity = 1
+        else:
+            key = (item.type, item.name)
+            for mod in ingredients.rejected(item.modifiers_to_add,
+                                            self.index.possible_masks.get(key, 0)):
+                removed(f"You cannot add {mod.name} for {item.name}. '{mod}' was removed.")
+                item.modifiers_to_add.remove(mod)
+            for mod in ingredients.rejected(item.modifiers_to_remove,
+                                            self.index.default_masks.get(key, 0)):
+                removed(f"You cannot remove {mod.name} for {item.name}")
+                item.modifiers_to_remove.remove(mod)
+
+    def missing_name(self, position: int, item, parent: OrderItem = None) -> Issue:
+        if item.type in ['fries', 'ice cream']:
+            name = item.type
+        else:
+            name = item.type[:-1]
+        if parent is None:
+            return Issue('missing_name', BLOCKING, position, f"System: What kind of {name}?",
+                         flag='clarify_name', slot=item.type)
+        if parent.type == 'deals':
+            return Issue('missing_name', BLOCKING, position,
+                         f"System: What two {name}s for your {parent.name}?", flag='clarify')
+        return Issue('missing_name', BLOCKING, position,
+                     f"System: What kind of {name} for your {parent.name}?", flag='clarify_slot',
+                     subject=parent.name, slot=item.type)
@@ -0,0 +1,149 @@
+"""
+This module is responsible for running the CPU-bound stages of the turns on several cores.
+The model calls stay in the event loop of the server; validation of the response, update_order,
+validate, the business rules, the summary and the total run in worker processes.
+A session is pinned to one worker by its id, so its state stays there between turns.
+Every worker loads the Menu once when it starts
+"""
+import asyncio
+import multiprocessing
+import os
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Tuple
+from mcdonalds_proj.cache import RESPONSE_MODELS
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics, METRICS
+from mcdonalds_proj.session import ConversationSession
+from mcdonalds_proj.snapshot import encode_session, load_snapshot, restore_session
+
+# State of a worker process, set by _init_worker
+_MENU = None
+_PLANNER = None
+_MAX_SESSIONS = 0
+_SESSIONS = OrderedDict()
+# Stages in the workers are not exported, the server times the whole round trip
+_WORKER_METRICS = Metrics(enabled=False)
+
+
+def _init_worker(planner: ClarificationPlanner, max_sessions: int) -> None:
+    global _MENU, _PLANNER, _MAX_SESSIONS
+    _MENU = Menu(dump_json=False)
+    _PLANNER = planner
+    _MAX_SESSIONS = max_sessions
+
+
+def _ready() -> bool:
+    return _MENU is not None
+
+
+def _turn(session_id: str, turns: int, response_type: str, response: str,
+          snapshot: bytes) -> Tuple[List[str], bytes]:
+    """
+    runs the stages after the model in the worker. The snapshot restores the session
+    when the worker does not have it: first turn, evicted or the worker was restarted
+    """
+    session = _SESSIONS.pop(session_id, None)
+    if session is None:
+        session = restore_session(snapshot, _MENU, None, _PLANNER, _WORKER_METRICS)
+    session.turns = turns
+    messages = session.apply(RESPONSE_MODELS[response_type].model_validate_json(response))
+    if not session.finished:
+        _SESSIONS[session_id] = session
+        while len(_SESSIONS) > _MAX_SESSIONS:
+            _SESSIONS.popitem(last=False)
+    return messages, encode_session(session)
+
+
+class TurnPool():
+    """
+    Worker processes for the stages after the model. Each worker is a single process executor,
+    so all turns of a session run in the same process
+    """
+
+    def __init__(self, workers: int = None, planner: ClarificationPlanner = None,
+                 max_sessions: int = 10000, metrics: Metrics = METRICS) -> None:
+        """
+        Args:
+            workers (int): worker processes, one per core by default
+            planner (ClarificationPlanner): merges pending questions in the workers
+            max_sessions (int): sessions kept by a worker, the least recently used one is
+                dropped and restored from its snapshot on its next turn
+            metrics (Metrics): counts restarted workers
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.planner = planner or ClarificationPlanner()
+        self.max_sessions = max_sessions
+        self.metrics = metrics
+        self.executors = [self._executor() for _ in range(self.workers)]
+        # the workers load the menu before the first turn
+        wait([executor.submit(_ready) for executor in self.executors])
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # spawn: the server has threads (snapshot writer), forking them is not safe
+        return ProcessPoolExecutor(1, multiprocessing.get_context('spawn'), _init_worker,
+                                   (self.planner, self.max_sessions))
+
+    def worker(self, session_id: str) -> int:
+        """
+        return position of the worker the session is pinned to, the same in every process
+        """
+        return zlib.crc32(session_id.encode()) % self.workers
+
+    async def turn(self, session_id: str, turns: int, response,
+                   snapshot: bytes) -> Tuple[List[str], bytes]:
+        """runs the stages after the model in the worker of the session
+
+        Args:
+            session_id (str): id the session is pinned by
+            turns (int): turns of the session so far
+            response: OrderState or OrderDelta of the model
+            snapshot (bytes): latest state of the session, used if the worker does not have it
+
+        Returns:
+            Tuple[List[str], bytes]: messages for the customer and the snapshot after the turn
+        """
+        loop = asyncio.get_running_loop()
+        args = (_turn, session_id, turns, type(response).__name__, response.model_dump_json(),
+                snapshot)
+        position = self.worker(session_id)
+        try:
+            return await loop.run_in_executor(self.executors[position], *args)
+        except BrokenProcessPool:
+            # the worker died, a new one restores the session from the snapshot
+            self.metrics.inc('worker_restarts_total')
+            self.executors[position] = self._executor()
+            return await loop.run_in_executor(self.executors[position], *args)
+
+    def close(self) -> None:
+        for executor in self.executors:
+            executor.shutdown()
+
+
+class PooledSession(ConversationSession):
+    """
+    Session whose stages after the model run in the worker it is pinned to. It loads the
+    state the worker returns, so the model and the fast path see the order
+    like in ConversationSession
+    """
+
+    def __init__(self, menu: Menu, llm, pool: TurnPool, session_id: str,
+                 metrics: Metrics = METRICS) -> None:
+        super().__init__(menu, llm, pool.planner, metrics)
+        self.pool = pool
+        self.session_id = session_id
+        # state of the session in the worker after the last turn
+        self.snapshot = None
+
+    async def _step(self, user_msg: str) -> List[str]:
+        with self.metrics.span('llm'):
+            llm_response = await self.llm.aprocess(user_msg, self.pending, self.order)
+        snapshot = self.snapshot if self.snapshot is not None else encode_session(self)
+        with self.metrics.span('worker'):
+            messages, self.snapshot = await self.pool.turn(self.session_id, self.turns,
+                                                           llm_response, snapshot)
+        load_snapshot(self, self.snapshot)
+        return messages
@@ -0,0 +1,43 @@
+import random
+import unittest
+from mcdonalds_proj.batch_pricing import BatchPricer
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, ChildrenItem, IngredientsItem
+from mcdonalds_proj.random_orders import random_items
+
+
+class TestBatchPricing(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.pricer = BatchPricer(self.menu)
+
+    def test_same_totals_as_order(self):
+        rng = random.Random(7)
+        orders = []
+        for _ in range(300):
+            order = Order(self.menu)
+            order.list = random_items(self.menu, rng)
+            orders.append(order)
+
+        totals = self.pricer.price_orders(orders)
+
+        assert totals.tolist() == [order.total_cents for order in orders]
+
+    def test_line_totals(self):
+        items = [
+            OrderItem(name='Big Mac Meal', type='combos', size='large',
+                      modifiers_to_add=[IngredientsItem(name='Flag'),
+                                        IngredientsItem(name='BBQ Sauce')],
+                      children=[ChildrenItem(name='Big Mac', type='burgers',
+                                             modifiers_to_add=[IngredientsItem(name='Bacon')])]),
+            OrderItem(name='Small Double Deal', type='deals', quantity=2, children=[
+                ChildrenItem(name='Cheeseburger', type='burgers'),
+                ChildrenItem(name='McChicken', type='burgers')]),
+        ]
+        order = Order(self.menu)
+        order.list = items
+
+        lines = self.pricer.line_totals(self.pricer.encode([items, []]))
+
+        assert lines.tolist() == [charge.total for charge in order.breakdown()]
+        assert self.pricer.price_orders([[], items]).tolist() == [0, order.total_cents]
@@ -0,0 +1,60 @@
+import unittest
+from mcdonalds_proj.bundling import apply_deals, solve_deals
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, IngredientsItem
+
+
+def burger(name, quantity=1, *modifiers):
+    return OrderItem(name=name, type='burgers', quantity=quantity,
+                     modifiers_to_add=[IngredientsItem(name='Flag')] +
+                     [IngredientsItem(name=modifier) for modifier in modifiers])
+
+
+class TestBundling(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.order = Order(self.menu)
+
+    def test_cheapest_burger_stays_out(self):
+        # Hamburger is the cheapest small deal burger, greedy pairing used it first
+        self.order.list = [burger('Hamburger'), burger('McChicken'), burger('Filet-O-Fish')]
+
+        apply_deals(self.order, self.menu)
+
+        assert [item.name for item in self.order.list] == ['Hamburger', 'Small Double Deal']
+        assert [child.name for child in self.order.list[1].children] == ['Filet-O-Fish',
+                                                                          'McChicken']
+
+    def test_identical_pairs_share_a_line(self):
+        self.order.list = [burger('Big Mac', 3), burger('Big Mac', 2, 'Bacon'),
+                           burger('Cheeseburger', 4), OrderItem(name='Sprite', type='drinks',
+                                                                size='small')]
+        before = self.order.total_cents
+
+        made = apply_deals(self.order, self.menu)
+
+        assert made == 4
+        assert [(item.name, item.quantity) for item in self.order.list] == [
+            ('Big Mac', 1), ('Sprite', 1), ('Small Double Deal', 2), ('Big Double Deal', 1),
+            ('Big Double Deal', 1)]
+        assert self.order.list[0].modifiers_to_add[-1].name == 'Bacon'
+        assert [[mod.name for mod in child.modifiers_to_add]
+                for child in self.order.list[4].children] == [[], ['Bacon']]
+        assert self.order.total_cents < before
+
+    def test_large_order(self):
+        items = [burger(name, 3) for name in self.menu.menu['deals']['Small Double Deal']] * 50
+
+        deals, used = solve_deals(items, self.menu)
+
+        assert sum(deal.quantity for deal in deals) == 300
+        assert sum(used.values()) == 600
+
+    def test_business_rules(self):
+        manager = Manager()
+        self.order.list = [burger('Big Tasty'), burger('Royal Cheeseburger')]
+
+        manager.apply_business_rules(self.order, self.menu)
+
+        assert [item.name for item in self.order.list] == ['Big Double Deal']
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from mcdonalds_proj.cache import ResponseCache, normalize_text
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.order import Order, OrderItem, OrderState
+
+
+class Clock():
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def response(name='Sprite'):
+    return OrderState(items=[OrderItem(name=name, type='drinks', size='Large')])
+
+
+class TestResponseCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.menu = Menu(dump_json=False)
+
+    def setUp(self):
+        self.msg = ManagerMessage("System: What size of Sprite?", 'clarify_size', 'Sprite')
+
+    def test_key(self):
+        cache = ResponseCache(metrics=Metrics())
+        order = Order(self.menu)
+        key = cache.key("Large, please!", self.msg, order, 'OrderState')
+
+        assert normalize_text("  Large,   PLEASE! ") == "large please"
+        assert cache.key("large please", self.msg, order, 'OrderState') == key
+        assert cache.key("large please", self.msg, order, 'OrderDelta') != key
+        # the previous utterance is in the prompt, so it is part of the key
+        key = cache.key("large please", self.msg, order, 'OrderState', "a Sprite")
+        assert cache.key("large please", self.msg, order, 'OrderState', "A sprite!") == key
+        assert cache.key("large please", self.msg, order, 'OrderState', "a Fanta") != key
+        order.list.append(OrderItem(name='Sprite', type='drinks'))
+        assert cache.key("large please", self.msg, order, 'OrderState') != key
+
+    def test_lru_and_ttl(self):
+        clock = Clock()
+        metrics = Metrics()
+        cache = ResponseCache(max_size=2, ttl=60, clock=clock, metrics=metrics)
+        cache.put('a', response('Sprite'))
+        cache.put('b', response('Fanta'))
+        assert cache.get('a').items[0].name == 'Sprite'
+        cache.put('c', response('Coca-Cola'))
+
+        assert cache.get('b') is None
+        assert cache.get('a') is not None
+        clock.now += 61
+        assert cache.get('a') is None
+        assert len(cache) == 1
+        assert metrics.counter('cache_requests_total', result='hit', tier='memory') == 2
+        assert metrics.counter('cache_requests_total', result='miss') == 2
+
+    def test_hit_is_a_copy(self):
+        cache = ResponseCache(metrics=Metrics())
+        cache.put('a', response())
+        cache.get('a').items[0].name = 'Fanta'
+
+        assert cache.get('a').items[0].name == 'Sprite'
+
+    def test_sqlite_shared(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.sqlite')
+            first = ResponseCache(sqlite_path=path, metrics=Metrics())
+            second = ResponseCache(sqlite_path=path, metrics=Metrics())
+            first.put('a', response())
+
+            assert second.get('a').items[0].name == 'Sprite'
+            assert second.stats['disk_hits'] == 1
+            assert second.get('a') is not None
+            assert second.stats['hits'] == 1
+            first.db.close()
+            second.db.close()
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_llm_uses_cache(self):
+        from mcdonalds_proj.llm import LLM
+        llm = LLM(cache=ResponseCache(metrics=Metrics()), metrics=Metrics())
+        msg = ManagerMessage("System: What would you like to order?", 'order')
+        with mock.patch.object(llm, 'process_general_question',
+                               return_value=response()) as call:
+            first = llm.process("A large Sprite", msg, Order(self.menu))
+            second = llm.process("a large sprite.", msg, Order(self.menu))
+
+        assert call.call_count == 1
+        assert first == second
+        assert llm.path_counts == {'fast_path': 0, 'cache': 1, 'llm': 1}
@@ -0,0 +1,56 @@
+import unittest
+from mcdonalds_proj.clarification import ClarificationPlanner
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, ChildrenItem
+
+
+class TestClarificationPlanner(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.manager = Manager()
+        self.order = Order(self.menu)
+        self.order.list = [
+            OrderItem(name='French Fries', type='fries'),
+            OrderItem(name='Big Mac Meal', type='combos', size='medium', children=[
+                ChildrenItem(name='Big Mac', type='burgers'),
+                ChildrenItem(type='drinks'),
+                ChildrenItem(name='French Fries', type='fries')]),
+            OrderItem(name='Small Double Deal', type='deals', children=[
+                ChildrenItem(name='McChicken', type='burgers')]),
+        ]
+
+    def test_merge_pending_issues(self):
+        self.manager.validate(self.order, self.menu)
+
+        queue = ClarificationPlanner().merge_queue(self.manager.issue_queue)
+
+        assert queue.qsize() == 1
+        message = queue.get()
+        assert message.flag == 'clarify_many'
+        assert message.text.splitlines()[1:] == [
+            "1. What size of French Fries?",
+            "2. What kind of drink for your Big Mac Meal?",
+            "3. What two burgers for your Small Double Deal?"]
+
+    def test_one_question_per_slot(self):
+        meal = self.order.list[1]
+        self.order.list = [meal, meal.model_copy(deep=True)]
+        self.manager.validate(self.order, self.menu)
+
+        queue = ClarificationPlanner().merge_queue(self.manager.issue_queue)
+
+        assert queue.qsize() == 2
+        assert queue.get().text == "System: What kind of drink for your Big Mac Meal?"
+
+    def test_fast_path_answers_merged_question(self):
+        self.order.list = self.order.list[:2]
+        self.manager.validate(self.order, self.menu)
+        message = ClarificationPlanner().merge_queue(self.manager.issue_queue).get()
+
+        response = FastPathInterpreter(self.menu).interpret("large fries and a Sprite",
+                                                            message, self.order)
+
+        assert response.items[0].size == 'large'
+        assert response.items[1].children[1].name == 'Sprite'
@@ -0,0 +1,70 @@
+import unittest
+from mcdonalds_proj.conversation import (CLARIFYING, FINISHED, LAST_CALL, TAKING_ORDER, UPSELLING,
+                                         ConversationMachine, Reply, Start)
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.order import OrderItem, OrderState, to_state
+
+
+def state(*names, finished=False):
+    types = {'Sprite': 'drinks', 'Apple Pie': 'desserts'}
+    return OrderState(items=[OrderItem(name=name, type=types.get(name, 'burgers'),
+                                       size='large' if name == 'Sprite' else None)
+                             for name in names], order_finished=finished)
+
+
+class TestConversationMachine(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.metrics = Metrics()
+        self.machine = ConversationMachine(self.menu, metrics=self.metrics)
+
+    def test_transitions(self):
+        machine = self.machine
+        assert "Welcome" in machine.handle(Start())[-1]
+        assert machine.state == TAKING_ORDER
+
+        machine.handle(Reply(OrderState(items=[OrderItem(name='Sprite', type='drinks')])))
+        assert machine.state == CLARIFYING
+        assert machine.pending.flag == 'clarify_size'
+
+        assert machine.handle(Reply(state('Sprite'))) == ["System: Would you like anything else?"]
+        assert machine.state == LAST_CALL
+
+        assert "Your order total" in machine.handle(Reply(state('Sprite', finished=True)))[-1]
+        assert machine.state == FINISHED and machine.pending is None
+        assert machine.handle(Reply(state('Sprite'))) == []
+        assert self.metrics.counter('transitions_total', source=CLARIFYING, target=LAST_CALL) == 1
+        assert self.metrics.stages['transition'][0] == 4
+
+    def test_offers_are_queued_together(self):
+        machine = self.machine
+        machine.handle(Start())
+
+        machine.handle(Reply(state('Big Mac', 'McChicken')))
+        assert machine.state == UPSELLING
+        assert (machine.pending.flag, machine.pending.subject) == ('combo_offered', 'Big Mac')
+        assert machine.manager.message_queue.qsize() == 1
+
+        # "no" keeps the order, the next offer is asked without another rule pass
+        machine.handle(Reply(to_state(machine.order.list)))
+        assert (machine.pending.flag, machine.pending.subject) == ('combo_offered', 'McChicken')
+        assert machine.manager.message_queue.empty()
+
+        # deals and the dessert wait until every offer is answered
+        machine.handle(Reply(to_state(machine.order.list)))
+        assert machine.pending.flag == 'dessert_offered'
+
+    def test_offer_about_removed_item_is_dropped(self):
+        machine = self.machine
+        machine.handle(Start())
+        machine.handle(Reply(state('Big Mac', 'McChicken', 'Apple Pie')))
+
+        items = [item for item in machine.order.list if item.name != 'McChicken']
+        assert machine.handle(Reply(to_state(items))) == [
+            "System: Would you like anything else?"]
+        assert machine.state == LAST_CALL
+
+
+if __name__ == '__main__':
+    unittest.main()
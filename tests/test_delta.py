@@ -0,0 +1,50 @@
+import unittest
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import (Order, OrderItem, OrderDelta, OrderOperation, OrderItemPatch,
+                                  IngredientsItem)
+
+
+class TestOrderDelta(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.manager = Manager()
+        self.order = Order(self.menu)
+        self.order.list = [
+            OrderItem(name='Big Mac', type='burgers'),
+            OrderItem(name='French Fries', type='fries', size='small'),
+            OrderItem(name='Apple Pie', type='desserts'),
+        ]
+
+    def test_apply_operations(self):
+        delta = OrderDelta(operations=[
+            OrderOperation(op='remove', item_id=1),
+            OrderOperation(op='update', item_id=2, patch=OrderItemPatch(
+                size='large', modifiers_to_add=[IngredientsItem(name='Mayo')])),
+            OrderOperation(op='replace', item_id=3,
+                           item=OrderItem(name='Vanilla Cone', type='desserts')),
+            OrderOperation(op='add', item=OrderItem(name='Coca-Cola', type='drinks',
+                                                    size='medium')),
+        ])
+
+        self.manager.update_order(self.order, delta)
+
+        assert [item.name for item in self.order.list] == ['French Fries', 'Vanilla Cone',
+                                                           'Coca-Cola']
+        assert self.order.list[0].size == 'large'
+        assert self.order.list[0].modifiers_to_add[0].name == 'Mayo'
+        assert self.order.finished is False
+
+    def test_unknown_item_id(self):
+        delta = OrderDelta(operations=[OrderOperation(op='remove', item_id=7)],
+                           order_finished=True)
+
+        self.manager.update_order(self.order, delta)
+
+        assert len(self.order.list) == 3
+        assert self.order.finished is True
+        assert "Item #7 is not in the order." in self.manager.errors
+
+
+if __name__ == '__main__':
+    unittest.main()
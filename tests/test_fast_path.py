@@ -0,0 +1,85 @@
+import unittest
+from mcdonalds_proj.fast_path import FastPathInterpreter
+from mcdonalds_proj.manager import Manager
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, ChildrenItem, IngredientsItem
+
+
+class TestFastPath(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.manager = Manager()
+        self.order = Order(self.menu)
+        self.fast_path = FastPathInterpreter(self.menu)
+
+    def ask(self, queue):
+        return queue.get()
+
+    def test_last_call(self):
+        self.order.list = [OrderItem(name='Apple Pie', type='desserts')]
+        self.manager.last_call()
+        msg = self.ask(self.manager.message_queue)
+
+        assert self.fast_path.interpret("No, that's all", msg, self.order).order_finished
+        assert self.fast_path.interpret("and a Sprite", msg, self.order) is None
+
+    def test_size(self):
+        self.order.list = [OrderItem(name='French Fries', type='fries')]
+        self.manager.validate(self.order, self.menu)
+        msg = self.ask(self.manager.issue_queue)
+
+        response = self.fast_path.interpret("large please", msg, self.order)
+
+        assert response.items[0].size == 'large'
+
+    def test_sauce(self):
+        self.order.list = [OrderItem(
+            name='Big Mac Meal', type='combos', size='medium',
+            modifiers_to_add=[IngredientsItem(name='Flag')],
+            children=[ChildrenItem(name='Big Mac', type='burgers'),
+                      ChildrenItem(name='Sprite', type='drinks'),
+                      ChildrenItem(name='French Fries', type='fries')])]
+        self.manager.offer_sause(self.order.list[0])
+        msg = self.ask(self.manager.message_queue)
+
+        response = self.fast_path.interpret("yes, BBQ sauce", msg, self.order)
+
+        assert [mod.name for mod in response.items[0].modifiers_to_add] == ['Flag', 'BBQ Sauce']
+
+    def test_turn_into_combo(self):
+        self.order.list = [OrderItem(name='McChicken', type='burgers',
+                                     modifiers_to_add=[IngredientsItem(name='Flag')],
+                                     modifiers_to_remove=[IngredientsItem(name='Mayo')])]
+        self.manager.offer_to_turn_into_combo(self.order.list[0])
+        msg = self.ask(self.manager.message_queue)
+
+        combo = self.fast_path.interpret("Sure, with a Coke", msg, self.order).items[0]
+
+        assert combo.name == 'McChicken Meal'
+        assert [child.name for child in combo.children] == ['McChicken', 'Coca-Cola',
+                                                            'French Fries']
+        assert combo.children[0].modifiers_to_remove[0].name == 'Mayo'
+
+    def test_combo_drink(self):
+        self.order.list = [OrderItem(
+            name='Big Mac Meal', type='combos', size='medium',
+            children=[ChildrenItem(name='Big Mac', type='burgers'),
+                      ChildrenItem(type='drinks'),
+                      ChildrenItem(name='French Fries', type='fries')])]
+        self.manager.validate(self.order, self.menu)
+        msg = self.ask(self.manager.issue_queue)
+
+        response = self.fast_path.interpret("Sprite", msg, self.order)
+
+        assert response.items[0].children[1].name == 'Sprite'
+
+    def test_not_confident(self):
+        self.order.list = [OrderItem(name='French Fries', type='fries')]
+        self.manager.validate(self.order, self.menu)
+        msg = self.ask(self.manager.issue_queue)
+
+        assert self.fast_path.interpret("large, and add two Big Macs", msg, self.order) is None
+
+
+if __name__ == '__main__':
+    unittest.main()
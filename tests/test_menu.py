@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from mcdonalds_proj import menu as menu_module
+from mcdonalds_proj.menu import Menu, load_menu_snapshot, menu_sources_hash, process_yaml_menus
+from mcdonalds_proj.order import OrderItem, IngredientsItem
+
+
+class TestMenuSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_path = os.path.join(self.tmp_dir.name, 'menu_snapshot.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_matches_yaml(self):
+        version = menu_sources_hash()
+        menu = load_menu_snapshot(version, dump_json=False, snapshot_path=self.snapshot_path)
+
+        assert os.path.exists(self.snapshot_path)
+        assert menu == process_yaml_menus(dump_json=False)
+
+    def test_snapshot_is_not_rebuilt_for_same_version(self):
+        version = menu_sources_hash()
+        load_menu_snapshot(version, dump_json=False, snapshot_path=self.snapshot_path)
+
+        with mock.patch.object(menu_module, 'process_yaml_menus') as parse:
+            load_menu_snapshot(version, dump_json=False, snapshot_path=self.snapshot_path)
+        parse.assert_not_called()
+
+    def test_snapshot_is_rebuilt_when_yaml_changes(self):
+        load_menu_snapshot('old', dump_json=False, snapshot_path=self.snapshot_path)
+
+        with mock.patch.object(menu_module, 'process_yaml_menus',
+                               wraps=menu_module.process_yaml_menus) as parse:
+            load_menu_snapshot(menu_sources_hash(), dump_json=False,
+                               snapshot_path=self.snapshot_path)
+        parse.assert_called_once()
+
+    def test_dump_json_disabled(self):
+        dump_path = os.path.join(self.tmp_dir.name, 'test.json')
+        with mock.patch.object(menu_module, 'JSON_DUMP_PATH', dump_path):
+            Menu(use_snapshot=False, dump_json=False)
+            assert not os.path.exists(dump_path)
+            Menu(use_snapshot=False, dump_json=True)
+            assert os.path.exists(dump_path)
+
+
+class TestMenuIndex(unittest.TestCase):
+    def test_lookups(self):
+        menu = Menu(dump_json=False)
+        index = menu.index
+
+        assert index.has_item('burgers', 'Big Mac')
+        assert not index.has_item('burgers', 'Sprite')
+        assert index.has_item('ice cream', 'Vanilla Cone')
+        assert index.category_of['Sprite'] == 'drinks'
+        assert index.allowed_in_combo('Big Mac Meal', 'drinks', 'Sprite')
+        assert not index.allowed_in_combo('Big Mac Meal', 'drinks', 'Milk')
+        assert index.allowed_in_deal('Small Double Deal', 'McChicken')
+        assert not index.allowed_in_deal('Small Double Deal', 'Big Mac')
+        assert 'Pickles' in index.default_ingredients[('burgers', 'Big Mac')]
+        assert index.sizes[('drinks', 'Apple Juice')] == {'small', 'medium'}
+        assert index.options_text['fries'] == "['French Fries', 'Potato Dips']"
+
+    def test_ingredient_key_sums_quantities(self):
+        ingredients = Menu(dump_json=False).index.ingredients
+
+        def key(*mods):
+            return ingredients.key(OrderItem(name='Big Mac', type='burgers', modifiers_to_add=[
+                IngredientsItem(name=name, quantity=quantity) for name, quantity in mods]))
+
+        assert key(('Mayo', 1), ('Mayo', 1)) == key(('Mayo', 2)) != key(('Mayo', 1))
+        assert key(('Mayo', 1), ('Bacon', 1)) == key(('Bacon', 1), ('Mayo', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
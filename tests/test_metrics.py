@@ -0,0 +1,72 @@
+import asyncio
+import os
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from mcdonalds_proj.fake_llm import FakeLLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.session import ConversationSession
+
+
+class TestMetrics(unittest.TestCase):
+    def test_export(self):
+        metrics = Metrics()
+        with metrics.span('validate'):
+            pass
+        metrics.observe('validate', 0.5)
+        metrics.inc('turns_total', path='llm')
+        metrics.inc('turns_total', 2, path='fast_path')
+        metrics.set('issue_queue_depth', 3)
+
+        text = metrics.to_prometheus()
+        snapshot = metrics.snapshot()
+
+        assert 'mcdonalds_stage_seconds_count{stage="validate"} 2' in text
+        assert '# TYPE mcdonalds_turns_total counter' in text
+        assert 'mcdonalds_turns_total{path="fast_path"} 2' in text
+        assert 'mcdonalds_issue_queue_depth 3' in text
+        assert snapshot['stages']['validate']['max'] == 0.5
+        assert snapshot['counters']['turns_total{path=llm}'] == 1
+
+    def test_disabled(self):
+        metrics = Metrics(enabled=False)
+        with metrics.span('validate'):
+            metrics.inc('turns_total')
+
+        assert metrics.snapshot()['stages'] == {}
+        assert metrics.counter('turns_total') == 0
+
+    def test_session_stages(self):
+        menu = Menu(dump_json=False)
+        metrics = Metrics()
+        session = ConversationSession(menu, FakeLLM(menu), metrics=metrics)
+
+        async def talk():
+            session.start()
+            for text in ["a Sprite", "large", "no"]:
+                await session.step(text)
+        asyncio.run(talk())
+
+        stages = metrics.snapshot()['stages']
+        assert stages['turn']['count'] == 3
+        assert stages['business_rules']['count'] == 2
+        assert stages['finish_order']['count'] == 1
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_llm_hooks(self):
+        from mcdonalds_proj.llm import LLM
+        metrics = Metrics()
+        llm = LLM(metrics=metrics)
+        usage = SimpleNamespace(prompt_tokens=1200, completion_tokens=80,
+                                prompt_tokens_details=SimpleNamespace(cached_tokens=1024))
+
+        llm.client.hooks.emit_completion_arguments(model=llm.model)
+        llm.client.hooks.emit_parse_error(ValueError("bad json"))
+        llm.client.hooks.emit_completion_arguments(model=llm.model)
+        llm.client.hooks.emit_completion_response(SimpleNamespace(usage=usage))
+
+        assert metrics.counter('llm_attempts_total') == 2
+        assert metrics.counter('llm_errors_total', reason='parse') == 1
+        assert metrics.counter('llm_prompt_tokens_total') == 1200
+        assert metrics.counter('llm_cached_tokens_total') == 1024
@@ -0,0 +1,56 @@
+import unittest
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import (Child, ChildrenItem, Ingredient, IngredientsItem, Item, Order,
+                                  OrderItem, OrderState, from_model, to_state)
+
+
+def meal():
+    return OrderItem(name='Big Mac Meal', type='combos', size='large',
+                     modifiers_to_add=[IngredientsItem(name='Ranch')],
+                     children=[ChildrenItem(name='Big Mac', type='burgers',
+                                            modifiers_to_remove=[IngredientsItem(name='Onion')]),
+                               ChildrenItem(name='Sprite', type='drinks'),
+                               ChildrenItem(name='French Fries', type='fries')])
+
+
+class TestOrderModel(unittest.TestCase):
+    def test_round_trip(self):
+        item = from_model(meal())
+
+        assert type(item) is Item
+        assert type(item.children[0]) is Child
+        assert type(item.children[0].modifiers_to_remove[0]) is Ingredient
+        assert item == meal()
+        assert repr(item) == repr(meal())
+        assert str(item) == str(meal())
+        assert item.model_dump() == meal().model_dump()
+        assert to_state([item], True) == OrderState(items=[meal()], order_finished=True)
+
+    def test_order_keeps_internal_items(self):
+        order = Order(Menu(dump_json=False))
+        burger = Item(name='Big Mac', type='burgers')
+        order.list = [meal(), burger]
+
+        assert type(order.list[0]) is Item
+        assert order.list[1] is burger
+
+    def test_upsell_marker(self):
+        burger = OrderItem(name='McChicken', type='burgers',
+                           modifiers_to_add=[IngredientsItem(name='Bacon'),
+                                             IngredientsItem(name='Flag')])
+        item = from_model(burger)
+
+        assert item.offered
+        assert item.modifiers_to_add == [Ingredient('Bacon')]
+        assert [mod.name for mod in to_state([item]).items[0].modifiers_to_add] == ['Flag', 'Bacon']
+        assert "IngredientsItem(name='Flag', quantity=1)" in repr(item)
+        assert not from_model(OrderItem(name='McChicken', type='burgers')).offered
+
+    def test_deep_copy(self):
+        item = from_model(meal())
+        copy = item.model_copy(deep=True)
+        copy.children[1].name = 'Fanta'
+        copy.modifiers_to_add.append(Ingredient('Flag'))
+
+        assert item.children[1].name == 'Sprite'
+        assert item.modifiers_to_add == [IngredientsItem(name='Ranch')]
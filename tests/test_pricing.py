@@ -0,0 +1,60 @@
+import unittest
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import Order, OrderItem, ChildrenItem, IngredientsItem
+
+
+class TestPricing(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.order = Order(self.menu)
+        self.order.list = [
+            OrderItem(name='Big Mac', type='burgers', quantity=2,
+                      modifiers_to_add=[IngredientsItem(name='Bacon'), IngredientsItem(name='Flag')]),
+            OrderItem(name='French Fries', type='fries', size='large',
+                      modifiers_to_add=[IngredientsItem(name='Mayo', quantity=2)]),
+            OrderItem(name='Sprite', type='drinks', size='medium', quantity=3),
+            OrderItem(name='Apple Pie', type='desserts', quantity=2),
+            OrderItem(name='Vanilla Cone', type='ice cream'),
+            OrderItem(name='Big Mac Meal', type='combos', size='large',
+                      modifiers_to_add=[IngredientsItem(name='Flag'),
+                                        IngredientsItem(name='BBQ Sauce')],
+                      children=[
+                          ChildrenItem(name='Big Mac', type='burgers',
+                                       modifiers_to_add=[IngredientsItem(name='Bacon'),
+                                                         IngredientsItem(name='Cheese Slice')]),
+                          ChildrenItem(name='Sprite', type='drinks'),
+                          ChildrenItem(name='French Fries', type='fries')]),
+            OrderItem(name='Small Double Deal', type='deals', children=[
+                ChildrenItem(name='Cheeseburger', type='burgers'),
+                ChildrenItem(name='McChicken', type='burgers',
+                             modifiers_to_add=[IngredientsItem(name='Cheese Slice')])]),
+            OrderItem(name='Ranch', type='sauces', quantity=2),
+        ]
+
+    def test_line_prices(self):
+        totals = [charge.total for charge in self.order.breakdown()]
+
+        # same as the float prices, except the combo that counted child modifiers once per modifier
+        assert totals == [1273, 279, 387, 258, 79, 1159, 552, 70]
+        assert self.order.total_cents == 4057
+        assert self.order.calculate_total() == 40.57
+
+    def test_deal_discount(self):
+        deal = self.order.breakdown()[6]
+
+        assert (deal.base, deal.modifiers, deal.discount) == (628, 50, 126)
+        self.order.list[6].quantity = 2
+        assert self.order.breakdown()[6].total == 2 * (628 + 50 - 126)
+
+    def test_total_follows_changes_in_place(self):
+        before = self.order.total_cents
+        sprite = self.order.list[2]
+        medium = self.order.price_line(sprite).total
+
+        sprite.size = 'large'
+        self.order.list.append(OrderItem(name='Coca-Cola', type='drinks', size='small'))
+        del self.order.list[0]
+
+        assert self.order.total_cents == sum(charge.total for charge in self.order.breakdown())
+        assert self.order.price_line(sprite).total > medium
+        assert self.order.total_cents != before
@@ -0,0 +1,101 @@
+import os
+import unittest
+from unittest import mock
+from mcdonalds_proj.llm import LLM
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import ChildrenItem, IngredientsItem, Order, OrderItem, from_model
+from mcdonalds_proj.prompt import (MenuContextBuilder, PrefixFingerprints, encode_order,
+                                   order_fingerprint)
+
+
+class TestMenuContext(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.order = Order(self.menu)
+        self.manager_msg = ManagerMessage(
+            "System: Welcome to McDonald's! What can I get you started with?", "general")
+
+    def test_compact_menu_keeps_every_item(self):
+        builder = MenuContextBuilder(self.menu)
+
+        for category in ['combos', 'burgers', 'fries', 'drinks', 'desserts', 'deals', 'sauces']:
+            for name in self.menu.menu[category]:
+                assert name in builder.compact
+        # Once in the shared combo sauces list and once in the sauces category
+        assert builder.compact.count('Sweet & Sour Sauce') == 2
+        assert builder.compact_tokens < builder.full_tokens
+
+    def test_pruned_menu(self):
+        builder = MenuContextBuilder(self.menu, prune=True)
+        self.order.list = [OrderItem(name='McChicken', type='burgers')]
+
+        context = builder.build("and a Sprite please", self.order, self.manager_msg)
+
+        assert 'Sprite' in context
+        assert 'McChicken' in context
+        assert 'Apple Pie' not in context
+        assert builder.last_stats['context_tokens'] < builder.compact_tokens
+
+    def test_pruned_menu_falls_back_to_compact(self):
+        builder = MenuContextBuilder(self.menu, prune=True)
+
+        context = builder.build("hmm, what do you have?", self.order, self.manager_msg)
+
+        assert context == builder.compact
+
+
+class TestOrderEncoding(unittest.TestCase):
+    def items(self, *modifiers):
+        return [
+            OrderItem(name='Big Mac', type='burgers', quantity=2,
+                      modifiers_to_add=[IngredientsItem(name=name, quantity=quantity)
+                                        for name, quantity in modifiers],
+                      modifiers_to_remove=[IngredientsItem(name='Onion')]),
+            OrderItem(name='Big Mac Meal', type='combos', size='large',
+                      children=[ChildrenItem(name='Big Mac', type='burgers'),
+                                ChildrenItem(name='None', type='drinks'),
+                                ChildrenItem(name='French Fries', type='fries')])]
+
+    def test_encode_order(self):
+        text = encode_order(self.items(('Flag', 1), ('Mayo', 2)))
+
+        assert text.split('\n') == [
+            "#1 2x Big Mac [burgers] add(2x Mayo, Flag) remove(Onion)",
+            "#2 1x Big Mac Meal [combos] large with(Big Mac [burgers]; None [drinks]; "
+            "French Fries [fries])"]
+
+    def test_fingerprint(self):
+        items = self.items(('Flag', 1), ('Bacon', 1), ('Mayo', 2))
+        internal = [from_model(item) for item in self.items(('Mayo', 2), ('Bacon', 1), ('Flag', 1))]
+
+        assert order_fingerprint(items) == order_fingerprint(internal)
+        assert order_fingerprint(items) != order_fingerprint(self.items(('Bacon', 1), ('Mayo', 1)))
+        assert order_fingerprint(items) != order_fingerprint(items[::-1])
+
+
+class TestPromptPrefix(unittest.TestCase):
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_prefix_is_stable_across_turns(self):
+        menu = Menu(dump_json=False)
+        order = Order(menu)
+        fingerprints = PrefixFingerprints()
+        llm = LLM(prefix_fingerprints=fingerprints)
+        manager_msg = ManagerMessage(
+            "System: Welcome to McDonald's! What can I get you started with?", "general")
+
+        first = llm.build_messages("a Big Mac", manager_msg, order)
+        llm.prev_message = "a Big Mac"
+        order.list = [OrderItem(name='Big Mac', type='burgers')]
+        second = llm.build_messages("and a Sprite", ManagerMessage(
+            "System: Would you like anything else?", "general"), order)
+
+        assert first[0] == second[0]
+        assert first[1] != second[1]
+        assert "#1 1x Big Mac [burgers]" in second[1]['content']
+        assert fingerprints.stable
+        assert fingerprints.stats()['turns'] == 2
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from mcdonalds_proj.fake_llm import FakeLLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.replay import Recorder, ReplayHarness, load_records
+from mcdonalds_proj.session import ConversationSession
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'conversations.jsonl')
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+
+    def test_replay_fixtures(self):
+        conversations = load_records(FIXTURES)
+
+        report = ReplayHarness(self.menu, conversations).run().to_dict()
+
+        assert report['orders'] == report['finished_orders'] == 4
+        assert report['turns'] == 20
+        assert report['llm_calls_per_order'] == 1.0
+        assert report['diverged_turns'] == 0
+        assert set(report['stages_ms']) == {'llm', 'update_order', 'validate', 'clarify',
+                                            'business_rules'}
+
+    def test_record_and_replay(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'turns.jsonl')
+            session = ConversationSession(self.menu, Recorder(FakeLLM(self.menu), path, 'sprite'))
+
+            async def talk():
+                session.start()
+                for text in ["a Sprite", "large", "no"]:
+                    await session.step(text)
+            asyncio.run(talk())
+
+            records = load_records(path)['sprite']
+            report = ReplayHarness(self.menu, {'sprite': records}).run().to_dict()
+
+        assert [record.path for record in records] == ['llm', 'fast_path', 'fast_path']
+        assert records[1].manager_msg['flag'] == 'clarify_size'
+        assert records[1].order_before[0].size is None
+        assert (report['finished_orders'], report['diverged_turns']) == (1, 0)
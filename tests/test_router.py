@@ -0,0 +1,146 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.order import Order, OrderItem, OrderState
+from mcdonalds_proj.router import ModelRouter, Tier, default_tiers, score_turn
+
+WELCOME = ManagerMessage("System: Welcome to McDonald's! What can I get you started with?",
+                         'general')
+
+
+class StubBackend():
+    """
+    Answers every call with the same order and counts the tokens of a call like LLM does
+    """
+
+    def __init__(self, *names):
+        self.names = names
+        self.calls = []
+        self.prev_message = "None"
+        self.usage = {'prompt_tokens': 0, 'completion_tokens': 0}
+
+    def process(self, user_msg, manager_msg, order):
+        self.calls.append((user_msg, self.prev_message))
+        self.usage['prompt_tokens'] += 1000
+        self.usage['completion_tokens'] += 100
+        return OrderState(items=[OrderItem(name=name, type='burgers') for name in self.names])
+
+    async def aprocess(self, user_msg, manager_msg, order):
+        return self.process(user_msg, manager_msg, order)
+
+
+class FailingBackend(StubBackend):
+    """
+    Raises like instructor does once its retries run out
+    """
+
+    def process(self, user_msg, manager_msg, order):
+        super().process(user_msg, manager_msg, order)
+        raise RuntimeError("retries exhausted")
+
+
+class TestModelRouter(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.order = Order(self.menu)
+        self.metrics = Metrics()
+
+    def router(self, small, full, cache=None):
+        tiers = [Tier('small', small, 3, 0.1, 0.4), Tier('full', full, float('inf'), 0.4, 1.6)]
+        return ModelRouter(tiers, cache=cache, metrics=self.metrics)
+
+    def test_score(self):
+        assert score_turn("no", ManagerMessage("", 'combo_offered'), self.order) == 0
+        self.order.list = [OrderItem(name='Big Mac', type='burgers')] * 6
+        text = "two big macs meals one with no pickles and a large coke and fries please"
+        assert score_turn(text, WELCOME, self.order) == 3 + 3 + 2
+
+    def test_simple_turn_stays_small(self):
+        small, full = StubBackend('Big Mac'), StubBackend('Big Mac')
+        router = self.router(small, full)
+
+        response = router.process("a Big Mac", WELCOME, self.order)
+
+        assert response.items[0].name == 'Big Mac'
+        assert (len(small.calls), len(full.calls)) == (1, 0)
+        assert router.report()['small']['cost_usd'] == round((1000 * 0.1 + 100 * 0.4) / 1e6, 6)
+        assert router.path_counts['llm'] == 1
+
+    def test_rejected_turn_escalates(self):
+        small, full = StubBackend('Big Mak'), StubBackend('Big Mac')
+        router = self.router(small, full)
+        router.prev_message = "hi"
+
+        response = asyncio.run(router.aprocess("a Big Mac", WELCOME, self.order))
+
+        assert response.items[0].name == 'Big Mac'
+        assert full.calls == [("a Big Mac", "hi")]
+        report = router.report()
+        assert (report['small']['escalations'], report['small']['escalation_rate']) == (1, 1.0)
+        assert (report['full']['turns'], report['full']['calls']) == (1, 1)
+        assert self.metrics.counter('router_escalations_total', tier='small') == 1
+        assert self.metrics.stages['llm_tier_full'][0] == 1
+        assert router.prev_message == "a Big Mac"
+
+    def test_failed_call_escalates(self):
+        small, full = FailingBackend(), StubBackend('Big Mac')
+        router = self.router(small, full)
+
+        response = router.process("a Big Mac", WELCOME, self.order)
+
+        assert response.items[0].name == 'Big Mac'
+        assert router.report()['small']['escalations'] == 1
+        assert self.metrics.counter('router_errors_total', tier='small') == 1
+
+        router = self.router(StubBackend('Big Mak'), FailingBackend())
+        with self.assertRaises(RuntimeError):
+            asyncio.run(router.aprocess("a Big Mac", WELCOME, self.order))
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_escalated_turn_is_counted_once(self):
+        tiers = default_tiers(self.metrics)
+        router = ModelRouter(tiers, metrics=self.metrics)
+        small, full = (tier.backend for tier in tiers)
+        with mock.patch.object(small, 'process_general_question',
+                               return_value=StubBackend('Big Mak').process(None, None, None)), \
+                mock.patch.object(full, 'process_general_question',
+                                  return_value=StubBackend('Big Mac').process(None, None, None)):
+            router.process("a Big Mac", WELCOME, self.order)
+
+        assert router.report()['small']['escalations'] == 1
+        assert self.metrics.counter('turns_total', path='llm') == 1
+        assert small.prefix_fingerprints is not full.prefix_fingerprints
+        assert router.report()['full']['prefixes']['distinct_prefixes'] == 0
+
+    def test_complex_turn_goes_to_full(self):
+        small, full = StubBackend('Big Mac'), StubBackend('Big Mac')
+        router = self.router(small, full)
+
+        router.process("two big macs meals one with no pickles and a large coke and fries please",
+                       WELCOME, self.order)
+
+        assert (len(small.calls), len(full.calls)) == (0, 1)
+
+    def test_only_accepted_responses_are_cached(self):
+        small, full = StubBackend('Big Mak'), StubBackend('Big Mac')
+        router = self.router(small, full, ResponseCache(metrics=self.metrics))
+
+        first = router.process("a Big Mac", WELCOME, self.order)
+        # the next customer starts the same way
+        router.prev_message = "None"
+        second = router.process("a Big Mac", WELCOME, self.order)
+        # the previous utterance is in the prompt, the same turn after it is not reused
+        router.process("a Big Mac", WELCOME, self.order)
+
+        assert first == second
+        assert (len(small.calls), len(full.calls)) == (2, 2)
+        assert router.path_counts == {'fast_path': 0, 'cache': 1, 'llm': 2}
+
+
+if __name__ == '__main__':
+    unittest.main()
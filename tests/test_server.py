@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from fastapi.testclient import TestClient
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.fake_llm import FakeLLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.server import create_app, InMemorySessionStore, SessionStore
+
+
+class FakeClock():
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.clock = FakeClock()
+        self.store = InMemorySessionStore(self.clock)
+        app = create_app(self.menu, lambda: FakeLLM(self.menu), self.store, idle_timeout=60)
+        self.client = TestClient(app)
+
+    def test_conversation(self):
+        reply = self.client.post('/sessions').json()
+        session_id = reply['session_id']
+        assert "Welcome" in reply['messages'][-1]
+
+        def say(text):
+            return self.client.post(f'/sessions/{session_id}/messages', json={'text': text}).json()
+
+        assert say("a Sprite")['messages'][-1] == "System: What size of Sprite?"
+        assert say("large")['messages'][-1] == "System: Would you like anything else?"
+        reply = say("no, that's all")
+        assert reply['finished']
+        assert "Your order total is $1.61" in reply['messages'][-1]
+        assert self.client.post(f'/sessions/{session_id}/messages',
+                                json={'text': "hi"}).status_code == 404
+        stats = self.client.get('/stats').json()
+        # "large" and "no, that's all" are answered by the fast path
+        assert (stats['turns_per_order'], stats['llm_calls_per_order']) == (3, 1)
+
+    def test_sessions_are_independent(self):
+        first = self.client.post('/sessions').json()['session_id']
+        second = self.client.post('/sessions').json()['session_id']
+
+        self.client.post(f'/sessions/{first}/messages', json={'text': "a Sprite"})
+
+        assert self.store.get(first).order.list
+        assert not self.store.get(second).order.list
+        assert self.store.get(first).order.menu is self.store.get(second).order.menu
+
+    def test_idle_sessions_are_evicted(self):
+        old = self.client.post('/sessions').json()['session_id']
+        self.clock.now = 50
+        fresh = self.client.post('/sessions').json()['session_id']
+        self.clock.now = 100
+
+        stats = self.client.get('/stats').json()
+
+        assert stats['active_sessions'] == 1
+        assert stats['sessions_evicted'] == 1
+        assert self.store.get(old) is None
+        assert self.store.get(fresh) is not None
+
+    def test_incomplete_store_fails_on_creation(self):
+        class GetOnlyStore(SessionStore):
+            def get(self, session_id):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnlyStore()
+
+    def test_cache_reaches_default_llm(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = ResponseCache(sqlite_path=os.path.join(directory, 'cache.db'))
+            store = InMemorySessionStore()
+            client = TestClient(create_app(self.menu, store=store, cache=cache, stream=True))
+
+            session_id = client.post('/sessions').json()['session_id']
+
+            assert store.get(session_id).llm.cache is cache
+            assert store.get(session_id).llm.stream
+            cache.db.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import time
+import unittest
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.order import OrderState, OrderItem
+from mcdonalds_proj.session import ConversationSession
+
+
+class StubLLM():
+    """
+    Returns scripted responses, optionally after a delay that imitates the model latency
+    """
+
+    def __init__(self, responses, latency=0.0):
+        self.responses = list(responses)
+        self.latency = latency
+
+    async def aprocess(self, user_msg, manager_msg, order):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self.responses.pop(0)
+
+
+def sprite_order_responses():
+    return [
+        OrderState(items=[OrderItem(name='Sprite', type='drinks')]),
+        OrderState(items=[OrderItem(name='Sprite', type='drinks', size='large')]),
+        OrderState(items=[OrderItem(name='Sprite', type='drinks', size='large')],
+                   order_finished=True),
+    ]
+
+
+class TestConversationSession(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+
+    def test_conversation_flow(self):
+        session = ConversationSession(self.menu, StubLLM(sprite_order_responses()))
+
+        async def talk():
+            greeting = session.start()
+            size_question = await session.step("a Sprite")
+            last_call = await session.step("large")
+            summary = await session.step("no")
+            return greeting, size_question, last_call, summary
+
+        greeting, size_question, last_call, summary = asyncio.run(talk())
+
+        assert "Welcome" in greeting[-1]
+        assert size_question[-1] == "System: What size of Sprite?"
+        assert last_call[-1] == "System: Would you like anything else?"
+        assert "Your order total is $1.61" in summary[-1]
+        assert session.finished
+        assert session.turns == 3
+
+    def test_concurrent_sessions(self):
+        sessions = [ConversationSession(self.menu, StubLLM(sprite_order_responses(), 0.05))
+                    for _ in range(200)]
+
+        async def serve(session):
+            replies = iter(["a Sprite", "large", "no"])
+            sent = []
+
+            async def receive():
+                return next(replies)
+
+            async def send(text):
+                sent.append(text)
+
+            await session.run(receive, send)
+            return sent
+
+        async def serve_all():
+            return await asyncio.wait_for(
+                asyncio.gather(*(serve(session) for session in sessions)), timeout=10)
+
+        start = time.perf_counter()
+        results = asyncio.run(serve_all())
+        elapsed = time.perf_counter() - start
+
+        assert all(session.finished for session in sessions)
+        assert all("Your order total" in sent[-1] for sent in results)
+        # 600 model calls of 50ms each would take 30s one after another
+        assert elapsed < 5
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from fastapi.testclient import TestClient
+from mcdonalds_proj.fake_llm import FakeLLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.server import create_app
+from mcdonalds_proj.session import ConversationSession
+from mcdonalds_proj.snapshot import (FileSnapshotStore, SnapshotStore, SnapshotWriter,
+                                     SQLiteSnapshotStore, encode_session, load_snapshot,
+                                     restore_session)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.menu = Menu(dump_json=False)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_restored_session_continues(self):
+        async def talk(session, texts):
+            return [await session.step(text) for text in texts]
+
+        session = ConversationSession(self.menu, FakeLLM(self.menu))
+        session.start()
+        asyncio.run(talk(session, ["a McChicken and a Sprite"]))
+        snapshot = encode_session(session)
+        restored = restore_session(snapshot, self.menu, FakeLLM(self.menu))
+
+        assert encode_session(restored) == snapshot
+        assert restored.order.list == session.order.list
+        assert restored.pending.text == session.pending.text
+        assert restored.llm.prev_message == "a McChicken and a Sprite"
+        texts = ["large", "no", "no", "no"]
+        assert asyncio.run(talk(restored, texts)) == asyncio.run(talk(session, texts))
+        assert restored.finished and session.finished
+
+    def test_stores(self):
+        for store in [FileSnapshotStore(os.path.join(self.tmp_dir.name, 'files')),
+                      SQLiteSnapshotStore(os.path.join(self.tmp_dir.name, 'snapshots.db'))]:
+            writer = SnapshotWriter(store)
+            writer.submit('abc', b'first')
+            writer.submit('abc', b'second')
+            writer.submit('gone', b'x')
+            writer.delete('gone')
+            writer.flush()
+            writer.close()
+
+            assert store.load('abc') == b'second'
+            assert store.load('gone') is None
+
+    def test_incomplete_store_fails_on_creation(self):
+        class SaveOnlyStore(SnapshotStore):
+            def save(self, session_id, snapshot):
+                pass
+
+        with self.assertRaises(TypeError):
+            SaveOnlyStore()
+
+    def test_writer_saves_oldest_first(self):
+        class SlowStore(SnapshotStore):
+            def __init__(self):
+                self.saved = []
+                self.release = threading.Event()
+
+            def save(self, session_id, snapshot):
+                self.release.wait()
+                self.saved.append(session_id)
+
+            def load(self, session_id):
+                return None
+
+            def delete(self, session_id):
+                pass
+
+        store = SlowStore()
+        writer = SnapshotWriter(store)
+        writer.submit('first', b'x')
+        while writer.writing is None:
+            time.sleep(0.001)
+        for session_id in ['a', 'b', 'c', 'a']:
+            writer.submit(session_id, b'x')
+        store.release.set()
+        writer.flush()
+        writer.close()
+
+        assert store.saved == ['first', 'a', 'b', 'c']
+
+    def test_server_restores_sessions(self):
+        store = SQLiteSnapshotStore(os.path.join(self.tmp_dir.name, 'snapshots.db'))
+        first = create_app(self.menu, lambda: FakeLLM(self.menu), snapshots=store)
+        client = TestClient(first)
+        session_id = client.post('/sessions').json()['session_id']
+        client.post(f'/sessions/{session_id}/messages', json={'text': "a Sprite"})
+        first.state.snapshot_writer.flush()
+
+        # another worker with an empty session store
+        second = TestClient(create_app(self.menu, lambda: FakeLLM(self.menu), snapshots=store))
+        reply = second.post(f'/sessions/{session_id}/messages', json={'text': "large"}).json()
+
+        assert reply['messages'][-1] == "System: Would you like anything else?"
+        assert second.get('/stats').json()['sessions_restored'] == 1
+
+    def test_stale_snapshot_is_dropped(self):
+        store = SQLiteSnapshotStore(os.path.join(self.tmp_dir.name, 'snapshots.db'))
+        store.save('abc', json.dumps({'v': 1, 'menu': 'old'}).encode())
+        metrics = Metrics()
+        client = TestClient(create_app(self.menu, lambda: FakeLLM(self.menu), snapshots=store,
+                                       metrics=metrics))
+
+        reply = client.post('/sessions/abc/messages', json={'text': "large"})
+        client.app.state.snapshot_writer.flush()
+
+        assert reply.status_code == 404
+        assert store.load('abc') is None
+        assert metrics.counter('snapshot_rejected_total') == 1
+
+    def test_corrupted_snapshot_is_dropped(self):
+        session = ConversationSession(self.menu, FakeLLM(self.menu))
+        session.start()
+        asyncio.run(session.step("a McChicken and a Sprite"))
+        snapshot = encode_session(session)
+        data = json.loads(snapshot)
+        data['items'] = [['McChicken']]
+        corrupted = {
+            'truncated': snapshot[:len(snapshot) // 2],
+            'missing': json.dumps({'v': data['v'], 'menu': data['menu']}).encode(),
+            'item': json.dumps(data).encode(),
+            'list': b'[1, 2]',
+        }
+        store = SQLiteSnapshotStore(os.path.join(self.tmp_dir.name, 'snapshots.db'))
+        for session_id, row in corrupted.items():
+            store.save(session_id, row)
+        metrics = Metrics()
+        client = TestClient(create_app(self.menu, lambda: FakeLLM(self.menu), snapshots=store,
+                                       metrics=metrics))
+
+        for session_id in corrupted:
+            reply = client.post(f'/sessions/{session_id}/messages', json={'text': "large"})
+            assert reply.status_code == 404
+        client.app.state.snapshot_writer.flush()
+
+        assert all(store.load(session_id) is None for session_id in corrupted)
+        assert metrics.counter('snapshot_rejected_total') == len(corrupted)
+        # the session keeps its state when the snapshot cannot be loaded
+        with self.assertRaises(ValueError):
+            load_snapshot(session, corrupted['item'])
+        assert encode_session(session) == snapshot
+
+
+if __name__ == '__main__':
+    unittest.main()
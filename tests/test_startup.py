@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+
+class TestStartup(unittest.TestCase):
+    def test_llm_import_is_lazy(self):
+        code = ("import sys\n"
+                "from mcdonalds_proj.llm import LLM\n"
+                "LLM()\n"
+                "print('openai' in sys.modules, 'instructor' in sys.modules)")
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        env.pop('OPENAI_API_KEY', None)
+        output = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                capture_output=True, text=True).stdout
+
+        assert output.split() == ['False', 'False']
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_client_created_once(self):
+        from mcdonalds_proj.llm import LLM
+        llm = LLM()
+        assert llm._client is None
+
+        client = llm.client
+
+        assert llm.client is client
+        assert llm._async_client is None
@@ -0,0 +1,119 @@
+import asyncio
+import os
+import unittest
+from unittest import mock
+from mcdonalds_proj.cache import ResponseCache
+from mcdonalds_proj.llm import LLM
+from mcdonalds_proj.manager import ManagerMessage
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.metrics import Metrics
+from mcdonalds_proj.order import Order, OrderState, OrderItem, ChildrenItem
+from mcdonalds_proj.streaming import StreamingExtraction
+
+
+class StubCompletions():
+    def __init__(self, partials, events):
+        self.partials = partials
+        self.events = events
+
+    def create_partial(self, **kwargs):
+        for partial in self.partials:
+            self.events.append(('chunk', len(partial.items)))
+            yield partial
+
+
+class AsyncStubCompletions(StubCompletions):
+    async def create_partial(self, **kwargs):
+        for partial in self.partials:
+            self.events.append(('chunk', len(partial.items)))
+            yield partial
+
+
+class StubClient():
+    def __init__(self, partials, events, completions=StubCompletions):
+        self.chat = mock.Mock()
+        self.chat.completions = completions(partials, events)
+
+
+class TestStreaming(unittest.TestCase):
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_items_are_validated_before_the_stream_ends(self):
+        menu = Menu(dump_json=False)
+        order = Order(menu)
+        fries = OrderItem(name='French Fries', type='fries')
+        pie = OrderItem(name='Apple Pie', type='desserts')
+        sprite = OrderItem(name='Sprite', type='drinks', size='large')
+        partials = [OrderState(items=[fries]), OrderState(items=[fries, pie]),
+                    OrderState(items=[fries, pie, sprite])]
+        events = []
+        llm = LLM()
+        llm.client = StubClient(partials, events)
+
+        def on_item(item, messages, price):
+            events.append((item.name, [msg.text for msg in messages], price))
+
+        response = llm.process_stream("fries, an apple pie and a large Sprite",
+                                      ManagerMessage("System: Hi", "general"), order, on_item)
+
+        assert [item.name for item in response.items] == ['French Fries', 'Apple Pie', 'Sprite']
+        assert events == [
+            ('chunk', 1),
+            ('chunk', 2),
+            ('French Fries', ["System: What size of French Fries?"], None),
+            ('chunk', 3),
+            ('Apple Pie', [], 1.29),
+            ('Sprite', [], 1.61),
+        ]
+        assert llm.stream_stats['items'] == 3
+        assert llm.stream_stats['first_message_ms'] <= llm.stream_stats['total_ms']
+
+    @mock.patch.dict(os.environ, {'OPENAI_API_KEY': 'test'})
+    def test_async_stream_is_cached_and_timed(self):
+        menu = Menu(dump_json=False)
+        metrics = Metrics()
+        big_mac = OrderItem(name='Big Mac', type='burgers')
+        pie = OrderItem(name='Apple Pie', type='desserts')
+        events = []
+        llm = LLM(metrics=metrics, cache=ResponseCache(metrics=metrics), stream=True)
+        llm.async_client = StubClient([OrderState(items=[big_mac]),
+                                       OrderState(items=[big_mac, pie])],
+                                      events, AsyncStubCompletions)
+        msg = ManagerMessage("System: Hi", "general")
+
+        first = asyncio.run(llm.aprocess("a Big Mac and an apple pie", msg, Order(menu)))
+        llm.prev_message = "None"
+        second = asyncio.run(llm.aprocess("a big mac and an apple pie", msg, Order(menu)))
+
+        assert first == second
+        assert events == [('chunk', 1), ('chunk', 2)]
+        assert llm.path_counts == {'fast_path': 0, 'cache': 1, 'llm': 1}
+        # the combo offer of the Big Mac is the first message
+        assert llm.stream_stats['first_message_ms'] == llm.stream_stats['first_item_ms']
+        for stage in ['stream_first_item', 'stream_first_message', 'stream_total']:
+            assert metrics.stages[stage][0] == 1
+
+    def test_offers_are_made_before_the_stream_ends(self):
+        events = []
+
+        def on_item(item, messages, price):
+            events.append((item.name, [msg.flag for msg in messages]))
+
+        extraction = StreamingExtraction(Order(Menu(dump_json=False)), on_item)
+        big_mac = OrderItem(name='Big Mac', type='burgers')
+        big_tasty = OrderItem(name='Big Tasty', type='burgers')
+        combo = OrderItem(name='Big Mac Meal', type='combos', size='medium', children=[
+            ChildrenItem(name='Big Mac', type='burgers'),
+            ChildrenItem(name='Sprite', type='drinks'),
+            ChildrenItem(name='French Fries', type='fries')])
+
+        extraction.feed(OrderState(items=[big_mac, big_tasty]))
+        assert events == [('Big Mac', ['combo_offered'])]
+        assert extraction.first_message_s is not None
+
+        extraction.finish(OrderState(items=[big_mac, big_tasty, combo]))
+        assert events[1] == ('Big Tasty', [])
+        assert events[2] == ('Big Mac Meal', ['sauce_offered'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,8 +45,82 @@ class TestValidation(unittest.TestCase):
         print(order.list)
         assert order.list == []
 
+    def test_validate_all_issues(self):
+        manager = Manager()
+        menu = Menu(dump_json=False)
+        order = Order(menu)
+        order.list = [
+            OrderItem(name='Big Mac Meal', type='combos', size='large', children=[
+                ChildrenItem(name='Big Mac', type='burgers'),
+                ChildrenItem(type='drinks'),
+                ChildrenItem(name='Onion Rings', type='fries')]),
+            OrderItem(name="Cheese Slice", type="ingredients"),
+            OrderItem(name='French Fries', type='fries', quantity=0),
+            OrderItem(name='Small Double Deal', type='deals', children=[]),
+        ]
+
+        issues = manager.validate(order, menu)
+
+        assert [(issue.code, issue.item) for issue in issues] == [
+            ('missing_name', 0), ('combo_slot', 0), ('standalone_ingredient', 1),
+            ('quantity', 2), ('missing_size', 2), ('missing_name', 3)]
+        assert [issue.auto_fix for issue in issues if issue.severity == 'notice'] == [
+            'remove_item', 'set_quantity']
+        assert manager.issue_queue.qsize() == 4
+        assert [item.name for item in order.list] == ['Big Mac Meal', 'French Fries',
+                                                      'Small Double Deal']
+        assert order.list[1].quantity == 1
+
+    def test_validate_first_only(self):
+        manager = Manager()
+        menu = Menu(dump_json=False)
+        order = Order(menu)
+        order.list = [OrderItem(name='Sprite', type='drinks'),
+                      OrderItem(name='French Fries', type='fries')]
+
+        manager.validate(order, menu)
+        manager.validate(order, menu, first_only=True)
+
+        assert manager.issue_queue.qsize() == 1
+        assert manager.issue_queue.get().subject == 'Sprite'
+
+    def test_validate_modifiers(self):
+        manager = Manager()
+        menu = Menu(dump_json=False)
+        order = Order(menu)
+        order.list = [
+            OrderItem(name='Big Mac', type='burgers',
+                      modifiers_to_add=[IngredientsItem(name='Flag'), IngredientsItem(name='Bacon'),
+                                        IngredientsItem(name='Ice'), IngredientsItem(name='Glitter')],
+                      modifiers_to_remove=[IngredientsItem(name='Onion'),
+                                           IngredientsItem(name='Bacon')]),
+            OrderItem(name='Big Mac Meal', type='combos', size='large',
+                      modifiers_to_add=[IngredientsItem(name='Ranch', quantity=2),
+                                        IngredientsItem(name='Onion')])]
+
+        manager.validate(order, menu)
+
+        burger, meal = order.list
+        assert [mod.name for mod in burger.modifiers_to_add] == ['Bacon']
+        assert [mod.name for mod in burger.modifiers_to_remove] == ['Onion']
+        assert burger.offered
+        assert meal.modifiers_to_add == [IngredientsItem(name='Ranch')]
+        assert len(manager.errors) == 4
 
+    def test_identical_customizations(self):
+        ingredients = Menu(dump_json=False).index.ingredients
+        first = OrderItem(name='Big Mac', type='burgers',
+                          modifiers_to_add=[IngredientsItem(name='Bacon'),
+                                            IngredientsItem(name='Mayo')])
+        second = OrderItem(name='Big Mac', type='burgers',
+                           modifiers_to_add=[IngredientsItem(name='Mayo'),
+                                             IngredientsItem(name='Bacon')])
+        third = OrderItem(name='Big Mac', type='burgers',
+                          modifiers_to_add=[IngredientsItem(name='Mayo'),
+                                            IngredientsItem(name='Bacon', quantity=2)])
 
+        assert ingredients.key(first) == ingredients.key(second)
+        assert ingredients.key(first) != ingredients.key(third)
 
 
 if __name__ == '__main__':
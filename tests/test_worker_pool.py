@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+from fastapi.testclient import TestClient
+from mcdonalds_proj.fake_llm import FakeLLM
+from mcdonalds_proj.menu import Menu
+from mcdonalds_proj.server import create_app
+from mcdonalds_proj.session import ConversationSession
+from mcdonalds_proj.worker_pool import PooledSession, TurnPool
+
+
+class TestTurnPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.menu = Menu(dump_json=False)
+        cls.pool = TurnPool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.close()
+
+    def talk(self, session, texts):
+        async def run():
+            return [session.start()] + [await session.step(text) for text in texts]
+        return asyncio.run(run())
+
+    def test_same_messages_as_session(self):
+        texts = ["a McChicken and a Sprite", "large", "no", "no", "no"]
+        expected = self.talk(ConversationSession(self.menu, FakeLLM(self.menu)), texts)
+        session = PooledSession(self.menu, FakeLLM(self.menu), self.pool, 'abc')
+
+        assert self.talk(session, texts) == expected
+        assert session.finished
+        assert session.turns == 5
+        assert [item.name for item in session.order.list] == ['McChicken', 'Sprite']
+
+    def test_worker_restart(self):
+        session = PooledSession(self.menu, FakeLLM(self.menu), self.pool, 'def')
+        position = self.pool.worker('def')
+        messages = self.talk(session, ["a Sprite"])
+        # the worker dies between two turns, its replacement restores the session
+        for process in self.pool.executors[position]._processes.values():
+            process.kill()
+        messages += [asyncio.run(session.step("large")), asyncio.run(session.step("no"))]
+
+        assert messages[1] == ["System: What size of Sprite?"]
+        assert messages[2] == ["System: Would you like anything else?"]
+        assert "Your order total" in messages[3][-1]
+        assert self.pool.metrics.counter('worker_restarts_total') >= 1
+
+    def test_server(self):
+        client = TestClient(create_app(self.menu, lambda: FakeLLM(self.menu), pool=self.pool))
+        reply = client.post('/sessions').json()
+        for text in ["a Sprite", "large", "no"]:
+            reply = client.post(f"/sessions/{reply['session_id']}/messages",
+                                json={'text': text}).json()
+
+        assert reply['finished']
+        assert "Your order total" in reply['messages'][-1]
+
+
+if __name__ == '__main__':
+    unittest.main()